@@ -0,0 +1,68 @@
+"""
+Benchmark of the cold start cost of looking up colour scales.
+
+Each timing is made in a fresh Python process so nothing is cached in the
+colour scale registry.  The lookups are timed with the bundle turned
+off so that every scale is read from its .rgb file, with the packed
+colourmaps.npz bundle as in a development checkout, where the .rgb files
+are hashed to check the bundle is up to date, and with the bundle as
+installed, where only its version stamp is checked.  Pack the bundle
+into the source tree first with
+cfplot.colourmaps.pack(version=cfplot.__version__).
+
+Run with python benchmarks/bench_colour_scale_cold_start.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+
+# Code run in each fresh process.  cfplot is imported before the timer
+# starts so only the colour scale lookups are timed.
+worker = '''
+import json, sys, time
+import cfplot as cfp
+import cfplot.colourmaps
+if sys.argv[1] == 'files':
+    cfplot.colourmaps.bundle_file = '/no/such/bundle.npz'
+if sys.argv[1] == 'installed':
+    cfplot.colourmaps.checkout = lambda directory=None: False
+names = json.loads(sys.argv[2])
+start = time.perf_counter()
+cfp.cscale(names[0])
+first = time.perf_counter() - start
+for name in names[1:]:
+    cfp.cscale(name)
+total = time.perf_counter() - start
+print(json.dumps([first, total]))
+'''
+
+
+def cold_start(mode, names, repeat=5):
+    """Best first lookup and total time over repeat fresh processes"""
+    best = None
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, '-c', worker, mode, json.dumps(names)],
+                             check=True, capture_output=True, text=True)
+        first, total = json.loads(out.stdout.splitlines()[-1])
+        if best is None or total < best[1]:
+            best = [first, total]
+    return best
+
+
+import cfplot
+import cfplot.colourmaps
+
+if not os.path.exists(cfplot.colourmaps.bundle_file):
+    print('No colour scale bundle found - building', cfplot.colourmaps.bundle_file)
+    cfplot.colourmaps.pack(version=cfplot.__version__)
+
+names = sorted(cfplot.colourmaps.unpack().keys())
+
+print('Cold start colour scale lookups - best of 5 fresh processes')
+for mode in ['files', 'bundle', 'installed']:
+    first, total = cold_start(mode, ['viridis'])
+    print('  {:9s} first scale             {:8.2f} ms'.format(mode, first * 1e3))
+    first, total = cold_start(mode, names)
+    print('  {:9s} all {} scales          {:8.2f} ms'.format(mode, len(names), total * 1e3))
@@ -0,0 +1,56 @@
+"""
+Benchmark of con_frames against a separate con plot for each frame.
+
+A synthetic field of 24 frames is plotted on several projections, once
+with con_frames and once with gopen, con and gclose for each frame using
+the same contour levels.  The cartopy NaturalEarth data for the
+resolution used must be available.
+
+Run with python benchmarks/bench_con_frames.py
+"""
+import os
+import tempfile
+import time
+import numpy as np
+import cfplot as cfp
+
+
+nframes = 24
+x = np.arange(0, 360, 2.5)
+y = np.arange(-88.75, 90, 2.5)
+lons, lats = np.meshgrid(x, y)
+data = np.array([np.cos(np.radians(lats)) * 10 + np.sin(np.radians(lons + 15 * t)) * 3
+                 for t in np.arange(nframes)])
+
+
+def frames(proj, tmpdir):
+    """Time to plot all the frames with con_frames"""
+    cfp.mapset(proj=proj)
+    start = time.perf_counter()
+    cfp.con_frames(data, x=x, y=y, ptype=1,
+                   file_pattern=os.path.join(tmpdir, 'frame_{:04d}.png'))
+    return time.perf_counter() - start
+
+
+def separate(proj, tmpdir):
+    """Time to plot all the frames with a con plot for each one"""
+    clevs, mult, fmult = cfp.calculate_levels(field=data, level_spacing='linear')
+    start = time.perf_counter()
+    for frame in np.arange(nframes):
+        cfp.mapset(proj=proj)
+        cfp.levs(manual=np.array(clevs) / fmult)
+        cfp.gopen(file=os.path.join(tmpdir, 'plot_{:04d}.png'.format(frame)))
+        cfp.con(data[frame], x=x, y=y, ptype=1)
+        cfp.gclose(view=False)
+    cfp.levs()
+    return time.perf_counter() - start
+
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    # Warm up so that the NaturalEarth data has been read in
+    frames('cyl', tmpdir)
+
+    print('Contour plots of', nframes, 'frames')
+    for proj in ['cyl', 'npstere', 'robin']:
+        print('  {:8s} con_frames {:7.2f} s   con per frame {:7.2f} s'.format(
+              proj, frames(proj, tmpdir), separate(proj, tmpdir)))
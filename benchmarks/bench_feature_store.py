@@ -0,0 +1,63 @@
+"""
+Benchmark of the on-disk store of projected NaturalEarth features.
+
+Each timing is made in a fresh Python process so nothing is cached in
+memory.  A polar stereographic and a Lambert conformal plot are made
+with no cache directory, with an empty cache directory and then with the
+cache directory filled by the previous run, which is what a worker
+process sees when another process has already made the same map.  The
+cartopy NaturalEarth data for the resolution used must be available.
+
+Run with python benchmarks/bench_feature_store.py [resolution]
+"""
+import json
+import subprocess
+import sys
+import tempfile
+
+
+resolution = sys.argv[1] if len(sys.argv) > 1 else '10m'
+
+# Code run in each fresh process
+worker = '''
+import json, os, sys, tempfile, time
+import numpy as np
+import cfplot as cfp
+cache_dir, resolution = sys.argv[1], sys.argv[2]
+x = np.arange(0, 360, 10.0)
+y = np.arange(-85, 90, 10.0)
+lons, lats = np.meshgrid(x, y)
+field = np.cos(np.radians(lats)) * 10 + np.sin(np.radians(lons))
+times = []
+with tempfile.TemporaryDirectory() as tmpdir:
+    for proj in ['npstere', 'lcc']:
+        if cache_dir != 'none':
+            cfp.setvars(cache_dir=cache_dir)
+        start = time.perf_counter()
+        cfp.gopen(file=os.path.join(tmpdir, 'plot.png'))
+        cfp.mapset(proj=proj, resolution=resolution, lonmin=-50, lonmax=40,
+                   latmin=20, latmax=70)
+        cfp.con(f=field, x=x, y=y, ptype=1, lines=False, colorbar=False)
+        cfp.gclose(view=False)
+        times.append(time.perf_counter() - start)
+print(json.dumps(times))
+'''
+
+
+def run(cache_dir):
+    """Time to make each plot in a fresh process"""
+    out = subprocess.run([sys.executable, '-c', worker, cache_dir, resolution],
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+# Read the NaturalEarth data once so that file system caching is the same
+run('none')
+
+print('Projected NaturalEarth feature store at', resolution, '- fresh processes')
+with tempfile.TemporaryDirectory() as cache_dir:
+    for label, directory in [('no cache directory', 'none'),
+                             ('empty cache directory', cache_dir),
+                             ('filled cache directory', cache_dir)]:
+        npstere, lcc = run(directory)
+        print('  {:24s} npstere {:7.2f} s   lcc {:7.2f} s'.format(label, npstere, lcc))
@@ -0,0 +1,55 @@
+"""
+Micro-benchmark for cfplot.find_pos_in_array on a 10^6 point coordinate.
+
+Run with python benchmarks/bench_find_pos_in_array.py
+"""
+import time
+import numpy as np
+import cfplot as cfp
+
+
+def linear_scan(vals, val):
+    """The original Python loop over the coordinate for one lookup"""
+    pos = -1
+    for myval in vals:
+        if val > myval:
+            pos = pos + 1
+    return pos
+
+
+def timeit(func, repeat=5):
+    best = None
+    for i in np.arange(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+npts = 1000000
+nqueries = 100000
+coords = np.linspace(-90.0, 90.0, npts)
+queries = np.random.default_rng(0).uniform(-90.0, 90.0, nqueries)
+
+print('find_pos_in_array on a', npts, 'point coordinate')
+
+for name, vals in [('ascending', coords), ('descending', coords[::-1])]:
+    t = timeit(lambda: cfp.find_pos_in_array(vals=vals, val=queries[0]))
+    print('  {:10s} one scalar lookup       {:10.2f} us'.format(name, t * 1e6))
+
+    t = timeit(lambda: cfp.find_pos_in_array(vals=vals, val=queries))
+    print('  {:10s} {} lookups in one call {:7.2f} ms  ({:.3f} us per lookup)'.format(
+          name, nqueries, t * 1e3, t * 1e6 / nqueries))
+
+    t = timeit(lambda: cfp.find_pos_in_array(vals=vals, val=queries, above=True))
+    print('  {:10s} {} above=True lookups  {:7.2f} ms'.format(name, nqueries, t * 1e3))
+
+# Reference timing for the old Python scan - one lookup only as it is slow
+t = timeit(lambda: linear_scan(coords, queries[0]), repeat=1)
+print('  linear Python scan, one lookup     {:10.2f} ms'.format(t * 1e3))
+
+# Check the answers agree with the scan
+for val in queries[:3]:
+    assert cfp.find_pos_in_array(vals=coords, val=val) == linear_scan(coords, val)
@@ -0,0 +1,44 @@
+"""
+Benchmark of the time taken to import cfplot.
+
+Each timing is made in a fresh Python process.  cf-python, cartopy, scipy
+and matplotlib.pyplot are imported by cf-plot on first use so the import
+should not load any of them.  The modules that were loaded are listed
+after the timings.
+
+Run with python benchmarks/bench_import_time.py
+"""
+import json
+import subprocess
+import sys
+
+
+heavy_modules = ['cf', 'cartopy', 'scipy', 'shapely', 'matplotlib.pyplot']
+
+# Code run in each fresh process
+worker = '''
+import json, sys, time
+start = time.perf_counter()
+import cfplot
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in json.loads(sys.argv[1])
+                            if name in sys.modules]]))
+'''
+
+
+def import_time(repeat=5):
+    """Best import time over repeat fresh processes and the heavy modules loaded"""
+    best = None
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, '-c', worker, json.dumps(heavy_modules)],
+                             check=True, capture_output=True, text=True)
+        elapsed, loaded = json.loads(out.stdout.splitlines()[-1])
+        if best is None or elapsed < best[0]:
+            best = [elapsed, loaded]
+    return best
+
+
+elapsed, loaded = import_time()
+print('import cfplot - best of 5 fresh processes')
+print('  import time           {:8.2f} ms'.format(elapsed * 1e3))
+print('  heavy modules loaded  {}'.format(', '.join(loaded) if loaded else 'none'))
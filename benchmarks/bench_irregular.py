@@ -0,0 +1,69 @@
+"""
+Benchmark of contour plots of time steps on the same irregular mesh.
+
+Time steps of a synthetic field on scattered points are contoured with
+con(irregular=True), first with the triangulation cache emptied before
+each plot, as for a different mesh each time, and then with the cache
+kept, as for later time steps on the same mesh.  The time taken by
+irregular_window, which adds the interpolated points along the edges of
+the map, is also given.  The cartopy NaturalEarth data for the
+resolution used must be available.
+
+Run with python benchmarks/bench_irregular.py [number of points]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import cfplot as cfp
+
+
+npoints = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+nsteps = 5
+
+# Points spread evenly over the globe with a golden angle spiral
+index = np.arange(npoints) + 0.5
+lats = np.degrees(np.arcsin(1 - 2 * index / npoints))
+lons = np.mod(index * 137.50776405, 360.0)
+
+
+def field(step):
+    """Synthetic field for one time step"""
+    return (np.cos(np.radians(lats)) * 30 +
+            np.sin(np.radians(3 * lons + 20 * step)) * np.cos(np.radians(lats)) * 5)
+
+
+def plot(file, step, cached):
+    """Time to make one contour plot"""
+    if not cached:
+        cfp.irregular_mesh_cache.clear()
+    start = time.perf_counter()
+    cfp.gopen(file=file)
+    cfp.con(field(step), lons, lats, ptype=1, irregular=True, lines=False)
+    cfp.gclose(view=False)
+    return time.perf_counter() - start
+
+
+def window(step, cached):
+    """Time for irregular_window"""
+    if not cached:
+        cfp.irregular_mesh_cache.clear()
+    start = time.perf_counter()
+    cfp.irregular_window(field(step), lons, lats, mesh=cfp.irregular_mesh(lons, lats))
+    return time.perf_counter() - start
+
+
+cfp.setvars(viewer=None)
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    file = os.path.join(tmpdir, 'plot.png')
+
+    # Warm up so that the NaturalEarth data has been read in
+    plot(file, 0, False)
+
+    print(nsteps, 'time steps of', npoints, 'points - mean time per step')
+    for label, cached in [('new mesh each step', False), ('same mesh', True)]:
+        plots = np.mean([plot(file, step, cached) for step in np.arange(nsteps)])
+        windows = np.mean([window(step, cached) for step in np.arange(nsteps)])
+        print('  {:20s} con {:7.3f} s   irregular_window {:7.3f} s'.format(label, plots, windows))
@@ -0,0 +1,49 @@
+"""
+Benchmark of the map template cache used by set_map.
+
+A three by three page of small contour plots is made for several
+projections.  Each page is timed with the map template cache in use and
+with the templates emptied before each panel so that every panel sets
+its map limits, selects its features and projects its grid lines again.
+The cartopy NaturalEarth data for the resolution used must be available.
+
+Run with python benchmarks/bench_map_template.py
+"""
+import os
+import tempfile
+import time
+import numpy as np
+import cfplot as cfp
+
+
+def page(proj, file, use_cache=True, resolution='50m'):
+    """Time to make and save a three by three page of contour plots"""
+    x = np.arange(0, 360, 10.0)
+    y = np.arange(-85, 90, 10.0)
+    lons, lats = np.meshgrid(x, y)
+    field = np.cos(np.radians(lats)) * 10 + np.sin(np.radians(lons))
+
+    start = time.perf_counter()
+    cfp.gopen(rows=3, columns=3, file=file)
+    for pos in np.arange(1, 10):
+        if not use_cache:
+            cfp.map_template_cache.clear()
+        cfp.mapset(proj=proj, resolution=resolution)
+        cfp.gpos(pos)
+        cfp.con(f=field, x=x, y=y, ptype=1, lines=False, colorbar=False)
+    cfp.gclose(view=False)
+    return time.perf_counter() - start
+
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    file = os.path.join(tmpdir, 'page.png')
+
+    # Warm up so that the NaturalEarth data has been read in
+    page('cyl', file)
+
+    print('Three by three page of contour plots - best of 3')
+    for proj in ['cyl', 'npstere', 'robin', 'lcc']:
+        for use_cache in [False, True]:
+            best = min(page(proj, file, use_cache) for i in range(3))
+            label = 'templates kept' if use_cache else 'templates emptied'
+            print('  {:8s} {:17s} {:8.3f} s'.format(proj, label, best))
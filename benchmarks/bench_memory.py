@@ -0,0 +1,109 @@
+"""
+Benchmark of the peak memory used to plot a large field.
+
+Plots of a synthetic field are made with the memory allocations traced
+by tracemalloc and the peak memory above that in use beforehand is
+given as a multiple of the size of the field.  The field data, grid and
+plot settings are set up before the tracing starts so only the memory
+used by cf-plot and matplotlib is counted.  If cf-python is installed a
+field of trajectories is plotted with traj, reading all the
+trajectories at once and a chunk at a time.  The cartopy NaturalEarth
+data for the resolution used must be available.
+
+Run with python benchmarks/bench_memory.py [number of latitudes]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import cfplot as cfp
+
+
+nlats = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+x = np.linspace(0, 360, 2 * nlats, endpoint=False)
+y = np.linspace(-89.9, 89.9, nlats)
+lons, lats = np.meshgrid(x, y)
+field = np.cos(np.radians(lats)) * 30 + np.sin(np.radians(3 * lons)) * 5
+u = np.cos(np.radians(lats)) * 20
+v = np.sin(np.radians(2 * lons)) * 5
+field_mb = field.nbytes / 1e6
+
+# Scattered points with a few missing values for the irregular plot
+npoints = field.size // 8
+index = np.arange(npoints) + 0.5
+points_lats = np.degrees(np.arcsin(1 - 2 * index / npoints))
+points_lons = np.mod(index * 137.50776405, 360.0)
+points = np.cos(np.radians(points_lats)) * 30
+points[(points_lats > 60) & (points_lons < 30)] = np.nan
+
+
+def trajectories(ntraj, nobs):
+    """cf-python field of random walk trajectories in the northern hemisphere"""
+    import cf
+    rng = np.random.default_rng(0)
+    lons = np.cumsum(rng.normal(0.5, 0.3, (ntraj, nobs)), axis=1)
+    lons = (lons + rng.uniform(-180, 180, (ntraj, 1)) + 180) % 360 - 180
+    lats = np.clip(np.cumsum(rng.normal(0, 0.2, (ntraj, nobs)), axis=1) +
+                   rng.uniform(0, 80, (ntraj, 1)), -89, 89)
+    f = cf.Field(properties={'standard_name': 'air_pressure', 'units': 'hPa',
+                             'featureType': 'trajectory'})
+    axis_t = f.set_construct(cf.DomainAxis(ntraj))
+    axis_o = f.set_construct(cf.DomainAxis(nobs))
+    f.set_data(cf.Data(1000 - np.abs(lats) * 5), axes=[axis_t, axis_o])
+    for name, values in [('longitude', lons), ('latitude', lats)]:
+        units = 'degrees_east' if name == 'longitude' else 'degrees_north'
+        aux = cf.AuxiliaryCoordinate(properties={'standard_name': name,
+                                                 'units': units},
+                                     data=cf.Data(values))
+        f.set_construct(aux, axes=[axis_t, axis_o])
+    return f
+
+
+def measure(label, plot, size_mb):
+    """Print the time and peak memory of a plot"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cfp.gopen(file=os.path.join(tmpdir, 'plot.png'))
+        tracemalloc.start()
+        start = time.perf_counter()
+        plot()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        cfp.gclose(view=False)
+    print('  {:28s} {:7.2f} s  peak {:8.1f} MB = {:5.2f} x data'.format(
+          label, elapsed, peak / 1e6, peak / 1e6 / size_mb))
+
+
+cfp.setvars(viewer=None)
+
+# Warm up so that the NaturalEarth data has been read in
+cfp.con(field[::10, ::10], x[::10], y[::10], ptype=1, lines=False)
+
+print('Field of', field.shape, '-', round(field_mb, 1), 'MB')
+measure('calculate_levels', lambda: cfp.calculate_levels(field=field, level_spacing='linear'),
+        field_mb)
+measure('con blockfill_fast', lambda: cfp.con(field, x, y, ptype=1, blockfill_fast=True),
+        field_mb)
+measure('vect', lambda: cfp.vect(u=u, v=v, x=x, y=y, ptype=1, stride=nlats // 20,
+                                 key_length=10, scale=100), 2 * field_mb)
+measure('stream', lambda: cfp.stream(u=u, v=v, x=x, y=y, density=1), 2 * field_mb)
+
+print('Irregular field of', npoints, 'points -', round(points.nbytes / 1e6, 1), 'MB')
+measure('con irregular', lambda: cfp.con(points, points_lons, points_lats, ptype=1,
+                                         irregular=True, lines=False), points.nbytes / 1e6)
+
+try:
+    traj_field = trajectories(nlats * 4, 100)
+except Exception:
+    traj_field = None
+    print('cf-python fields could not be made - traj is not benchmarked')
+
+if traj_field is not None:
+    traj_mb = traj_field.size * 8 / 1e6
+    print('Trajectories of', traj_field.shape, '-', round(traj_mb, 1), 'MB')
+    cfp.mapset(proj='npstere', boundinglat=30)
+    for chunk_size in [None, nlats // 5]:
+        measure('traj chunk_size=' + str(chunk_size),
+                lambda: cfp.traj(traj_field, markersize=0, chunk_size=chunk_size), traj_mb)
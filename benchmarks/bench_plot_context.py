@@ -0,0 +1,94 @@
+"""
+Benchmark of plot contexts.
+
+The cost of starting each figure from the default settings is timed with
+reset() and with a new plot_context().  A batch of contour plots is then
+made one after another with reset() between them and in a pool of
+threads where each plot has its own plot context.  Every other plot is
+a rotated pole plot.  The plots made in threads are checked against
+those made one after another, which shows if any plot has been drawn
+on the figure of another thread.  The cartopy NaturalEarth data for the
+resolution used must be available.
+
+Run with python benchmarks/bench_plot_context.py [number of plots]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import matplotlib.image
+import cfplot as cfp
+
+
+nplots = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+x = np.arange(0, 360, 5.0)
+y = np.arange(-87.5, 90, 5.0)
+lons, lats = np.meshgrid(x, y)
+field = np.cos(np.radians(lats)) * 10 + np.sin(np.radians(lons)) * 3
+
+
+# Rotated pole grid
+rotated_x = np.arange(-20, 20, 1.0)
+rotated_y = np.arange(-15, 15, 1.0)
+rotated_field = np.outer(np.cos(np.radians(rotated_y * 6)), np.sin(np.radians(rotated_x * 8))) * 10
+
+
+def plot(file):
+    """Make one contour plot, with a rotated pole plot for odd numbered files"""
+    if int(file[-8:-4]) % 2 == 0:
+        cfp.mapset(proj='npstere')
+        cfp.gopen(file=file)
+        # The orientation is given as con would otherwise choose it from the
+        # plot type of the rotated pole plot before
+        cfp.con(f=field, x=x, y=y, ptype=1, colorbar_orientation='vertical')
+    else:
+        cfp.mapset(proj='rotated')
+        cfp.gopen(file=file)
+        cfp.con(f=rotated_field, x=rotated_x, y=rotated_y, ptype=6, axes=False)
+    cfp.gclose(view=False)
+
+
+def plot_in_context(file):
+    """Make one contour plot in its own plot context"""
+    with cfp.plot_context():
+        plot(file)
+
+
+print('Starting a figure from the default settings - best of 5')
+for label, start in [('reset()', cfp.reset), ('plot_context()', cfp.plot_context)]:
+    best = None
+    for i in range(5):
+        begin = time.perf_counter()
+        for figure in range(100):
+            start()
+        elapsed = (time.perf_counter() - begin) / 100
+        best = elapsed if best is None else min(best, elapsed)
+    print('  {:24s} {:8.3f} ms'.format(label, best * 1e3))
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    files = [os.path.join(tmpdir, 'plot_{:04d}.png'.format(i)) for i in range(nplots)]
+
+    # Warm up so that the NaturalEarth data has been read in
+    plot(files[0])
+    cfp.reset()
+
+    print(nplots, 'contour plots')
+    begin = time.perf_counter()
+    for file in files:
+        plot(file)
+        cfp.reset()
+    print('  {:24s} {:8.2f} s'.format('one after another', time.perf_counter() - begin))
+    expected = [matplotlib.image.imread(file) for file in files]
+
+    for threads in [2, 4, 8]:
+        begin = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(plot_in_context, files))
+        elapsed = time.perf_counter() - begin
+        differ = [os.path.basename(file) for file, image in zip(files, expected)
+                  if not np.array_equal(matplotlib.image.imread(file), image)]
+        print('  {:24s} {:8.2f} s   {}'.format(str(threads) + ' threads', elapsed,
+                                               'differ: ' + ' '.join(differ) if differ
+                                               else 'same as one after another'))
@@ -0,0 +1,66 @@
+"""
+Benchmark of render_many against making the same plots one after another.
+
+A batch of contour plots of a synthetic field is made in this process
+with gopen, con and gclose for each plot and then with render_many for
+several numbers of worker processes.  The times for render_many include
+starting the worker processes.  The cartopy NaturalEarth data for the
+resolution used must be available.
+
+Run with python benchmarks/bench_render_many.py [number of plots]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import cfplot as cfp
+
+
+x = np.arange(0, 360, 5.0)
+y = np.arange(-87.5, 90, 5.0)
+
+
+def field(step):
+    """Synthetic field for one plot"""
+    lons, lats = np.meshgrid(x, y)
+    return np.cos(np.radians(lats)) * 10 + np.sin(np.radians(lons + 15 * step)) * 3
+
+
+def job(file, step):
+    """Plot description for render_many"""
+    return {'file': file,
+            'calls': [('mapset', {'proj': 'npstere'}),
+                      ('con', {'f': field(step), 'x': x, 'y': y, 'ptype': 1})]}
+
+
+if __name__ == '__main__':
+    nplots = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = [os.path.join(tmpdir, 'plot_{:04d}.png'.format(step))
+                 for step in np.arange(nplots)]
+
+        start = time.perf_counter()
+        for step, file in enumerate(files):
+            cfp.mapset(proj='npstere')
+            cfp.gopen(file=file)
+            cfp.con(f=field(step), x=x, y=y, ptype=1)
+            cfp.gclose(view=False)
+        cfp.mapset()
+        serial = time.perf_counter() - start
+
+        print(nplots, 'contour plots')
+        print('  {:24s} {:8.2f} s'.format('one after another', serial))
+
+        processes = 1
+        while processes <= os.cpu_count():
+            jobs = [job(file, step) for step, file in enumerate(files)]
+            start = time.perf_counter()
+            for index, written, error in cfp.render_many(jobs, processes=processes):
+                if error is not None:
+                    print(error)
+            elapsed = time.perf_counter() - start
+            print('  {:24s} {:8.2f} s'.format('render_many ' + str(processes) + ' processes',
+                                              elapsed))
+            processes *= 2
@@ -0,0 +1,335 @@
+"""
+Offline benchmark suite of cf-plot.
+
+Synthetic fields are made in memory, so no data files are needed.  The
+fields are global, at grid spacings from 1 degree to 0.1 degree.  Both
+regular latitude-longitude grids and ORCA like curvilinear grids with
+two dimensional longitudes and latitudes are used.  NumPy arrays are
+always used.  cf-python fields are also used if cf-python is installed.
+
+Each case is timed as the plot itself, from gopen to just before gclose,
+and as gclose saving the plot with the Agg backend.  The best of the
+repeats is kept.  Each plot is made in a new plot context so the cases
+do not affect each other.  The cases are con with filled contours,
+contour lines, blockfill and blockfill_fast, and vect, stream, stipple,
+traj with lines, coloured lines and vectors, and lineplot with and
+without decimation.  traj needs cf-python.
+
+The suite also runs with released versions of cf-plot to give results
+to compare against.  The settings are also reset before each plot,
+which is all that is done for versions without plot contexts.  Cases
+using keywords that the installed cf-plot doesn't have, such as the
+decimate keyword of lineplot, are left out.
+
+The results are written to a JSON file with the versions of cf-plot and
+the packages it uses, so results can be compared across versions.  The
+cartopy NaturalEarth coastlines at 110m must be available.
+
+Run with
+python benchmarks/bench_suite.py [--sizes 1,0.5,0.25,0.1] [--cases con_fill,vect]
+                                 [--repeat 3] [--output results.json]
+python benchmarks/bench_suite.py --compare old.json new.json
+"""
+import argparse
+import contextlib
+import datetime
+import inspect
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import cfplot as cfp
+
+# Plot contexts are not in released versions of cf-plot up to 3.2.21
+plot_context = getattr(cfp, 'plot_context', contextlib.nullcontext)
+
+
+def regular_grid(spacing):
+    """Cell centre longitudes and latitudes of a global regular grid"""
+    x = np.arange(-180 + spacing / 2, 180, spacing)
+    y = np.arange(-90 + spacing / 2, 90, spacing)
+    return x, y
+
+
+def orca_grid(spacing):
+    """Two dimensional longitudes and latitudes of an ORCA like grid.
+    North of 20N the grid lines bend towards two poles over land as on a
+    tripolar ocean grid."""
+    x, y = regular_grid(spacing)
+    lons, lats = np.meshgrid(x, y)
+    north = np.clip((lats - 20) / 70, 0, 1) ** 2
+    lons2d = lons + 20 * north * np.sin(np.radians(2 * lons))
+    lats2d = lats - 5 * north * np.cos(np.radians(2 * lons))
+    return lons2d, lats2d
+
+
+def field_data(lons, lats):
+    """Smooth synthetic field with some small scale structure"""
+    return (np.cos(np.radians(lats)) * 20 + np.sin(np.radians(2 * lons)) * 5 +
+            np.sin(np.radians(lats * 12)) * np.cos(np.radians(lons * 9)))
+
+
+def cf_field(data, x, y):
+    """cf-python field on a regular grid"""
+    import cf
+    f = cf.Field(properties={'standard_name': 'air_temperature', 'units': 'K'})
+    axis_y = f.set_construct(cf.DomainAxis(y.size))
+    axis_x = f.set_construct(cf.DomainAxis(x.size))
+    f.set_data(cf.Data(data), axes=[axis_y, axis_x])
+    lat = cf.DimensionCoordinate(properties={'standard_name': 'latitude',
+                                             'units': 'degrees_north'},
+                                 data=cf.Data(y))
+    lon = cf.DimensionCoordinate(properties={'standard_name': 'longitude',
+                                             'units': 'degrees_east'},
+                                 data=cf.Data(x))
+    f.set_construct(lat, axes=[axis_y])
+    f.set_construct(lon, axes=[axis_x])
+    return f
+
+
+def cf_orca_field(data, lons2d, lats2d):
+    """cf-python field on an ORCA like grid"""
+    import cf
+    f = cf.Field(properties={'standard_name': 'sea_surface_temperature',
+                             'units': 'K'})
+    axis_j = f.set_construct(cf.DomainAxis(lons2d.shape[0]))
+    axis_i = f.set_construct(cf.DomainAxis(lons2d.shape[1]))
+    f.set_data(cf.Data(data), axes=[axis_j, axis_i])
+    for name, values in [('longitude', lons2d), ('latitude', lats2d)]:
+        units = 'degrees_east' if name == 'longitude' else 'degrees_north'
+        aux = cf.AuxiliaryCoordinate(properties={'standard_name': name,
+                                                 'units': units},
+                                     data=cf.Data(values))
+        f.set_construct(aux, axes=[axis_j, axis_i])
+    return f
+
+
+def cf_trajectories(spacing):
+    """cf-python field of trajectories with about as many points as the
+    grid has along a line of latitude for each trajectory"""
+    import cf
+    ntraj = 50
+    nobs = int(360 / spacing)
+    rng = np.random.default_rng(0)
+    lons = np.cumsum(rng.normal(0.5, 0.3, (ntraj, nobs)), axis=1)
+    lons = (lons + rng.uniform(-180, 180, (ntraj, 1)) + 180) % 360 - 180
+    lats = np.clip(np.cumsum(rng.normal(0, 0.2, (ntraj, nobs)), axis=1) +
+                   rng.uniform(-60, 60, (ntraj, 1)), -89, 89)
+    f = cf.Field(properties={'standard_name': 'air_pressure', 'units': 'hPa',
+                             'featureType': 'trajectory'})
+    axis_t = f.set_construct(cf.DomainAxis(ntraj))
+    axis_o = f.set_construct(cf.DomainAxis(nobs))
+    f.set_data(cf.Data(1000 - np.abs(lats) * 5), axes=[axis_t, axis_o])
+    for name, values in [('longitude', lons), ('latitude', lats)]:
+        units = 'degrees_east' if name == 'longitude' else 'degrees_north'
+        aux = cf.AuxiliaryCoordinate(properties={'standard_name': name,
+                                                 'units': units},
+                                     data=cf.Data(values))
+        f.set_construct(aux, axes=[axis_t, axis_o])
+    return f
+
+
+def accepts(routine, *keywords):
+    """True if routine has all of the keywords"""
+    parameters = inspect.signature(routine).parameters
+    return all(keyword in parameters for keyword in keywords)
+
+
+def cases(spacing, use_cf):
+    """Benchmark cases for one grid spacing as (name, grid, input, plot)
+    where plot makes the plot between gopen and gclose"""
+    x, y = regular_grid(spacing)
+    lons, lats = np.meshgrid(x, y)
+    data = field_data(lons, lats)
+    lons2d, lats2d = orca_grid(spacing)
+    orca_data = field_data(lons2d, lats2d)
+    stride = max(1, int(round(5 / spacing)))
+
+    out = [
+        ('con_fill', 'regular', 'numpy',
+         lambda: cfp.con(f=data, x=x, y=y, ptype=1, lines=False)),
+        ('con_lines', 'regular', 'numpy',
+         lambda: cfp.con(f=data, x=x, y=y, ptype=1, fill=False)),
+        ('con_blockfill', 'regular', 'numpy',
+         lambda: cfp.con(f=data, x=x, y=y, ptype=1, blockfill=True, lines=False)),
+        ('con_blockfill_fast', 'regular', 'numpy',
+         lambda: cfp.con(f=data, x=x, y=y, ptype=1, blockfill=True,
+                         blockfill_fast=True, lines=False)),
+        ('con_fill', 'orca', 'numpy',
+         lambda: cfp.con(f=orca_data, x=lons2d, y=lats2d, ptype=1, lines=False)),
+        ('vect', 'regular', 'numpy',
+         lambda: cfp.vect(u=data, v=-data, x=x, y=y, stride=stride, scale=100,
+                          ptype=1)),
+        ('stream', 'regular', 'numpy',
+         lambda: cfp.stream(u=data, v=-data, x=x, y=y)),
+        ('stipple', 'regular', 'numpy',
+         lambda: (cfp.con(f=data, x=x, y=y, ptype=1, lines=False),
+                  cfp.stipple(f=data, x=x, y=y, min=10, max=15))),
+        ('lineplot', 'series', 'numpy',
+         lambda: cfp.lineplot(x=np.arange(data.size), y=data.ravel())),
+    ]
+
+    if accepts(cfp.lineplot, 'decimate'):
+        out += [
+            ('lineplot_minmax', 'series', 'numpy',
+             lambda: cfp.lineplot(x=np.arange(data.size), y=data.ravel(),
+                                  decimate='minmax')),
+            ('lineplot_lttb', 'series', 'numpy',
+             lambda: cfp.lineplot(x=np.arange(data.size), y=data.ravel(),
+                                  decimate='lttb')),
+        ]
+
+    if use_cf:
+        field = cf_field(data, x, y)
+        orca_field = cf_orca_field(orca_data, lons2d, lats2d)
+        trajectories = cf_trajectories(spacing)
+        out += [
+            ('con_fill', 'regular', 'cf',
+             lambda: cfp.con(field, lines=False)),
+            ('con_blockfill', 'regular', 'cf',
+             lambda: cfp.con(field, blockfill=True, lines=False)),
+            ('con_fill', 'orca', 'cf',
+             lambda: cfp.con(orca_field, lines=False)),
+            ('traj', 'trajectory', 'cf',
+             lambda: cfp.traj(trajectories)),
+            ('traj_legend_lines', 'trajectory', 'cf',
+             lambda: cfp.traj(trajectories, legend_lines=True)),
+            ('traj_vector', 'trajectory', 'cf',
+             lambda: cfp.traj(trajectories, vector=True, markersize=0)),
+        ]
+
+    return out
+
+
+def versions():
+    """Versions of cf-plot and the packages it uses"""
+    out = {'cfplot': cfp.__version__, 'python': platform.python_version()}
+    for name in ['numpy', 'matplotlib', 'cartopy', 'scipy', 'cf']:
+        try:
+            out[name] = __import__(name).__version__
+        except Exception:
+            out[name] = None
+    return out
+
+
+def run(spacings, names, repeat, output):
+    """Time the cases and write the results to output"""
+    try:
+        cf_field(np.zeros((2, 2)), np.arange(2.0), np.arange(2.0))
+        use_cf = True
+    except Exception:
+        use_cf = False
+        print('cf-python fields could not be made - only NumPy arrays are used')
+
+    results = []
+    report = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+              'machine': platform.node(), 'versions': versions(),
+              'repeat': repeat, 'results': results}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        file = os.path.join(tmpdir, 'plot.png')
+
+        # Warm up so that the imports and NaturalEarth data are not timed
+        x, y = regular_grid(10.0)
+        with plot_context():
+            cfp.reset()
+            cfp.gopen(file=file)
+            cfp.con(f=field_data(*np.meshgrid(x, y)), x=x, y=y, ptype=1)
+            cfp.gclose(view=False)
+
+        print('{:20s} {:11s} {:6s} {:>8s} {:>9s} {:>9s}'.format(
+              'case', 'grid', 'input', 'spacing', 'plot s', 'gclose s'))
+        for spacing in spacings:
+            for name, grid, source, make_plot in cases(spacing, use_cf):
+                if names and name not in names:
+                    continue
+                best = None
+                error = None
+                for i in range(repeat):
+                    with plot_context():
+                        cfp.reset()
+                        try:
+                            start = time.perf_counter()
+                            cfp.gopen(file=file)
+                            make_plot()
+                            middle = time.perf_counter()
+                            cfp.gclose(view=False)
+                            end = time.perf_counter()
+                        except Exception as exception:
+                            error = '{}: {}'.format(type(exception).__name__, exception)
+                            cfp.plot.close('all')
+                            break
+                    if best is None or end - start < best[0] + best[1]:
+                        best = [middle - start, end - middle]
+
+                result = {'case': name, 'grid': grid, 'input': source,
+                          'spacing': spacing, 'error': error,
+                          'plot': None, 'gclose': None}
+                if error is None:
+                    result['plot'], result['gclose'] = best
+                    print('{:20s} {:11s} {:6s} {:8.2f} {:9.3f} {:9.3f}'.format(
+                          name, grid, source, spacing, best[0], best[1]))
+                else:
+                    print('{:20s} {:11s} {:6s} {:8.2f} failed - {}'.format(
+                          name, grid, source, spacing, error.strip().splitlines()[-1]))
+                results.append(result)
+
+                # Written after each case so a long run keeps its results
+                with open(output, 'w') as json_file:
+                    json.dump(report, json_file, indent=1)
+
+    print('Results written to', output)
+
+
+def compare(old_file, new_file):
+    """Print the times of two sets of results side by side"""
+    with open(old_file) as json_file:
+        old = json.load(json_file)
+    with open(new_file) as json_file:
+        new = json.load(json_file)
+
+    def key(result):
+        return (result['case'], result['grid'], result['input'], result['spacing'])
+
+    old_results = {key(result): result for result in old['results']}
+    print('cf-plot', old['versions']['cfplot'], 'against', new['versions']['cfplot'])
+    print('{:20s} {:11s} {:6s} {:>8s} {:>9s} {:>9s} {:>7s}'.format(
+          'case', 'grid', 'input', 'spacing', 'old s', 'new s', 'ratio'))
+    for result in new['results']:
+        previous = old_results.get(key(result))
+        if previous is None or previous['error'] or result['error']:
+            continue
+        old_time = previous['plot'] + previous['gclose']
+        new_time = result['plot'] + result['gclose']
+        print('{:20s} {:11s} {:6s} {:8.2f} {:9.3f} {:9.3f} {:7.2f}'.format(
+              result['case'], result['grid'], result['input'], result['spacing'],
+              old_time, new_time, new_time / old_time))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='cf-plot benchmark suite')
+    parser.add_argument('--sizes', default='1,0.5,0.25,0.1',
+                        help='grid spacings in degrees')
+    parser.add_argument('--cases', default='',
+                        help='cases to run - the default is all of them')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of times to time each case')
+    parser.add_argument('--output', default=None,
+                        help='JSON file for the results')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two JSON result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+
+    output = args.output
+    if output is None:
+        output = 'bench_suite_{}_{}.json'.format(
+                 cfp.__version__, datetime.date.today().isoformat())
+    spacings = [float(size) for size in args.sizes.split(',')]
+    names = [name for name in args.cases.split(',') if name]
+    run(spacings, names, args.repeat, output)
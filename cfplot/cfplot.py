@@ -4,51 +4,130 @@ Andy Heaps NCAS-CMS June 2023
 """
 import numpy as np
 import subprocess
-from scipy import interpolate
 import matplotlib
 from copy import deepcopy
 import os
 import sys
-import matplotlib.pyplot as plot
-from matplotlib.collections import PolyCollection
-from distutils.version import StrictVersion
-import cartopy
-import cartopy.crs as ccrs
-import cartopy.util as cartopy_util
-import cartopy.feature as cfeature
-from scipy.interpolate import griddata
-import shapely.geometry as sgeom
-import shapely
-from matplotlib.collections import PatchCollection
-import matplotlib.patches as mpatches
-            
-# Check for the minimum cf-python version
+import re
+import hashlib
+import zipfile
+import functools
+import importlib
+import contextvars
+import threading
+from . import colourmaps
+
+
+# Minimum cf-python version
 cf_version_min = '3.0.0b2'
 errstr = '\n\n cf-python > ' + cf_version_min
 errstr += '\n needs to be installed to use cf-plot \n\n'
-try:
-    import cf
-    if StrictVersion(cf.__version__) < StrictVersion(cf_version_min):
+
+
+# The larger packages cf-python, cartopy, scipy and matplotlib.pyplot are
+# only imported when they are first used.  This keeps importing cf-plot
+# quick, for example for line plots of numpy arrays.
+class lazy_module(object):
+    def __init__(self, importer, *args):
+        '''Initialize a module to be imported by importer(*args) on first use'''
+        self._importer = importer
+        self._args = args
+        self._module = None
+
+    def __getattr__(self, attr):
+        '''Import the module if needed and get the attribute from it'''
+        if self._module is None:
+            self._module = self._importer(*self._args)
+        return getattr(self._module, attr)
+
+
+def version_tuple(version=None):
+    """
+     | version_tuple - convert a version string to a tuple of integers
+     | for comparisons.  Only the first three numbers are used so that
+     | 3.0.0b2 becomes (3, 0, 0).
+     |
+     :Returns:
+      tuple of integers
+     |
+    """
+
+    return tuple(int(val) for val in re.findall(r'\d+', version)[:3])
+
+
+def import_cf():
+    """
+     | import_cf - import cf-python and check for the minimum version
+     | This is an internal routine and is not generally used by the user.
+     |
+     :Returns:
+      cf module
+     |
+    """
+
+    try:
+        import cf
+    except ImportError:
+        raise Warning(errstr)
+    if version_tuple(cf.__version__) < version_tuple(cf_version_min):
         raise Warning(errstr)
-except ImportError:
-    raise Warning(errstr)
 
+    return cf
 
-# Initiate the pvars class
-# This is used for storing plotting variables in cfp.plotvars
-class pvars(object):
-    def __init__(self, **kwargs):
-        '''Initialize a new Pvars instance'''
-        for attr, value in kwargs.items():
-            setattr(self, attr, value)
 
-    def __str__(self):
-        '''x.__str__() <==> str(x)'''
-        a = None
-        v = None
-        out = ['%s = %s' % (a, repr(v))]
-        for a, v in self.__dict__.items():
-            return '\n'.join(out)
+def import_cartopy(name='cartopy'):
+    """
+     | import_cartopy - import cartopy or one of its modules
+     | This is an internal routine and is not generally used by the user.
+     |
+     | name='cartopy' - module to import
+     |
+     :Returns:
+      module
+     |
+    """
+
+    import cartopy
+
+    # Check for user setting of pre_existing_data_dir pointing to central cartopy setup
+    # This is used in the cfview simple setup process
+    try:
+        pre_existing_data_dir = os.environ["pre_existing_data_dir"]
+        cartopy.config["pre_existing_data_dir"] = pre_existing_data_dir
+    except:
+        pass
+
+    return importlib.import_module(name)
+
+
+def cf_isinstance(obj=None, name='Field'):
+    """
+     | cf_isinstance - check if obj is a cf-python object without importing
+     | cf-python.  If cf-python hasn't been imported then obj can't be a
+     | cf-python object.
+     | This is an internal routine and is not generally used by the user.
+     |
+     | obj=None - object to check
+     | name='Field' - name of the cf-python class such as 'Field' or 'FieldList'
+     |
+     :Returns:
+      True or False
+     |
+    """
+
+    cf_module = sys.modules.get('cf')
+    if cf_module is None:
+        return False
+
+    return isinstance(obj, getattr(cf_module, name))
+
+
+cf = lazy_module(import_cf)
+cartopy = lazy_module(import_cartopy)
+ccrs = lazy_module(import_cartopy, 'cartopy.crs')
+cartopy_util = lazy_module(import_cartopy, 'cartopy.util')
+cfeature = lazy_module(import_cartopy, 'cartopy.feature')
+plot = lazy_module(importlib.import_module, 'matplotlib.pyplot')
 
 
 # Check for a display and use the Agg backing store if none is present
@@ -59,15 +138,6 @@ except Exception:
     matplotlib.use('Agg')
 
 
-# Check for user setting of pre_existing_data_dir pointing to central cartopy setup
-# This is used in the cfview simple setup process
-try:
-    pre_existing_data_dir = os.environ["pre_existing_data_dir"]
-    cartopy.config["pre_existing_data_dir"] = pre_existing_data_dir
-except:
-    pass
-
-
 
 # Code to check if the ImageMagick display command is available
 def which(program):
@@ -166,63 +236,398 @@ if os.path.exists(defaults_file):
             if com == 'viewer':
                 global_viewer = val.strip()
 
-# plotvars - global plotting variables
-plotvars = pvars(lonmin=-180, lonmax=180, latmin=-90, latmax=90, proj='cyl',
-                 resolution='110m', plot_type=1, boundinglat=0, lon_0=0,
-                 levels=None,
-                 levels_min=None, levels_max=None, levels_step=None,
-                 norm=None, levels_extend='both', xmin=None,
-                 xmax=None, ymin=None, ymax=None, xlog=None, ylog=None,
-                 rows=1, columns=1, file=None, orientation='landscape',
-                 user_mapset=0, user_gset=0, cscale_flag=0, user_levs=0,
-                 user_plot=0, master_plot=None, plot=None, cs=cscale1,
-                 cs_user='cscale1', mymap=None, xticks=None, yticks=None,
-                 xticklabels=None, yticklabels=None, xstep=None, ystep=None,
-                 xlabel=None, ylabel=None, title=None, title_fontsize=15,
-                 axis_label_fontsize=11, text_fontsize=11,
-                 text_fontweight='normal', axis_label_fontweight='normal',
-                 colorbar_fontsize=11, colorbar_fontweight='normal',
-                 title_fontweight='normal', continent_thickness=None,
-                 continent_color=None, continent_linestyle=None,
-                 pos=1, viewer=global_viewer, global_viewer=global_viewer,
-                 tspace_year=None, tspace_month=None, tspace_day=None,
-                 tspace_hour=None, xtick_label_rotation=0,
-                 xtick_label_align='center', ytick_label_rotation=0,
-                 ytick_label_align='right', legend_text_size=11,
-                 legend_text_weight='normal',
-                 cs_uniform=True, master_title=None,
-                 master_title_location=[0.5, 0.95], master_title_fontsize=30,
-                 master_title_fontweight='normal', dpi=None,
-                 plot_xmin=None, plot_xmax=None, plot_ymin=None,
-                 plot_ymax=None, land_color=None, ocean_color=None,
-                 lake_color=None, feature_zorder=99, twinx=False, twiny=False,
-                 rotated_grid_thickness=2.0, rotated_grid_spacing=10,
-                 rotated_deg_spacing=0.75, rotated_continents=True,
-                 rotated_grid=True, rotated_labels=True,
-                 legend_frame=True, legend_frame_edge_color='k',
-                 legend_frame_face_color=None, degsym=global_degsym,
-                 axis_width=None, grid_x_spacing=60, grid_y_spacing=30,
-                 grid_colour='k', grid_linestyle='--', grid_zorder=100,
-                 grid_thickness=1.0, aspect='equal',
-                 graph_xmin=None, graph_xmax=None,
-                 graph_ymin=None, graph_ymax=None,
-                 level_spacing=None, tight=False, gpos_called=False,
-                 titles_con_called=False)
+# Default plotting variables of a plot context - see pvars
+plotvars_defaults = dict(lonmin=-180, lonmax=180, latmin=-90, latmax=90, proj='cyl',
+                         resolution='110m', plot_type=1, boundinglat=0, lon_0=0,
+                         lat_0=40,
+                         levels=None,
+                         levels_min=None, levels_max=None, levels_step=None,
+                         norm=None, levels_extend='both', xmin=None,
+                         xmax=None, ymin=None, ymax=None, xlog=None, ylog=None,
+                         rows=1, columns=1, file=None, orientation='landscape',
+                         user_mapset=0, user_gset=0, cscale_flag=0, user_levs=0,
+                         user_plot=0, master_plot=None, plot=None, cs=cscale1,
+                         cs_user='cscale1', mymap=None, xticks=None, yticks=None,
+                         xticklabels=None, yticklabels=None, xstep=None, ystep=None,
+                         xlabel=None, ylabel=None, title=None, title_fontsize=15,
+                         axis_label_fontsize=11, text_fontsize=11,
+                         text_fontweight='normal', axis_label_fontweight='normal',
+                         colorbar_fontsize=11, colorbar_fontweight='normal',
+                         title_fontweight='normal', continent_thickness=None,
+                         continent_color=None, continent_linestyle=None,
+                         pos=1, viewer=global_viewer, global_viewer=global_viewer,
+                         tspace_year=None, tspace_month=None, tspace_day=None,
+                         tspace_hour=None, xtick_label_rotation=0,
+                         xtick_label_align='center', ytick_label_rotation=0,
+                         ytick_label_align='right', legend_text_size=11,
+                         legend_text_weight='normal',
+                         cs_uniform=True, master_title=None,
+                         master_title_location=[0.5, 0.95], master_title_fontsize=30,
+                         master_title_fontweight='normal', dpi=None,
+                         plot_xmin=None, plot_xmax=None, plot_ymin=None,
+                         plot_ymax=None, land_color=None, ocean_color=None,
+                         lake_color=None, feature_zorder=99, twinx=False, twiny=False,
+                         rotated_grid_thickness=2.0, rotated_grid_spacing=10,
+                         rotated_deg_spacing=0.75, rotated_continents=True,
+                         rotated_grid=True, rotated_labels=True,
+                         legend_frame=True, legend_frame_edge_color='k',
+                         legend_frame_face_color=None, degsym=global_degsym,
+                         axis_width=None, grid_x_spacing=60, grid_y_spacing=30,
+                         grid_colour='k', grid_linestyle='--', grid_zorder=100,
+                         grid_thickness=1.0, aspect='equal',
+                         graph_xmin=None, graph_xmax=None,
+                         graph_ymin=None, graph_ymax=None,
+                         level_spacing=None, tight=False, gpos_called=False,
+                         titles_con_called=False, cache_dir=None,
+                         map_template=None, frame_artists=None, frame_update=False,
+                         files_written=None, image=None, grid=True,
+                         fontweight='normal', profile=False, profile_stages=None,
+                         profile_depth=0, profile_time=None, profile_result=None)
+
+# Rotated pole coastlines already located on a grid - see rotated_coastlines
+rotated_coastline_cache = {}
+
+# Colour scales already read in - see cscale_palette
+colour_scale_registry = {}
+colour_scale_bundle = None
+
+# Map projections, limits and projected features - see set_map and map_feature
+map_template_cache = {}
+projected_geometry_cache = {}
+
+# Windows and triangulations of irregular grids - see irregular_mesh
+irregular_mesh_cache = {}
+
+# Ticks and labels of time axes - see timeaxis
+time_axis_cache = {}
+
+# Reference images and times of the regression examples - see regression_images
+regression_file = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'regression.npz')
+
+# The caches are shared by the plot contexts of all threads so entries
+# are stored and removed holding cache_lock - see cache_store
+cache_lock = threading.Lock()
+
+# cartopy and the figures kept by pyplot are not thread-safe so the
+# routines that draw on maps hold plot_lock while they run and pyplot
+# figures are made and closed holding it - see plot_locked.  Figures are
+# saved without the lock so separate figures are saved at the same time.
+plot_lock = threading.RLock()
+
+# Settings of the plot context of each job of a render_many worker process
+render_worker_settings = None
 
 # Check for iPython notebook inline
 # and set the viewer to None if found
-is_inline = 'inline' in matplotlib.get_backend()
+# The backend is only checked if it is already known so that
+# matplotlib.pyplot isn't imported to find it
+is_inline = False
+if 'matplotlib.pyplot' in sys.modules or 'MPLBACKEND' in os.environ:
+    is_inline = 'inline' in matplotlib.get_backend()
 if is_inline:
-    plotvars.viewer = None
+    plotvars_defaults['viewer'] = None
 
 # Check for OSX and if so use matplotlib for for the viewer
 # Not all users will have ImageMagick installed / XQuartz running
 # Users can still select this with cfp.setvars(viewer='display')
 if sys.platform == 'darwin':
-    plotvars.global_viewer = 'matplotlib'
-    plotvars.viewer = 'matplotlib'
+    plotvars_defaults['global_viewer'] = 'matplotlib'
+    plotvars_defaults['viewer'] = 'matplotlib'
+
+
+# Initiate the pvars class
+# This is used for storing plotting variables in cfp.plotvars
+class pvars(object):
+    __slots__ = tuple(plotvars_defaults) + ('context_tokens',)
+
+    def __init__(self, **kwargs):
+        '''Initialize a new Pvars instance'''
+        for attr, value in kwargs.items():
+            setattr(self, attr, value)
+        self.context_tokens = []
+
+    def __str__(self):
+        '''x.__str__() <==> str(x)'''
+        out = ['%s = %s' % (a, repr(getattr(self, a, None)))
+               for a in plotvars_defaults]
+        return '\n'.join(out)
+
+    def __enter__(self):
+        '''Make this the current plot context'''
+        self.context_tokens.append(plotvars_context.set(self))
+        return self
+
+    def __exit__(self, *args):
+        '''Return to the previous plot context'''
+        plotvars_context.reset(self.context_tokens.pop())
+
+
+class context_plotvars(object):
+    __slots__ = ()
+
+    def __getattr__(self, attr):
+        '''Get a plotting variable of the current plot context'''
+        return getattr(plotvars_context.get(), attr)
+
+    def __setattr__(self, attr, value):
+        '''Set a plotting variable of the current plot context'''
+        setattr(plotvars_context.get(), attr, value)
+
+    def __str__(self):
+        '''x.__str__() <==> str(x)'''
+        return str(plotvars_context.get())
+
+
+# plotvars - global plotting variables
+# These are the plotting variables of the default plot context.  Other
+# plot contexts are made with plot_context and cfp.plotvars always refers
+# to the variables of the current plot context.
+global_plotvars = pvars(**plotvars_defaults)
+plotvars_context = contextvars.ContextVar('plotvars', default=global_plotvars)
+plotvars = context_plotvars()
+
+# tracemalloc was started by setvars(profile=True)
+profile_tracemalloc = False
+
+
+def profiled(function):
+    """
+     | profiled - decorator to record the calls of a routine as a stage of
+     | the plot when profiling is turned on with setvars(profile=True)
+     | This is an internal routine and is not generally used by the user.
+     |
+     | function - routine to record
+     |
+     :Returns:
+      wrapped routine
+     |
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not plotvars.profile:
+            return function(*args, **kwargs)
+
+        record = profile_start(function.__name__, *args, *kwargs.values())
+        result = None
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            profile_stop(record, result)
+        return result
+
+    return wrapper
+
+
+def plot_locked(function):
+    """
+     | plot_locked - decorator to hold plot_lock while a routine that
+     | may draw on a map runs.  The maps of plots made in several threads
+     | are drawn in turn as cartopy is not thread-safe.
+     | This is an internal routine and is not generally used by the user.
+     |
+     | function - routine to lock
+     |
+     :Returns:
+      wrapped routine
+     |
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with plot_lock:
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def cache_store(cache=None, key=None, value=None, size=None):
+    """
+     | cache_store - store a value in one of the module caches holding
+     | cache_lock.  The oldest entry is removed if the cache is full.
+     | This is an internal routine and is not generally used by the user.
+     |
+     | cache=None - cache dictionary
+     | key=None - key of the value
+     | value=None - value to store
+     | size=None - maximum number of entries in the cache
+     |
+     :Returns:
+      the value in the cache - this is the value stored by another
+      thread if it stored one first
+     |
+    """
+
+    with cache_lock:
+        if key in cache:
+            return cache[key]
+        while size is not None and len(cache) >= size:
+            cache.pop(next(iter(cache), None), None)
+        cache[key] = value
+    return value
+
+
+def profile_arrays(*values):
+    """
+     | profile_arrays - shapes of the arrays and fields in values
+     | This is an internal routine and is not generally used by the user.
+     |
+     | values - values to look for arrays in.  Tuples and lists are searched
+     |          one level down.
+     |
+     :Returns:
+      list of shapes
+     |
+    """
+
+    shapes = []
+    for value in values:
+        if isinstance(value, (tuple, list)):
+            shapes.extend(profile_arrays(*[val for val in value
+                                           if not isinstance(val, (tuple, list))]))
+        elif isinstance(value, np.ndarray) or cf_isinstance(value, 'Field'):
+            shapes.append(list(np.shape(value)))
+
+    return shapes
+
+
+def profile_start(stage=None, *arrays):
+    """
+     | profile_start - start recording a stage of the plot when profiling
+     | is turned on with setvars(profile=True)
+     | This is an internal routine and is not generally used by the user.
+     |
+     | stage=None - name of the stage
+     | arrays - input arrays of the stage
+     |
+     :Returns:
+      record of the stage or None if profiling is off
+     |
+    """
+
+    if not plotvars.profile:
+        return None
+
+    import time
+    import tracemalloc
+
+    if plotvars.profile_stages is None:
+        plotvars.profile_stages = []
+        plotvars.profile_depth = 0
+        plotvars.profile_time = time.perf_counter()
+
+    record = {'stage': stage, 'depth': plotvars.profile_depth,
+              'start': time.perf_counter() - plotvars.profile_time,
+              'time': None, 'memory': None,
+              'inputs': profile_arrays(*arrays), 'outputs': []}
+    plotvars.profile_stages.append(record)
+    plotvars.profile_depth += 1
+
+    # Kept out of the record until the stage has finished
+    record['_memory'] = tracemalloc.get_traced_memory()[0]
+    record['_time'] = time.perf_counter()
+
+    return record
+
+
+def profile_stop(record=None, *arrays):
+    """
+     | profile_stop - finish recording a stage of the plot
+     | This is an internal routine and is not generally used by the user.
+     |
+     | record=None - record returned by profile_start
+     | arrays - output arrays of the stage
+     |
+     :Returns:
+      None
+     |
+    """
+
+    if record is None:
+        return
+
+    import time
+    import tracemalloc
+
+    record['time'] = time.perf_counter() - record.pop('_time')
+    record['memory'] = tracemalloc.get_traced_memory()[0] - record.pop('_memory')
+    record['outputs'] = profile_arrays(*arrays)
+    plotvars.profile_depth = max(plotvars.profile_depth - 1, 0)
+
+
+def profile_report(file=None):
+    """
+     | profile_report - report of the time spent in each stage of the last
+     | plot closed with gclose while profiling was turned on with
+     | setvars(profile=True)
+     |
+     | file=None - also write the report to this JSON file
+     |
+     | The report is a dictionary of:
+     |     'file' - graphics file of the plot
+     |     'time' - wall time in seconds from the first stage to the end of gclose
+     |     'stages' - list of the stages in the order they started.  Each stage
+     |                is a dictionary of 'stage' - the name, 'depth' - how many
+     |                stages it is inside, 'start' - start time in seconds,
+     |                'time' - wall time in seconds, 'memory' - change in the
+     |                memory allocated in bytes, 'inputs' and 'outputs' - shapes
+     |                of the input and output arrays.
+     |     'summary' - dictionary of the number of 'calls', total 'time' and
+     |                 total 'memory' for each stage name.  Times include the
+     |                 stages inside.
+     |
+     :Returns:
+      report or None if there is no report
+     |
+    """
+
+    report = plotvars.profile_result
+    if report is not None and file is not None:
+        import json
+        with open(file, 'w') as json_file:
+            json.dump(report, json_file, indent=1)
+
+    return report
+
+
+def profile_finish(file=None):
+    """
+     | profile_finish - make the profile report when gclose closes a plot
+     | This is an internal routine and is not generally used by the user.
+     |
+     | file=None - graphics file of the plot
+     |
+     :Returns:
+      None
+     |
+    """
 
+    import time
 
+    stages = plotvars.profile_stages
+    if stages is None:
+        return
+
+    summary = {}
+    for record in stages:
+        # Stages that did not finish are left out of the summary
+        if record['time'] is None:
+            continue
+        total = summary.setdefault(record['stage'], {'calls': 0, 'time': 0.0, 'memory': 0})
+        total['calls'] += 1
+        total['time'] += record['time']
+        total['memory'] += record['memory']
+
+    plotvars.profile_result = {'file': file,
+                               'time': time.perf_counter() - plotvars.profile_time,
+                               'stages': stages,
+                               'summary': summary}
+    plotvars.profile_stages = None
+    plotvars.profile_depth = 0
+
+
+@plot_locked
 def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_labels=True,
         title=None, colorbar_title=None, colorbar=True,
         colorbar_label_skip=None, ptype=0, negative_linestyle='solid',
@@ -366,29 +771,29 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         blockfill_irregular = True
         fill = False
         irregular = True
-        if isinstance(f, cf.Field):
+        if cf_isinstance(f, 'Field'):
             field = f.array
         else:
             field = f
-        field_orig = deepcopy(field)
-        if isinstance(face_lons, cf.Field):
+        field_orig = field
+        if cf_isinstance(face_lons, 'Field'):
             face_lons_array = face_lons.array
         else:
             face_lons_array = face_lons
 
-        if isinstance(face_lats, cf.Field):
+        if cf_isinstance(face_lats, 'Field'):
             face_lats_array = face_lats.array
         else:
             face_lats_array = face_lats
 
-        if isinstance(face_connectivity, cf.Field):
+        if cf_isinstance(face_connectivity, 'Field'):
             face_connectivity_array = face_connectivity.array
         else:
             face_connectivity_array = face_connectivity
 
     # Set blockfill_2d if blockfill and x and y are 2D
     blockfill_2d = False
-    if blockfill and not isinstance(f, cf.Field):
+    if blockfill and not cf_isinstance(f, 'Field'):
         if np.ndim(x) == 2 and np.ndim(y) == 2:
             blockfill_2d = True
 
@@ -401,7 +806,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
     # Extract required data for contouring
     # If a cf-python field
-    if isinstance(f, cf.Field):
+    if cf_isinstance(f, 'Field'):
     
         ndims = np.squeeze(f.data).ndim
         if ndims > 2:
@@ -422,7 +827,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
             xlabel = user_xlabel
         if user_ylabel is not None:
             ylabel = user_ylabel
-    elif isinstance(f, cf.FieldList):
+    elif cf_isinstance(f, 'FieldList'):
         raise TypeError("\n\ncfp.con - cannot contour a field list\n\n")
     else:
         if verbose:
@@ -476,9 +881,10 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
     # Set contour lines off on block plots
     if blockfill:
         fill = False
-        field_orig = deepcopy(field)
-        x_orig = deepcopy(x)
-        y_orig = deepcopy(y)
+        # The data and grid are not changed in place so these are not copies
+        field_orig = field
+        x_orig = x
+        y_orig = y
 
         # Check number of colours and levels match if user has modified the
         # number of colours
@@ -542,7 +948,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                                               
         # If a cyclindrical map has been set then try to subspace the data and make a new set of levels
         myfield = None
-        if ptype == 1 and plotvars.user_mapset and isinstance(f, cf.Field):
+        if ptype == 1 and plotvars.user_mapset and cf_isinstance(f, 'Field'):
             if plotvars.proj == 'cyl':
                 try:
                     myfield = f.subspace(X=cf.wi(plotvars.lonmin, plotvars.lonmax),
@@ -722,7 +1128,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
     # Check if data is well formed
     # i.e. dimensions have only recognizable X, Y, Z, T or a subset
     well_formed = False
-    if isinstance(f, cf.Field):
+    if cf_isinstance(f, 'Field'):
         well_formed = check_well_formed(f)
         
         
@@ -826,11 +1232,14 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                 # Matplotlib tricontour cannot plot missing data so we need to split 
                 # the missing data into a separate field to deal with this
 
-                field_modified = deepcopy(field)
-                pts_nan = np.where(np.isnan(field_modified))
-                field_modified[pts_nan] = -1e30
+                field_modified = field
+                pts_nan = np.isnan(field)
+                if np.any(pts_nan):
+                    field_modified = np.where(pts_nan, -1e30, field)
 
-                field_irregular, lons_irregular, lats_irregular = irregular_window(field_modified, x, y)
+                mesh = irregular_mesh(x, y)
+                field_irregular, lons_irregular, lats_irregular = irregular_window(field_modified, x, y,
+                                                                                   mesh=mesh)
                 #pts_real  = np.where(np.isfinite(field_irregular))
                 pts_real = np.where(field_irregular > -1e29)
                 pts_nan = np.where(field_irregular < -1e29)
@@ -840,16 +1249,14 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                 lons_irregular_nan = []
                 lats_irregular_nan = []
                 if np.size(pts_nan) > 0:
-                    field_irregular_nan = deepcopy(field_irregular)
-                    lons_irregular_nan = deepcopy(lons_irregular)
-                    lats_irregular_nan = deepcopy(lats_irregular)
-                    field_irregular_nan[:] = 0
-                    field_irregular_nan[pts_nan] = 1
+                    field_irregular_nan = (field_irregular < -1e29).astype(float)
+                    lons_irregular_nan = lons_irregular
+                    lats_irregular_nan = lats_irregular
 
 
-                field_irregular_real = deepcopy(field_irregular[pts_real])
-                lons_irregular_real = deepcopy(lons_irregular[pts_real])
-                lats_irregular_real = deepcopy(lats_irregular[pts_real])
+                field_irregular_real = field_irregular[pts_real]
+                lons_irregular_real = lons_irregular[pts_real]
+                lats_irregular_real = lats_irregular[pts_real]
 
 
         if not irregular:
@@ -918,6 +1325,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
 
 
+        # Artists drawn for the field - see con_frames
+        field_start = frame_artists()
+
+        stage = profile_start('fill', field)
+
         # Filled contours
         if fill:
             if verbose:
@@ -937,8 +1349,10 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                 cmap.set_over(plotvars.cs[-1])
 
             # For fast map contours add transform_first=True to contourf command
-            # and make lons and lats 2D
-            if transform_first is None and np.ndim(lons) == 1 and np.ndim(lats) == 1:
+            # and make lons and lats 2D.  Irregular points are contoured with
+            # tricontourf and don't need this.
+            if (transform_first is None and not irregular and
+                    np.ndim(lons) == 1 and np.ndim(lats) == 1):
                 if np.size(lons) >= 400:
                     transform_first = True
                     
@@ -965,7 +1379,8 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                 if np.size(field_irregular_real) > 0: 
                     print('lons_irregular_real, lats_irregular_real, field_irregular_real are ', np.shape(lons_irregular_real),\
                            np.shape(lats_irregular_real), np.shape(field_irregular_real))
-                    plotvars.image = mymap.tricontourf(lons_irregular_real, lats_irregular_real, field_irregular_real * fmult,
+                    triangulation = irregular_triangulation(mesh, lons_irregular_real, lats_irregular_real)
+                    plotvars.image = mymap.tricontourf(triangulation, field_irregular_real * fmult,
                                       clevs, extend=plotvars.levels_extend,
                                       cmap=cmap, norm=plotvars.norm,
                                       alpha=alpha, transform=ccrs.PlateCarree(),
@@ -975,7 +1390,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         if blockfill:
             if verbose:
                 print('con - adding blockfill')
-            if isinstance(f, cf.Field):
+            if cf_isinstance(f, 'Field'):
 
                 if f.ref('grid_mapping_name:transverse_mercator', default=False):
                     # Special case for transverse mercator
@@ -1018,6 +1433,9 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                        face_connectivity=face_connectivity_array, clevs=clevs,
                        alpha=alpha, zorder=zorder)
 
+        profile_stop(stage)
+        stage = profile_start('lines', field)
+
         # Contour lines and labels
         if lines:
             if verbose:
@@ -1028,7 +1446,8 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                                    linewidths=linewidths, linestyles=linestyles, alpha=alpha,
                                    transform=ccrs.PlateCarree(), zorder=zorder)
             else:
-                cs = mymap.tricontour(lons_irregular_real, lats_irregular_real, field_irregular_real * fmult,
+                triangulation = irregular_triangulation(mesh, lons_irregular_real, lats_irregular_real)
+                cs = mymap.tricontour(triangulation, field_irregular_real * fmult,
                                       clevs, colors=colors,
                                       linewidths=linewidths, linestyles=linestyles, alpha=alpha,
                                       transform=ccrs.PlateCarree(), zorder=zorder)
@@ -1057,40 +1476,49 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         if irregular and not blockfill_irregular and not orca and not blockfill_2d:
             if np.size(field_irregular_nan) > 0:
                 cmap_white = matplotlib.colors.ListedColormap([1.0, 1.0, 1.0])
-                mymap.tricontourf(lons_irregular_nan, lats_irregular_nan, field_irregular_nan , [0.5, 1.5],
+                triangulation = irregular_triangulation(mesh, lons_irregular_nan, lats_irregular_nan)
+                mymap.tricontourf(triangulation, field_irregular_nan , [0.5, 1.5],
                                   extend='neither',
                                   cmap=cmap_white, norm=plotvars.norm,
                                   alpha=alpha, transform=ccrs.PlateCarree(),
                                   zorder=zorder)
-
-        # Axes
-        plot_map_axes(axes=axes, xaxis=xaxis, yaxis=yaxis,
-                      xticks=xticks, xticklabels=xticklabels,
-                      yticks=yticks, yticklabels=yticklabels,
-                      user_xlabel=user_xlabel, user_ylabel=user_ylabel,
-                      verbose=verbose)
-
-        # Coastlines and features
+        profile_stop(stage)
+
+        # The axes are kept for later frames of con_frames
+        if not frame_artists_added(field_start):
+            # Axes
+            plot_map_axes(axes=axes, xaxis=xaxis, yaxis=yaxis,
+                          xticks=xticks, xticklabels=xticklabels,
+                          yticks=yticks, yticklabels=yticklabels,
+                          user_xlabel=user_xlabel, user_ylabel=user_ylabel,
+                          verbose=verbose)
+
+        # Coastlines and features are drawn over the field for each frame
+        field_start = frame_artists()
         feature = cfeature.NaturalEarthFeature(name='land',
                                                category='physical',
                                                scale=plotvars.resolution,
                                                facecolor='none')
-        mymap.add_feature(feature,
+        mymap.add_feature(map_feature(feature),
                           edgecolor=continent_color,
                           linewidth=continent_thickness,
                           linestyle=continent_linestyle,
                           zorder=zorder)
 
         if ocean_color is not None:
-            mymap.add_feature(cfeature.OCEAN, edgecolor='face', facecolor=ocean_color,
+            mymap.add_feature(map_feature(cfeature.OCEAN), edgecolor='face', facecolor=ocean_color,
                               zorder=plotvars.feature_zorder)
         if land_color is not None:
-            mymap.add_feature(cfeature.LAND, edgecolor='face', facecolor=land_color,
+            mymap.add_feature(map_feature(cfeature.LAND), edgecolor='face', facecolor=land_color,
                               zorder=plotvars.feature_zorder)
         if lake_color is not None:
-            mymap.add_feature(cfeature.LAKES, edgecolor='face', facecolor=lake_color,
+            mymap.add_feature(map_feature(cfeature.LAKES), edgecolor='face', facecolor=lake_color,
                               zorder=plotvars.feature_zorder)
 
+        # Only the field is redrawn for later frames of con_frames
+        if frame_artists_added(field_start):
+            return
+
         if grid:
             map_grid()
 
@@ -1131,10 +1559,8 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
         # Work out which way is up
         positive = None
-        myz = find_z(f)
-        
-        
-        if isinstance(f, cf.Field) and well_formed:
+        if cf_isinstance(f, 'Field') and well_formed:
+            myz = find_z(f)
             if hasattr(f.construct(myz), 'positive'):
                 positive = f.construct(myz).positive
             else:
@@ -1259,7 +1685,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
         # Time - height contour plot
         if ptype == 7:
-            if isinstance(f, cf.Field):
+            if cf_isinstance(f, 'Field'):
                 if plotvars.user_gset == 0:
                     tmin = f.construct('T').dtarray[0]
                     tmax = f.construct('T').dtarray[-1]
@@ -1284,7 +1710,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
             if ptype == 7:
                 # time-pressure
-                if isinstance(f, cf.Field):
+                if cf_isinstance(f, 'Field'):
 
                     # Change plotvars.xmin and plotvars.xmax from a date string
                     # to a number
@@ -1334,6 +1760,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         # then changed on the colorbar and plot after the plot is made
         colmap = cscale_get_map()
 
+        # Artists drawn for the field - see con_frames
+        field_start = frame_artists()
+
+        stage = profile_start('fill', field)
+
         # Filled contours
         if fill:
             colmap = cscale_get_map()
@@ -1353,7 +1784,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
         # Block fill
         if blockfill:
-            if isinstance(f, cf.Field):
+            if cf_isinstance(f, 'Field'):
 
                 hasbounds = True
 
@@ -1395,6 +1826,9 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                 bfill(f=field_orig * fmult, x=x_orig, y=y_orig, clevs=clevs,
                       lonlat=False, bound=0, alpha=alpha, fast=blockfill_fast, zorder=zorder)
 
+        profile_stop(stage)
+        stage = profile_start('lines', field)
+
         # Contour lines and labels
         if lines:
             cs = plotvars.plot.contour(
@@ -1415,6 +1849,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                                                linewidths=zero_thick,
                                                linestyles=linestyles, alpha=alpha,
                                                zorder=zorder)
+        profile_stop(stage)
+
+        # Only the field is redrawn for later frames of con_frames
+        if frame_artists_added(field_start):
+            return
 
         # Titles for dimensions
         if titles:
@@ -1604,6 +2043,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         # then changed on the colorbar and plot after the plot is made
         colmap = cscale_get_map()
 
+        # Artists drawn for the field - see con_frames
+        field_start = frame_artists()
+
+        stage = profile_start('fill', field)
+
         # Filled contours
         if fill:
             colmap = cscale_get_map()
@@ -1623,7 +2067,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
         # Block fill
         if blockfill:
-            if isinstance(f, cf.Field):
+            if cf_isinstance(f, 'Field'):
                 if f.coord('X').has_bounds():
                     if ptype == 4:
                         xpts = np.squeeze(f.coord('X').bounds.array)[:, 0]
@@ -1653,6 +2097,9 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                 bfill(f=field_orig * fmult, x=x_orig, y=y_orig, clevs=clevs,
                       lonlat=False, bound=0, alpha=alpha, fast=blockfill_fast, zorder=zorder)
 
+        profile_stop(stage)
+        stage = profile_start('lines', field)
+
         # Contour lines and labels
         if lines:
             cs = plotvars.plot.contour(x, y, field * fmult, clevs, colors=colors,
@@ -1672,6 +2119,12 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                                                linewidths=zero_thick,
                                                linestyles=linestyles, alpha=alpha,
                                                zorder=zorder)
+        profile_stop(stage)
+
+        # Only the field is redrawn for later frames of con_frames
+        if frame_artists_added(field_start):
+            return
+
         # Titles for dimensions
         if titles:
             dim_titles(title=title_dims)
@@ -1730,11 +2183,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
             gset(xmin=0, xmax=np.size(xpts) - 1,
                  ymin=0, ymax=np.size(ypts) - 1,
                  user_gset=user_gset)
-            plot = plotvars.plot
+            rotated_plot = plotvars.plot
 
         # Set plot limits
         if plotvars.proj == 'UKCP':
-            plot = plotvars.plot
+            rotated_plot = plotvars.plot
             plotargs = {}
 
         if plotvars.proj == 'cyl':
@@ -1765,7 +2218,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                 set_map()
 
             plotargs = {'transform': transform}
-            plot = plotvars.mymap
+            rotated_plot = plotvars.mymap
 
         # Get colour scale for use in contouring
         # If colour bar extensions are enabled then the colour map goes
@@ -1773,6 +2226,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         # then changed on the colorbar and plot after the plot is made
         colmap = cscale_get_map()
 
+        # Artists drawn for the field - see con_frames
+        field_start = frame_artists()
+
+        stage = profile_start('fill', field)
+
         # Filled contours
         if fill:
             colmap = cscale_get_map()
@@ -1784,11 +2242,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                     'max' or plotvars.levels_extend == 'both'):
                 cmap.set_over(plotvars.cs[-1])
 
-            plot.contourf(xpts, ypts, field * fmult, clevs,
-                          extend=plotvars.levels_extend,
-                          cmap=cmap,
-                          norm=plotvars.norm, alpha=alpha,
-                          zorder=zorder, **plotargs)
+            rotated_plot.contourf(xpts, ypts, field * fmult, clevs,
+                                  extend=plotvars.levels_extend,
+                                  cmap=cmap,
+                                  norm=plotvars.norm, alpha=alpha,
+                                  zorder=zorder, **plotargs)
 
         # Block fill
         if blockfill:
@@ -1801,26 +2259,46 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                   alpha=alpha, fast=blockfill_fast,
                   zorder=zorder, transform=transform)
 
+        profile_stop(stage)
+        stage = profile_start('lines', field)
+
         # Contour lines and labels
         if lines:
-            cs = plot.contour(xpts, ypts, field * fmult, clevs, colors=colors,
-                              linewidths=linewidths, linestyles=linestyles,
-                              zorder=zorder, **plotargs)
+            cs = rotated_plot.contour(xpts, ypts, field * fmult, clevs, colors=colors,
+                                      linewidths=linewidths, linestyles=linestyles,
+                                      zorder=zorder, **plotargs)
             if line_labels and type(clevs) != int:
                 nd = ndecs(clevs)
                 fmt = '%d'
                 if nd != 0:
                     fmt = '%1.' + str(nd) + 'f'
-                plot.clabel(cs, fmt=fmt, colors=colors, zorder=zorder,
-                            fontsize=text_fontsize)
+                rotated_plot.clabel(cs, fmt=fmt, colors=colors, zorder=zorder,
+                                    fontsize=text_fontsize)
 
             # Thick zero contour line
             if zero_thick:
-                cs = plot.contour(xpts, ypts, field * fmult,
-                                  [-1e-32, 0], colors=colors,
-                                  linewidths=zero_thick,
-                                  linestyles=linestyles, alpha=alpha,
-                                  zorder=zorder, **plotargs)
+                cs = rotated_plot.contour(xpts, ypts, field * fmult,
+                                          [-1e-32, 0], colors=colors,
+                                          linewidths=zero_thick,
+                                          linestyles=linestyles, alpha=alpha,
+                                          zorder=zorder, **plotargs)
+        profile_stop(stage)
+
+        # Only the field is redrawn for later frames of con_frames
+        if frame_artists_added(field_start):
+            if plotvars.proj == 'cyl':
+                # Coastlines are drawn over the field
+                field_start = frame_artists()
+                feature = cfeature.NaturalEarthFeature(
+                              name='land', category='physical',
+                              scale=plotvars.resolution,
+                              facecolor='none')
+                plotvars.mymap.add_feature(map_feature(feature), edgecolor=continent_color,
+                                           linewidth=continent_thickness,
+                                           linestyle=continent_linestyle,
+                                           zorder=zorder)
+                frame_artists_added(field_start)
+            return
 
         # Titles for dimensions
         if titles:
@@ -1868,15 +2346,17 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
         # Add title and coastlines for cylindrical projection
         if plotvars.proj == 'cyl':
-            # Coastlines
+            # Coastlines - redrawn with the field for con_frames
+            field_start = frame_artists()
             feature = cfeature.NaturalEarthFeature(
                           name='land', category='physical',
                           scale=plotvars.resolution,
                           facecolor='none')
-            plotvars.mymap.add_feature(feature, edgecolor=continent_color,
+            plotvars.mymap.add_feature(map_feature(feature), edgecolor=continent_color,
                                        linewidth=continent_thickness,
                                        linestyle=continent_linestyle,
                                        zorder=zorder)
+            frame_artists_added(field_start)
 
             # Title
             if title != '':
@@ -1909,7 +2389,7 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
 
         cf_field = False
         if f is not None:
-            if isinstance(f, cf.Field):
+            if cf_isinstance(f, 'Field'):
                 cf_field = True
                 f = f.squeeze()
 
@@ -2105,6 +2585,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         # are changed on the colorbar and plot after the plot is made
         colmap = cscale_get_map()
 
+        # Artists drawn for the field - see con_frames
+        field_start = frame_artists()
+
+        stage = profile_start('fill', field)
+
         # Filled contours
         if fill:
             colmap = cscale_get_map()
@@ -2127,6 +2612,9 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
             bfill(f=field_orig * fmult, x=x_orig, y=y_orig, clevs=clevs,
                   lonlat=False, bound=0, alpha=alpha, fast=blockfill_fast, zorder=zorder)
 
+        profile_stop(stage)
+        stage = profile_start('lines', field)
+
         # Contour lines and labels
         if lines:
             cs = plotvars.plot.contour(x, y, field * fmult, clevs, colors=colors,
@@ -2147,6 +2635,11 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
                                            linewidths=zero_thick,
                                            linestyles=linestyles, alpha=alpha,
                                            zorder=zorder)
+        profile_stop(stage)
+
+        # Only the field is redrawn for later frames of con_frames
+        if frame_artists_added(field_start):
+            return
 
         # Titles for dimensions
         if titles:
@@ -2217,41 +2710,360 @@ def con(f=None, x=None, y=None, fill=global_fill, lines=global_lines, line_label
         gclose()
 
 
-def mapset(lonmin=None, lonmax=None, latmin=None, latmax=None, proj='cyl',
-           boundinglat=0, lon_0=0, lat_0=40, resolution='110m', user_mapset=1,
-           aspect=None):
+def con_frames(f=None, x=None, y=None, axis='T', file_pattern='frame_{:04d}.png',
+               verbose=None, **kwargs):
     """
-     | mapset sets the mapping parameters.
-     |
-     | lonmin=lonmin - minimum longitude
-     | lonmax=lonmax - maximum longitude
-     | latmin=latmin - minimum latitude
-     | latmax=latmax - maximum latitude
-     | proj=proj - 'cyl' for cylindrical projection. 'npstere' or 'spstere'
-     |      for northern hemisphere or southern hemisphere polar stereographic.
-     |      ortho, merc, moll, robin and lcc are abreviations for orthographic,
-     |      mercator, mollweide, robinson and lambert conformal projections
-     |      'rotated' for contour plots on the native rotated grid.
+     | con_frames makes a contour plot of each frame of a field along one
+     | axis, such as each time of a time series, and saves each one to a file.
+     |
+     | f=None - field - a cf field or a numpy array
+     | x=None - x locations of the data points for a numpy array
+     | y=None - y locations of the data points for a numpy array
+     | axis='T' - axis to make frames along.  This is an axis identity such
+     |            as 'T' or 'Z' for a cf field or the position of the axis
+     |            for a numpy array, where the default is the first axis.
+     | file_pattern='frame_{:04d}.png' - file name of each frame, made with
+     |                                   file_pattern.format(frame number)
+     | verbose=None - set to 1 to get a verbose idea of what con_frames is doing
+     |
+     | Other keywords are passed to con.
+     |
+     | The contour levels are the same for every frame.  If they have not
+     | been set with cfp.levs they are calculated from all the frames.  The
+     | map, coastlines, axes, titles and colour bar are drawn for the first
+     | frame only and later frames only redraw the contours and coastlines,
+     | so each frame takes little more than the contouring itself.  Contour
+     | line labels of later frames are placed after the colour bar has been
+     | added and may sit slightly differently to those of a con plot.
+     |
+     | If cfp.gopen has been called the frames are plotted in the current
+     | plot and it is left open, otherwise con_frames opens and closes
+     | its own plot.
      |
-     | boundinglat=boundinglat - edge of the viewable latitudes in a
-     |      stereographic plot
-     | lon_0=0 - longitude centre of desired map domain in polar
-     |           stereographic and orthogrphic plots
-     | lat_0=40 - latitude centre of desired map domain in orthogrphic plots
-     | resolution='110m' - the map resolution - can be one of '110m',
-     | '50m' or '10m'.  '50m' means 1:50,000,000 and not 50 metre.
-     | user_mapset=user_mapset - variable to indicate whether a user call
-     |      to mapset has been made.
+     :Returns:
+      list of the files written
      |
-     | The default map plotting projection is the cyclindrical equidistant
-     | projection from -180 to 180 in longitude and -90 to 90 in latitude.
-     | To change the map view in this projection to over the United Kingdom,
-     | for example, you would use
-     | mapset(lonmin=-6, lonmax=3, latmin=50, latmax=60)
-     | or
-     | mapset(-6, 3, 50, 60)
      |
-     | The limits are -360 to 720 in longitude so to look at the equatorial
+    """
+
+    # Find the axis to make frames along
+    if cf_isinstance(f, 'Field'):
+        key = f.domain_axis(axis, key=True)
+        position = f.get_data_axes().index(key)
+    else:
+        f = np.ma.asanyarray(f)
+        position = axis if isinstance(axis, int) else 0
+
+    nframes = np.shape(f)[position]
+    if verbose:
+        print('con_frames - making', nframes, 'frames')
+
+    user_levels = plotvars.user_levs == 1
+    user_plot = plotvars.user_plot
+    if user_plot == 0:
+        gopen(file=file_pattern.format(nframes - 1))
+    resolution_orig = plotvars.resolution
+
+    # Contour levels from all the frames.  These are set after gopen, which
+    # resets levels not set by the user, and are fixed with levs so that con
+    # doesn't calculate new levels for each frame.
+    if not user_levels:
+        spacing = kwargs.get('level_spacing', plotvars.level_spacing)
+        if spacing is None:
+            spacing = 'linear'
+        if cf_isinstance(f, 'Field'):
+            field = f.array
+        else:
+            field = f
+        clevs, mult, fmult = calculate_levels(field=field, level_spacing=spacing,
+                                              verbose=verbose)
+        # Integer levels are kept as they are for the colour bar labels
+        if fmult != 1:
+            clevs = np.array(clevs) / fmult
+        levs(manual=clevs)
+    frame_levels = np.array(plotvars.levels)
+
+    files = []
+    plotvars.frame_artists = []
+    plotvars.frame_update = False
+    try:
+        for frame in np.arange(nframes):
+            if frame > 0:
+                # Remove the field of the previous frame.  Contour sets go
+                # first as they remove their own contour labels.
+                plotvars.frame_artists.sort(
+                    key=lambda artist: not isinstance(artist, matplotlib.contour.ContourSet))
+                for artist in plotvars.frame_artists:
+                    if artist.axes is not None:
+                        artist.remove()
+                plotvars.frame_artists = []
+                plotvars.frame_update = True
+
+                # The colour bar of the first frame is connected to the
+                # norm set by cbar so each frame contours with its own copy
+                if plotvars.norm is not None:
+                    plotvars.norm = deepcopy(plotvars.norm)
+
+            indices = [slice(None)] * np.ndim(f)
+            indices[position] = slice(frame, frame + 1)
+            field = f[tuple(indices)]
+            if not cf_isinstance(field, 'Field'):
+                field = np.ma.squeeze(field, axis=position)
+            con(f=field, x=x, y=y, verbose=verbose, **kwargs)
+            if not np.array_equal(np.array(plotvars.levels), frame_levels):
+                errstr = '\n\ncon_frames error - the contour levels of frame '
+                errstr += str(frame) + ' are not those of the first frame\n\n'
+                raise Warning(errstr)
+
+            # The last frame of a plot opened here is saved by gclose
+            file = file_pattern.format(frame)
+            if frame < nframes - 1 or user_plot == 1:
+                saveargs = {}
+                if plotvars.tight:
+                    saveargs = {'bbox_inches': 'tight'}
+                plotvars.master_plot.savefig(file, orientation=plotvars.orientation,
+                                             dpi=plotvars.dpi, **saveargs)
+                if plotvars.files_written is not None:
+                    plotvars.files_written.append(file)
+            files.append(file)
+    finally:
+        plotvars.frame_artists = None
+        plotvars.frame_update = False
+        if not user_levels:
+            levs()
+
+        # Reset map resolution as con does
+        if plotvars.user_mapset == 0:
+            mapset()
+            mapset(resolution=resolution_orig)
+
+    if user_plot == 0:
+        gclose(view=False)
+
+    return files
+
+
+def frame_artists():
+    """
+     | frame_artists - artists on the axes of the current plot
+     | This is an internal routine and is not generally used by the user.
+     |
+     | No inputs
+     |
+     :Returns:
+      set of the artists, or None if con_frames is not making frames
+     |
+    """
+
+    if plotvars.frame_artists is None:
+        return None
+
+    return set(artist for axes in plotvars.master_plot.axes
+               for artist in axes.get_children())
+
+
+def frame_artists_added(start=None):
+    """
+     | frame_artists_added - note the artists added since frame_artists
+     | This is an internal routine and is not generally used by the user.
+     |
+     | start=None - artists returned by frame_artists before the field was
+     |              plotted
+     |
+     | The artists added are kept in plotvars.frame_artists so that
+     | con_frames can remove them before plotting the next frame.
+     |
+     :Returns:
+      True if only the field is to be plotted for this frame
+     |
+    """
+
+    if start is None:
+        return False
+
+    for artist in frame_artists():
+        if artist not in start:
+            plotvars.frame_artists.append(artist)
+
+    return plotvars.frame_update
+
+
+def render_many(jobs=None, processes=None, chunksize=1):
+    """
+     | render_many makes many plots in parallel in a pool of worker processes.
+     | Each worker process has its own cf-plot settings, uses the Agg backend
+     | and keeps its colour scales, map templates and projected features
+     | from one job to the next.
+     |
+     | jobs=None - list of jobs.  A job is either a function that makes its
+     |             plots when called with no arguments, or a plot description
+     |             which is a dictionary of:
+     |                 'calls' - list of (name, keywords) of the cf-plot
+     |                           routines to call, such as
+     |                           [('mapset', {'proj': 'npstere'}),
+     |                            ('con', {'f': field, 'ptype': 1})]
+     |                 'file' - graphics file.  If given the calls are made
+     |                          between gopen(file=file) and gclose().
+     |                 'gopen' - dictionary of other gopen keywords such as
+     |                           {'rows': 2, 'columns': 2}
+     | processes=None - number of worker processes.  The default is the number
+     |                  of CPUs.
+     | chunksize=1 - number of jobs sent to a worker process at a time
+     |
+     | Jobs and their data are pickled to send them to the worker processes
+     | so functions need to be defined at the top level of a module.  The
+     | worker processes are started afresh so scripts calling render_many
+     | need the usual if __name__ == '__main__': guard.  Settings made with
+     | setvars, mapset, levs and so on in the calling process are not passed
+     | to the worker processes apart from setvars(cache_dir=...), which lets
+     | the workers share their projected map features.
+     |
+     | Results are returned as each job finishes, which is not necessarily
+     | the order of the jobs:
+     |
+     | for index, files, error in cfp.render_many(jobs, processes=8):
+     |     print(index, files, error)
+     |
+     :Returns:
+      iterator of (index of the job, list of the files written, error)
+      where error is None or the traceback of a job that failed
+     |
+    """
+
+    import multiprocessing
+
+    if processes is None:
+        processes = os.cpu_count()
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=processes, initializer=render_worker_init,
+                      initargs=(plotvars.cache_dir,)) as pool:
+        for result in pool.imap_unordered(render_worker, enumerate(jobs),
+                                          chunksize=chunksize):
+            yield result
+
+
+def render_worker_init(cache_dir=None):
+    """
+     | render_worker_init - set up a render_many worker process
+     | This is an internal routine and is not generally used by the user.
+     |
+     | cache_dir=None - cache directory of the calling process
+     |
+     :Returns:
+      None
+     |
+    """
+
+    global render_worker_settings
+
+    matplotlib.use('Agg')
+
+    # Warm up pyplot, cartopy and the default colour scale
+    plot.close('all')
+    import_cartopy('cartopy.feature')
+    cscale()
+
+    render_worker_settings = {'viewer': None, 'cache_dir': cache_dir}
+
+
+def render_worker(task=None):
+    """
+     | render_worker - make the plots of one render_many job
+     | This is an internal routine and is not generally used by the user.
+     |
+     | task=None - (index, job) of the job
+     |
+     :Returns:
+      (index of the job, list of the files written, error)
+     |
+    """
+
+    import traceback
+
+    index, job = task
+
+    # Each job has a new plot context
+    context = plot_context(files_written=[], **render_worker_settings)
+
+    error = None
+    try:
+        with context:
+            render_job(job)
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        plot.close('all')
+
+    return index, context.files_written, error
+
+
+def render_job(job=None):
+    """
+     | render_job - make the plots of a render_many job in the current
+     | plot context
+     | This is an internal routine and is not generally used by the user.
+     |
+     | job=None - function or plot description of the job
+     |
+     :Returns:
+      None
+     |
+    """
+
+    if callable(job):
+        job()
+        return
+
+    file = job.get('file')
+    if file is not None:
+        gopen(file=file, **job.get('gopen', {}))
+    for name, kwargs in job.get('calls', []):
+        routine = globals().get(name)
+        if name.startswith('_') or not callable(routine):
+            errstr = '\n\n cfp.render_many error - ' + str(name)
+            errstr += ' is not a cf-plot routine\n\n'
+            raise Warning(errstr)
+        routine(**kwargs)
+    if file is not None:
+        gclose(view=False)
+
+
+def mapset(lonmin=None, lonmax=None, latmin=None, latmax=None, proj='cyl',
+           boundinglat=0, lon_0=0, lat_0=40, resolution='110m', user_mapset=1,
+           aspect=None):
+    """
+     | mapset sets the mapping parameters.
+     |
+     | lonmin=lonmin - minimum longitude
+     | lonmax=lonmax - maximum longitude
+     | latmin=latmin - minimum latitude
+     | latmax=latmax - maximum latitude
+     | proj=proj - 'cyl' for cylindrical projection. 'npstere' or 'spstere'
+     |      for northern hemisphere or southern hemisphere polar stereographic.
+     |      ortho, merc, moll, robin and lcc are abreviations for orthographic,
+     |      mercator, mollweide, robinson and lambert conformal projections
+     |      'rotated' for contour plots on the native rotated grid.
+     |
+     | boundinglat=boundinglat - edge of the viewable latitudes in a
+     |      stereographic plot
+     | lon_0=0 - longitude centre of desired map domain in polar
+     |           stereographic and orthogrphic plots
+     | lat_0=40 - latitude centre of desired map domain in orthogrphic plots
+     | resolution='110m' - the map resolution - can be one of '110m',
+     | '50m' or '10m'.  '50m' means 1:50,000,000 and not 50 metre.
+     | user_mapset=user_mapset - variable to indicate whether a user call
+     |      to mapset has been made.
+     |
+     | The default map plotting projection is the cyclindrical equidistant
+     | projection from -180 to 180 in longitude and -90 to 90 in latitude.
+     | To change the map view in this projection to over the United Kingdom,
+     | for example, you would use
+     | mapset(lonmin=-6, lonmax=3, latmin=50, latmax=60)
+     | or
+     | mapset(-6, 3, 50, 60)
+     |
+     | The limits are -360 to 720 in longitude so to look at the equatorial
      | Pacific you could use
      | mapset(lonmin=90, lonmax=300, latmin=-30, latmax=30)
      | or
@@ -2529,6 +3341,8 @@ def timeaxis(dtimes=None):
      | timeaxis is used to work out a sensible set of time labels and tick
      | marks given a time span  This is an internal routine and is not used
      | by the user.
+     | The ticks are kept in time_axis_cache so that plots sharing a time
+     | axis, such as the panels of a multi-plot page, only work them out once.
 
      | dtimes=None - data times as a CF variable
 
@@ -2544,35 +3358,60 @@ def timeaxis(dtimes=None):
     """
 
     time_units = dtimes.Units
-    time_ticks = []
-    time_labels = []
-    axis_label = 'Time'
-
-    yearmin = min(dtimes.year.array)
-    yearmax = max(dtimes.year.array)
-    tmin = min(dtimes.dtarray)
-    tmax = max(dtimes.dtarray)
     if hasattr(dtimes, 'calendar'):
         calendar = dtimes.calendar
     else:
         calendar = 'standard'
 
+    # Only the first and last times are made into date-times
+    times = dtimes.array
+    tmin, tmax = np.ravel(cf.Data([np.min(times), np.max(times)], units=time_units,
+                                  calendar=calendar).dtarray)
+
     if plotvars.user_gset != 0:
         if isinstance(plotvars.xmin, str):
-            t = cf.Data(cf.dt(plotvars.xmin), units=time_units, calendar=calendar)
-            yearmin = int(t.year)
-            t = cf.Data(cf.dt(plotvars.xmax), units=time_units, calendar=calendar)
-            yearmax = int(t.year)
             tmin = cf.dt(plotvars.xmin, calendar=calendar)
             tmax = cf.dt(plotvars.xmax, calendar=calendar)
         if isinstance(plotvars.ymin, str):
-            t = cf.Data(cf.dt(plotvars.ymin), units=time_units, calendar=calendar)
-            yearmin = int(t.year)
-            t = cf.Data(cf.dt(plotvars.ymax), units=time_units, calendar=calendar)
-            yearmax = int(t.year)
             tmin = cf.dt(plotvars.ymin, calendar=calendar)
             tmax = cf.dt(plotvars.ymax, calendar=calendar)
 
+    key = (str(tmin), str(tmax), str(time_units), str(calendar),
+           plotvars.tspace_year, plotvars.tspace_day, plotvars.tspace_hour)
+    ticks = time_axis_cache.get(key)
+    if ticks is None:
+        # Keep the most recent time axes only
+        ticks = cache_store(time_axis_cache, key,
+                            timeaxis_ticks(tmin, tmax, time_units, calendar), 32)
+
+    time_ticks, time_labels, axis_label = ticks
+    return(list(time_ticks), list(time_labels), axis_label)
+
+
+def timeaxis_ticks(tmin=None, tmax=None, time_units=None, calendar=None):
+    """
+     | timeaxis_ticks works out the time ticks and labels for timeaxis.
+     | The candidate ticks are made all at once and converted to the time
+     | units in a single step.
+     | This is an internal routine and is not generally used by the user.
+     |
+     | tmin=None - first time as a date-time
+     | tmax=None - last time as a date-time
+     | time_units=None - units of the time axis
+     | calendar=None - calendar of the time axis
+     |
+     :Returns:
+      time ticks, time labels and axis label
+     |
+    """
+
+    time_ticks = []
+    time_labels = []
+    axis_label = 'Time'
+
+    yearmin = int(tmin.year)
+    yearmax = int(tmax.year)
+
     # Years
     span = yearmax - yearmin
     if span > 4 and span < 3000:
@@ -2606,11 +3445,10 @@ def timeaxis(dtimes=None):
         if np.size(tvals) < 2:
             tvals = gvals(dmin=yearmin, dmax=yearmax)[0]
 
-        for year in tvals:
-            time_ticks.append(np.min(
-                (cf.Data(cf.dt(str(int(year)) + '-01-01 00:00:00'),
-                 units=time_units, calendar=calendar).array)))
-            time_labels.append(str(int(year)))
+        years = [int(year) for year in tvals]
+        dates = [cf.dt(year, 1, 1, calendar=calendar) for year in years]
+        time_ticks = timeaxis_encode(dates, time_units, calendar)
+        time_labels = [str(year) for year in years]
 
     # Months
     if yearmax - yearmin <= 4:
@@ -2618,45 +3456,33 @@ def timeaxis(dtimes=None):
         months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
                   'Jul', 'Aug',  'Sep', 'Oct', 'Nov', 'Dec']
 
-        # Check number of labels with 1 month steps
-        tsteps = 0
-        for year in np.arange(yearmax - yearmin + 1) + yearmin:
-            for month in np.arange(12):
-                mytime = cf.dt(str(year) + '-' +
-                               str(month + 1) + '-01 00:00:00', calendar=calendar)
-                if mytime >= tmin and mytime <= tmax:
-                    tsteps = tsteps + 1
-
-        if tsteps < 17:
-            mvals = np.arange(12)
-        if tsteps >= 17:
-            mvals = np.arange(4) * 3
-
-        for year in np.arange(yearmax - yearmin + 1) + yearmin:
-            for month in mvals:
-                mytime = cf.dt(str(year) + '-' +
-                               str(month + 1) + '-01 00:00:00', calendar=calendar)
-                if mytime >= tmin and mytime <= tmax:
-                    time_ticks.append(
-                        np.min((cf.Data(mytime, units=time_units, calendar=calendar).array)))
-                    time_labels.append(
-                        str(months[month]) + ' ' + str(int(year)))
+        # First of each month in the years spanned
+        years, mvals = np.meshgrid(np.arange(yearmin, yearmax + 1), np.arange(12),
+                                   indexing='ij')
+        years = years.ravel()
+        mvals = mvals.ravel()
+        dates = np.empty(years.size, dtype=object)
+        dates[:] = [cf.dt(int(year), int(month) + 1, 1, calendar=calendar)
+                    for year, month in zip(years, mvals)]
+        inside = ((dates >= tmin) & (dates <= tmax)).astype(bool)
+
+        # Use 3 month steps if there are too many labels with 1 month steps
+        if np.sum(inside) >= 17:
+            inside = inside & (mvals % 3 == 0)
+
+        time_ticks.extend(timeaxis_encode(dates[inside], time_units, calendar))
+        time_labels.extend([months[month] + ' ' + str(year)
+                            for year, month in zip(years[inside], mvals[inside])])
 
     # Days and hours
     if np.size(time_ticks) <= 2:
         myday = cf.dt(int(tmin.year), int(tmin.month), int(tmin.day), calendar=calendar)
-        not_found = 0
-        hour_counter = 0
-        span = 0
-        while not_found <= 48:
-            mydate = cf.Data(myday, dtimes.Units) + \
-                cf.Data(hour_counter, 'hour')
-            if mydate >= tmin and mydate <= tmax:
-                span = span + 1
-            else:
-                not_found = not_found + 1
 
-            hour_counter = hour_counter + 1
+        # Hours from the start of the first day
+        hour_units = 'hours since ' + str(myday)
+        hour_min, hour_max = timeaxis_encode([tmin, tmax], hour_units, calendar)
+        hours = np.arange(np.floor(hour_max) + 1)
+        span = np.sum(hours >= hour_min)
 
         step = 1
         if span > 13:
@@ -2678,28 +3504,44 @@ def timeaxis(dtimes=None):
         if plotvars.tspace_day is not None:
             step = plotvars.tspace_day * 24
 
-        not_found = 0
-        hour_counter = 0
         axis_label = 'Time (hour)'
         if span >= 24:
             axis_label = 'Time'
-        time_ticks = []
+
+        hours = np.arange(0, np.floor(hour_max) + 1, step)
+        hours = hours[hours >= hour_min]
+        dates = np.ravel(cf.Data(hours, units=hour_units, calendar=calendar).dtarray)
+        time_ticks = timeaxis_encode(dates, time_units, calendar)
         time_labels = []
+        for hour, date in zip(hours, dates):
+            label = str(date.year) + '-' + str(date.month) + '-' + str(date.day)
+            if hour / 24 != int(hour / 24):
+                label += ' ' + str(date.hour) + ':00:00'
+            time_labels.append(label)
 
-        while not_found <= 48:
-            mytime = cf.Data(myday, dtimes.Units) + cf.Data(hour_counter, 'hour')
-            if mytime >= tmin and mytime <= tmax:
-                time_ticks.append(np.min(mytime.array))
-                label = str(mytime.year) + '-' + str(mytime.month) + '-' + str(mytime.day)
-                if (hour_counter/24 != int(hour_counter/24)):
-                    label += ' ' + str(mytime.hour) + ':00:00'
-                time_labels.append(label)
-            else:
-                not_found = not_found + 1
+    return(time_ticks, time_labels, axis_label)
 
-            hour_counter = hour_counter + step
 
-    return(time_ticks, time_labels, axis_label)
+def timeaxis_encode(dates=None, time_units=None, calendar=None):
+    """
+     | timeaxis_encode converts date-times to numbers in the time units
+     | This is an internal routine and is not generally used by the user.
+     |
+     | dates=None - date-times
+     | time_units=None - units of the time axis
+     | calendar=None - calendar of the time axis
+     |
+     :Returns:
+      list of times in the time units
+     |
+    """
+
+    if np.size(dates) == 0:
+        return []
+
+    dates = np.array(list(dates), dtype=object)
+    times = cf.Data(dates, units=time_units, calendar=calendar).array
+    return [float(time) for time in np.ravel(times)]
 
 
 def ndecs(data=None):
@@ -3009,7 +3851,8 @@ def gopen(rows=1, columns=1, user_plot=1, file='cfplot.png',
      | rows=1 - number of plot rows on the page
      | columns=1 - number of plot columns on the page
      | user_plot=1 - internal plot variable - do not use.
-     | file='cfplot.png' - default file name
+     | file='cfplot.png' - default file name.  A file-like object such as
+     |                     io.BytesIO() is also accepted and has png written to it.
      | orientation='landscape' - orientation - also takes 'portrait'
      | figsize=[11.7, 8.3]  - figure size in inches
      | left=None - left margin in normalised coordinates - default=0.12
@@ -3075,10 +3918,13 @@ def gopen(rows=1, columns=1, user_plot=1, file='cfplot.png',
             raise Warning(errstr)
 
     # Set master plot size
+    # pyplot keeps the figures of all threads so it is used holding plot_lock
     if orientation == 'landscape':
-        plotvars.master_plot = plot.figure(figsize=(figsize[0], figsize[1]))
+        figsize = (figsize[0], figsize[1])
     else:
-        plotvars.master_plot = plot.figure(figsize=(figsize[1], figsize[0]))
+        figsize = (figsize[1], figsize[0])
+    with plot_lock:
+        plotvars.master_plot = plot.figure(figsize=figsize)
 
     # Set margins
     plotvars.master_plot.subplots_adjust(
@@ -3147,20 +3993,27 @@ def gclose(view=True):
     file = plotvars.file
     if file is not None:
         # Save a file
-        type = 1
-        if file[-3:] == '.ps':
-            type = 1
-        if file[-4:] == '.eps':
+        # A file-like object such as io.BytesIO is written as png
+        if isinstance(file, str):
             type = 1
-        if file[-4:] == '.png':
-            type = 1
-        if file[-4:] == '.pdf':
-            type = 1
-        if type is None:
-            file = file + '.png'
+            if file[-3:] == '.ps':
+                type = 1
+            if file[-4:] == '.eps':
+                type = 1
+            if file[-4:] == '.png':
+                type = 1
+            if file[-4:] == '.pdf':
+                type = 1
+            if type is None:
+                file = file + '.png'
+        stage = profile_start('savefig')
         plotvars.master_plot.savefig(
             file, orientation=plotvars.orientation, dpi=plotvars.dpi, **saveargs)
-        plot.close()
+        profile_stop(stage)
+        with plot_lock:
+            plot.close(plotvars.master_plot)
+        if plotvars.files_written is not None:
+            plotvars.files_written.append(file)
     else:
         if plotvars.viewer == 'display' and interactive is False:
             # Use Imagemagick display command if this exists
@@ -3169,13 +4022,13 @@ def gclose(view=True):
                 tfile = 'cfplot.png'
                 plotvars.master_plot.savefig(
                     tfile, orientation=plotvars.orientation, dpi=plotvars.dpi, **saveargs)
-                matplotlib.pyplot.ioff()
+                plot.ioff()
                 subprocess.Popen([disp, tfile])
             else:
                 plotvars.viewer = 'matplotlib'
         if plotvars.viewer == 'matplotlib' or interactive:
             # Use Matplotlib viewer
-            matplotlib.pyplot.ion()
+            plot.ion()
             plot.show()
 
     # Reset plotting
@@ -3194,6 +4047,9 @@ def gclose(view=True):
     plotvars.mymap = None
     plotvars.titles_con_called = False
 
+    # Profile report for this plot
+    profile_finish(file)
+
 
 def gpos(pos=1, xmin=None, xmax=None, ymin=None, ymax=None):
     """
@@ -3508,6 +4364,7 @@ def gvals(dmin=None, dmax=None, mystep=None, mod=True):
     return(vals, mult)
 
 
+@profiled
 def cf_data_assign(f=None, colorbar_title=None, verbose=None, rotated_vect=False):
     """
      | Check cf input data is okay and return data for contour plot.
@@ -3619,9 +4476,7 @@ def cf_data_assign(f=None, colorbar_title=None, verbose=None, rotated_vect=False
     if str(f.dtype) == 'bool':
         warnstr = '\n\n\n Warning - boolean data found - converting to integers\n\n\n'
         print(warnstr)
-        g = deepcopy(f)
-        g.dtype = int
-        field = np.squeeze(g.array)
+        field = field.astype(int)
 
     # Check what plot type is required.
     # 0=simple contour plot, 1=map plot, 2=latitude-height plot,
@@ -3969,6 +4824,7 @@ def check_data(field=None, x=None, y=None):
         raise Warning(errstr)
 
 
+@profiled
 def cscale(scale=None, ncols=None, white=None, below=None,
            above=None, reverse=False, uniform=False):
     """
@@ -4021,26 +4877,54 @@ def cscale(scale=None, ncols=None, white=None, below=None,
         if reverse is not False or uniform is not False:
             plotvars.cscale_flag = 2
 
+    # Look up the colour scale and make the colours
+    key = cscale_palette(scale)
+    if white is not None:
+        white = tuple(np.ravel(white).tolist())
+    plotvars.cs = list(cscale_colours(key, ncols=ncols, white=white, below=below,
+                                      above=above, reverse=reverse, uniform=uniform))
+
+
+def cscale_palette(scale=None):
+    """
+    | cscale_palette - read in a colour scale and add it to the registry
+    | This is an internal routine and is not used by the user.
+    |
+    | scale=None - name of colour map or file of red green blue values
+    |
+    | Each colour scale is read once and kept in colour_scale_registry as
+    | a uint8 (ncolours, 3) array of red, green and blue values.  The
+    | shipped colour scales come from the packed colourmaps.npz bundle if
+    | it has been built for this version of cf-plot, otherwise from their
+    | .rgb files.  User colour scale files are registered by path and
+    | modification time so an edited file is read in again.
+    |
+    :Returns:
+        registry key for the colour scale
+    |
+    """
+
+    global colour_scale_bundle
+
+    if scale in colour_scale_registry:
+        return scale
+
+    # Read all the shipped colour scales from the bundle on first use
+    if colour_scale_bundle is None:
+        from . import __version__
+        colour_scale_bundle = colourmaps.unpack(version=__version__)
+    if scale in colour_scale_bundle:
+        colour_scale_registry[scale] = colour_scale_bundle[scale]
+        return scale
+
     if scale == 'scale1' or scale == '':
-        if scale == 'scale1':
-            myscale = cscale1
-        if scale == 'viridis':
-            myscale = viridis
-        # convert cscale1 or viridis from hex to rgb
-        r = []
-        g = []
-        b = []
-        for myhex in myscale:
-            myhex = myhex.lstrip('#')
-            mylen = len(myhex)
-            rgb = tuple(int(myhex[i:i + mylen // 3], 16)
-                        for i in range(0, mylen, mylen // 3))
-            r.append(rgb[0])
-            g.append(rgb[1])
-            b.append(rgb[2])
+        # convert cscale1 from hex to rgb
+        key = scale
+        rgb = [[int(myhex[i:i + 2], 16) for i in (1, 3, 5)] for myhex in cscale1]
     else:
         package_path = os.path.dirname(__file__)
         file = os.path.join(package_path, 'colourmaps/' + scale + '.rgb')
+        key = scale
         if os.path.isfile(file) is False:
             if os.path.isfile(scale) is False:
                 errstr = '\ncscale error - colour scale not found:\n'
@@ -4049,19 +4933,41 @@ def cscale(scale=None, ncols=None, white=None, below=None,
                 raise Warning(errstr)
             else:
                 file = scale
+                key = (os.path.abspath(scale), os.path.getmtime(scale))
+                if key in colour_scale_registry:
+                    return key
+
+        # Read in rgb values
+        rgb = colourmaps.read_rgb(file)
+
+    colour_scale_registry[key] = np.array(rgb, dtype=np.uint8).reshape(-1, 3)
+
+    return key
+
+
+@functools.lru_cache(maxsize=512)
+def cscale_colours(key=None, ncols=None, white=None, below=None,
+                   above=None, reverse=False, uniform=False):
+    """
+    | cscale_colours - make the hex colours for a registered colour scale
+    | This is an internal routine and is not used by the user.
+    |
+    | key=None - registry key from cscale_palette
+    | ncols, below, above, reverse, uniform - as for cscale
+    | white=None - tuple of colour positions to make white
+    |
+    | The results are cached so repeated calls with the same settings, as
+    | con makes for every plot, do no interpolation.
+    |
+    :Returns:
+        tuple of hex colours
+    |
+    """
 
-        # Read in rgb values and convert to hex
-        f = open(file, 'r')
-        lines = f.read()
-        lines = lines.splitlines()
-        r = []
-        g = []
-        b = []
-        for line in lines:
-            vals = line.split()
-            r.append(int(vals[0]))
-            g.append(int(vals[1]))
-            b.append(int(vals[2]))
+    rgb = colour_scale_registry[key].astype(int)
+    r = rgb[:, 0]
+    g = rgb[:, 1]
+    b = rgb[:, 2]
 
     # Reverse the colour scale if requested
     if reverse:
@@ -4073,12 +4979,9 @@ def cscale(scale=None, ncols=None, white=None, below=None,
     if ncols is not None:
         x = np.arange(np.size(r))
         xnew = np.linspace(0, np.size(r) - 1, num=ncols, endpoint=True)
-        f_red = interpolate.interp1d(x, r)
-        f_green = interpolate.interp1d(x, g)
-        f_blue = interpolate.interp1d(x, b)
-        r = f_red(xnew)
-        g = f_green(xnew)
-        b = f_blue(xnew)
+        r = np.interp(xnew, x, r)
+        g = np.interp(xnew, x, g)
+        b = np.interp(xnew, x, b)
 
     # Change the number of colours below and above the mid-point if requested
     if below is not None or above is not None:
@@ -4120,12 +5023,9 @@ def cscale(scale=None, ncols=None, white=None, below=None,
 
         # Interpolate to new colour scale
         xpts = np.arange(np.size(r))
-        f_red = interpolate.interp1d(xpts, r)
-        f_green = interpolate.interp1d(xpts, g)
-        f_blue = interpolate.interp1d(xpts, b)
-        r = f_red(xnew)
-        g = f_green(xnew)
-        b = f_blue(xnew)
+        r = np.interp(xnew, xpts, r)
+        g = np.interp(xnew, xpts, g)
+        b = np.interp(xnew, xpts, b)
 
         # Reset colours if uniform is set
         if uniform:
@@ -4135,20 +5035,15 @@ def cscale(scale=None, ncols=None, white=None, below=None,
             b = b[mid_pt - below:mid_pt + above]
 
     # Convert to hex
-    hexarr = []
-    for col in np.arange(np.size(r)):
-        hexarr.append('#%02x%02x%02x' % (int(r[col]), int(g[col]), int(b[col])))
+    rgb = np.column_stack([r, g, b]).astype(int)
+    hexarr = ['#%02x%02x%02x' % (red, green, blue) for red, green, blue in rgb.tolist()]
 
     # White requested colour positions
     if white is not None:
-        if np.size(white) == 1:
-            hexarr[white] = '#ffffff'
-        else:
-            for col in white:
-                hexarr[col] = '#ffffff'
+        for col in white:
+            hexarr[col] = '#ffffff'
 
-    # Set colour scale
-    plotvars.cs = hexarr
+    return tuple(hexarr)
 
 
 def cscale_get_map():
@@ -4178,6 +5073,7 @@ def cscale_get_map():
     return (colmap)
 
 
+@profiled
 def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
           alpha=1.0, single_fill_color=None, white=True, zorder=4, fast=None, transform=False,
           orca=False):
@@ -4209,6 +5105,8 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
      |
     """
 
+    from matplotlib.collections import PolyCollection
+
     
 
     # Set lonlat if not specified
@@ -4222,7 +5120,7 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
         
     # Set 2D lon lat if data is that format
     two_d = False
-    if not isinstance(f, cf.Field):
+    if not cf_isinstance(f, 'Field'):
         if np.ndim(x) == 2 and np.ndim(x) == 2:
             two_d = True
 
@@ -4233,13 +5131,13 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
 
 
     # Set the field
-    if isinstance(f, cf.Field):
+    if cf_isinstance(f, 'Field'):
         field = f.array
     else:
         field = f
         
         
-    levels = np.array(deepcopy(clevs)).astype('float')        
+    levels = np.array(clevs, dtype=float)
         
     # Generate a Matplotlib colour map
     if single_fill_color is None:
@@ -4250,8 +5148,6 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
     cmap = matplotlib.colors.ListedColormap(cols)
 
 
-    levels_orig = deepcopy(levels)
-
     if single_fill_color is None:
         if plotvars.levels_extend == 'both' or plotvars.levels_extend == 'min':
             levels = np.insert(levels, 0, -1e30)
@@ -4267,27 +5163,26 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
 
 
 
-    # Colour array for storing the cell colour.  Start with -1 as the default
-    # as the colours run from 0 to np.size(levels)-1
-    colarr = np.zeros([np.shape(field)[0], np.shape(field)[1]])-1
-    for i in np.arange(np.size(levels)-1):
-        lev = levels[i]
-        pts = np.where(np.logical_and(field >= lev, field < levels[i+1]))
-        colarr[pts] = int(i)
-
-    # Change points that are masked back to -1
-    if isinstance(field, np.ma.MaskedArray):
-        pts = np.ma.where(field.mask)
-        if np.size(pts) > 0:
-            colarr[pts] = -1
+    # Colour array for storing the cell colour.  Cells outside the levels,
+    # missing or masked are -1 as the colours run from 0 to np.size(levels)-1
+    # The fast pcolormesh plots colour the cells from the data so don't need it
+    colarr = None
+    if not fast or two_d:
+        colarr = bfill_colour_index(field, levels)
 
     norm = matplotlib.colors.BoundaryNorm(levels, cmap.N)
+
+    # RGBA colour for each colour index
+    cell_colours = matplotlib.colors.to_rgba_array(plotvars.cs)
+    if single_fill_color is not None:
+        cell_colours = matplotlib.colors.to_rgba_array(single_fill_color)
+        cell_colours = np.repeat(cell_colours, np.size(levels) - 1, axis=0)
         
         
         
         
     #print('1st check for rotated coords', f.ref('grid_mapping_name:transverse_mercator', default=False))
-    if isinstance(f, cf.Field):
+    if cf_isinstance(f, 'Field'):
         
         
         print('2nd check for rotated coords', f.ref('grid_mapping_name:transverse_mercator', default=False))
@@ -4329,18 +5224,10 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
                     xpts = x
                     ypts = y
                 else:
-                    # Find x box boundaries
-                    xpts = x[0] - (x[1] - x[0]) / 2.0
-                    for ix in np.arange(np.size(x) - 1):
-                        xpts = np.append(xpts, x[ix] + (x[ix + 1] - x[ix]) / 2.0)
-                    xpts = np.append(xpts, x[ix + 1] + (x[ix + 1] - x[ix]) / 2.0)
-
-                    # Find y box boundaries
-                    ypts = y[0] - (y[1] - y[0]) / 2.0
-                    for iy in np.arange(np.size(y) - 1):
-                        ypts = np.append(ypts, y[iy] + (y[iy + 1] - y[iy]) / 2.0)
-                    ypts = np.append(ypts, y[iy + 1] + (y[iy + 1] - y[iy]) / 2.0)
-    
+                    # Find x and y box boundaries
+                    xpts = bfill_box_bounds(x)
+                    ypts = bfill_box_bounds(y)
+
                 # Shift lon grid if needed
                 if lonlat:
                     # Extract upper bound and original rhs of box longitude bounding points
@@ -4369,40 +5256,15 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
                     ypts = np.append(ypts, upper_bound)
             else:
                 # 2D lons and lats code
-                nx = np.shape(x)[1]
-                ny = np.shape(x)[0]
-
-                for ix in np.arange(nx - 1):
-                    for iy in np.arange(ny - 1):
-    
-                        # Calculate the local size difference and set the square points
-                        if ix < nx -2:
-                            xdiff = (x[iy, ix+1] - x[iy, ix]) / 2
-                        else:
-                            xdiff = (x[iy, ix] - x[iy, ix-1]) / 2
-                            
-                        if iy < ny - 2:
-                            ydiff = (y[iy+1, ix] - y[iy, ix]) / 2
-                        else:
-                            ydiff = (y[iy, ix] - y[iy-1, ix]) / 2
-                            
-                        xpts = [x[iy,ix]-xdiff, x[iy,ix]+xdiff, x[iy,ix]+xdiff, x[iy,ix]-xdiff, x[iy,ix]-xdiff]
-                        ypts = [y[iy,ix]-ydiff, y[iy,ix]-ydiff, y[iy,ix]+ydiff, y[iy,ix]+ydiff, y[iy,ix]-ydiff]
-        
+                # Each cell is drawn as a lon-lat box around the data point
+                # with all the cells in a single collection
+                ix, iy, facecolors = bfill_cell_colours(colarr[:-1, :-1], cell_colours, white)
+                verts = bfill_2d_cell_verts(x, y, ix, iy)
+                coll = PolyCollection(verts, facecolors=facecolors, edgecolors=facecolors,
+                                      alpha=alpha, zorder=zorder,
+                                      transform=ccrs.PlateCarree())
+                plotvars.mymap.add_collection(coll, autolim=False)
 
-        
-                        #try:
-                        #    colour_index = np.max(np.where(val > levs_arr))
-                        #except:
-                        #    colour_index = 0
-        
-                        # Plot the square
-                        plotvars.mymap.add_patch(mpatches.Polygon(\
-                                                 [[xpts[0], ypts[0]], [xpts[1],ypts[1]], [xpts[2], ypts[2]],\
-                                                 [xpts[3],ypts[3]], [xpts[4], ypts[4]]],\
-                                                 facecolor=plotvars.cs[int(colarr[iy,ix])], zorder=zorder,\
-                                                 transform=ccrs.PlateCarree()))       
-                                                     
                 return
                
                 
@@ -4411,21 +5273,12 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
     # Polar stereographic
     # Set points past plotting limb to be plotvars.boundinglat
     # Also set any lats past the pole to be the pole
+    # ypts may be the caller's array so it is not changed in place
     if plotvars.proj == 'npstere' and not orca:
-        pts = np.where(ypts < plotvars.boundinglat)
-        if np.size(pts) > 0:
-            ypts[pts] = plotvars.boundinglat
-        pts = np.where(ypts > 90.0)
-        if np.size(pts) > 0:
-            ypts[pts] = 90.0
+        ypts = np.clip(ypts, plotvars.boundinglat, 90.0)
 
     if plotvars.proj == 'spstere' and not orca:
-        pts = np.where(ypts > plotvars.boundinglat)
-        if np.size(pts) > 0:
-            ypts[pts] = plotvars.boundinglat
-        pts = np.where(ypts < -90.0)
-        if np.size(pts) > 0:
-            ypts[pts] = -90.0
+        ypts = np.clip(ypts, -90.0, plotvars.boundinglat)
 
 
 
@@ -4470,179 +5323,236 @@ def bfill(f=None, x=None, y=None, clevs=False, lonlat=None, bound=False,
                     plotvars.image = plotvars.plot.pcolormesh(xpts, ypts, field, cmap=cmap, norm=norm)        
     
     else:
-    
-        if plotvars.plot_type == 1 and plotvars.proj != 'cyl':
-
-            for i in np.arange(np.size(levels)-1):
-                allverts = []
-                xy_stack = np.column_stack(np.where(colarr == i))
-
-                for pt in np.arange(np.shape(xy_stack)[0]):
-                    ix = xy_stack[pt][1]
-                    iy = xy_stack[pt][0]
-                    lons = [xpts[ix], xpts[ix+1], xpts[ix+1], xpts[ix], xpts[ix]]
-                    lats = [ypts[iy], ypts[iy], ypts[iy+1], ypts[iy+1], ypts[iy]]
-
-                    txpts, typts = lons, lats
-                    verts = [
-                        (txpts[0], typts[0]),
-                        (txpts[1], typts[1]),
-                        (txpts[2], typts[2]),
-                        (txpts[3], typts[3]),
-                        (txpts[4], typts[4]),
-                        ]
-
-                    allverts.append(verts)
-
-                # Make the collection and add it to the plot.
-                if single_fill_color is None:
-                    color = plotvars.cs[i]
-                else:
-                    color = single_fill_color
-                coll = PolyCollection(allverts, facecolor=color, edgecolors=color, alpha=alpha,
-                                      zorder=zorder, **plotargs)
-
-                if lonlat:
-                    plotvars.mymap.add_collection(coll)
-                else:
-                    plotvars.plot.add_collection(coll)
+        # Draw all the cells as a single collection with a colour per face
+        ix, iy, facecolors = bfill_cell_colours(colarr, cell_colours, white)
+        verts = bfill_cell_verts(xpts, ypts, ix, iy)
+        coll = PolyCollection(verts, facecolors=facecolors, edgecolors=facecolors,
+                              alpha=alpha, zorder=zorder, **plotargs)
+
+        # The map extent is already set so skip the per-cell projection
+        # needed to update the data limits
+        if lonlat:
+            plotvars.mymap.add_collection(coll, autolim=False)
         else:
-            for i in np.arange(np.size(levels)-1):
-
-                allverts = []
-                xy_stack = np.column_stack(np.where(colarr == i))
-                for pt in np.arange(np.shape(xy_stack)[0]):
-                    ix = xy_stack[pt][1]
-                    iy = xy_stack[pt][0]
-                    verts = [
-                        (xpts[ix], ypts[iy]),
-                        (xpts[ix+1], ypts[iy]),
-                        (xpts[ix+1], ypts[iy+1]),
-                        (xpts[ix], ypts[iy+1]),
-                        (xpts[ix], ypts[iy]),
-                        ]
-
-                    allverts.append(verts)
-
-                # Make the collection and add it to the plot.
-                if single_fill_color is None:
-                    color = plotvars.cs[i]
-                else:
-                    color = single_fill_color
+            plotvars.plot.add_collection(coll)
 
-                coll = PolyCollection(allverts, facecolor=color, edgecolors=color,
-                                      alpha=alpha, zorder=zorder, **plotargs)
 
+def bfill_colour_index(field=None, levels=None):
+    """
+     | bfill_colour_index - find the colour index of each cell in a blockfill
+     | This is an internal routine and is not generally used by the user.
+     |
+     | field=None - data to colour
+     | levels=None - increasing levels bounding each colour
+     |
+     | Cell values with levels[i] <= value < levels[i+1] get colour index i.
+     | Values outside the levels, NaNs and masked points get -1.
+     |
+     :Returns:
+      integer array of colour indices the same shape as field
+     |
+    """
 
+    levels = np.asarray(levels, dtype=float)
+    data = np.ma.getdata(field)
 
+    colarr = np.searchsorted(levels, data, side='right') - 1
+    colarr[colarr >= np.size(levels) - 1] = -1
 
-                if lonlat:
-                    plotvars.mymap.add_collection(coll)
-                else:
-                    plotvars.plot.add_collection(coll)
-
-        # Add white for undefined areas
-        if white:
-            allverts = []
-            xy_stack = np.column_stack(np.where(colarr == -1))
-            for pt in np.arange(np.shape(xy_stack)[0]):
-                ix = xy_stack[pt][1]
-                iy = xy_stack[pt][0]
-
-                verts = [
-                    (xpts[ix], ypts[iy]),
-                    (xpts[ix+1], ypts[iy]),
-                    (xpts[ix+1], ypts[iy+1]),
-                    (xpts[ix], ypts[iy+1]),
-                    (xpts[ix], ypts[iy]),
-                    ]
-
-                allverts.append(verts)
-
-            # Make the collection and add it to the plot.
-            color = plotvars.cs[i]
-            coll = PolyCollection(allverts, facecolor='#ffffff', edgecolors='#ffffff',
-                                  alpha=alpha, zorder=zorder, **plotargs)
+    # Change points that are masked back to -1
+    mask = np.ma.getmaskarray(field)
+    if mask.any():
+        colarr[mask] = -1
 
-            if lonlat:
-                plotvars.mymap.add_collection(coll)
-            else:
-                plotvars.plot.add_collection(coll)
+    return colarr
 
 
-def regrid(f=None, x=None, y=None, xnew=None, ynew=None):
+def bfill_cell_colours(colarr=None, cell_colours=None, white=True):
     """
-     | regrid - bilinear interpolation of a grid to new grid locations
+     | bfill_cell_colours - order and colour the cells of a blockfill
+     | This is an internal routine and is not generally used by the user.
      |
+     | colarr=None - colour index of each cell from bfill_colour_index
+     | cell_colours=None - RGBA colour for each colour index
+     | white=True - colour cells with an index of -1 white, otherwise
+     |              these cells are left out
      |
-     |     f=None - original field
-     |     x=None - original field x values
-     |     y=None - original field y values
-     |     xnew=None - new x points
-     |     ynew=None - new y points
+     | The cells are kept in level order with any white cells last so that
+     | the shared cell edges overlap as they did when each level was drawn
+     | as a separate collection.
      |
      :Returns:
-        field values at requested locations
-     |
+      x indices, y indices and RGBA face colours of the cells to draw
      |
     """
 
-    # Copy input arrays
-    regrid_f = deepcopy(f)
-    regrid_x = deepcopy(x)
-    regrid_y = deepcopy(y)
-    fieldout = []
+    colarr = np.asarray(colarr)
+    ncols = np.shape(cell_colours)[0]
+
+    order = np.where(colarr == -1, ncols, colarr).flatten()
+    order = np.argsort(order, kind='stable')
+    if not white:
+        order = order[colarr.flatten()[order] != -1]
+    iy, ix = np.unravel_index(order, np.shape(colarr))
+
+    facecolors = np.ones([np.size(order), 4])
+    pts = np.where(colarr[iy, ix] != -1)
+    facecolors[pts] = cell_colours[colarr[iy, ix][pts]]
+
+    return ix, iy, facecolors
+
+
+def bfill_box_bounds(x=None):
+    """
+     | bfill_box_bounds - find the box boundaries of a set of cell centres
+     | This is an internal routine and is not generally used by the user.
+     |
+     | x=None - cell centre points
+     |
+     :Returns:
+      np.size(x)+1 box boundary points
+     |
+    """
+
+    x = np.asarray(x)
+    mids = x[:-1] + (x[1:] - x[:-1]) / 2.0
+    first = x[0] - (x[1] - x[0]) / 2.0
+    last = x[-1] + (x[-1] - x[-2]) / 2.0
+
+    return np.concatenate([[first], mids, [last]])
+
+
+def bfill_cell_verts(xpts=None, ypts=None, ix=None, iy=None):
+    """
+     | bfill_cell_verts - vertices of blockfill cells for a PolyCollection
+     | This is an internal routine and is not generally used by the user.
+     |
+     | xpts=None - x box boundaries
+     | ypts=None - y box boundaries
+     | ix=None - x indices of the cells
+     | iy=None - y indices of the cells
+     |
+     :Returns:
+      array of shape (ncells, 5, 2) of closed cell outlines
+     |
+    """
+
+    xpts = np.asarray(xpts)
+    ypts = np.asarray(ypts)
+    x0 = xpts[ix]
+    x1 = xpts[ix + 1]
+    y0 = ypts[iy]
+    y1 = ypts[iy + 1]
+
+    verts = np.empty([np.size(ix), 5, 2])
+    verts[:, :, 0] = np.column_stack([x0, x1, x1, x0, x0])
+    verts[:, :, 1] = np.column_stack([y0, y0, y1, y1, y0])
+
+    return verts
+
+
+def bfill_2d_cell_verts(x=None, y=None, ix=None, iy=None):
+    """
+     | bfill_2d_cell_verts - vertices of blockfill cells for 2D lons and lats
+     | This is an internal routine and is not generally used by the user.
+     |
+     | x=None - 2D longitudes
+     | y=None - 2D latitudes
+     | ix=None - x indices of the cells
+     | iy=None - y indices of the cells
+     |
+     | Each cell is a box around the data point using half the spacing to
+     | the next point along the row for longitude and down the column for
+     | latitude.  The last cell in each direction uses the previous spacing.
+     |
+     :Returns:
+      array of shape (ncells, 5, 2) of closed cell outlines
+     |
+    """
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    xdiff = np.diff(x, axis=1)
+    xdiff[:, -1] = xdiff[:, -2]
+    xdiff = xdiff[iy, ix] / 2
+
+    ydiff = np.diff(y, axis=0)
+    ydiff[-1, :] = ydiff[-2, :]
+    ydiff = ydiff[iy, ix] / 2
+
+    x0 = x[iy, ix] - xdiff
+    x1 = x[iy, ix] + xdiff
+    y0 = y[iy, ix] - ydiff
+    y1 = y[iy, ix] + ydiff
+
+    verts = np.empty([np.size(ix), 5, 2])
+    verts[:, :, 0] = np.column_stack([x0, x1, x1, x0, x0])
+    verts[:, :, 1] = np.column_stack([y0, y0, y1, y1, y0])
+
+    return verts
+
+
+def regrid(f=None, x=None, y=None, xnew=None, ynew=None):
+    """
+     | regrid - bilinear interpolation of a grid to new grid locations
+     |
+     |
+     |     f=None - original field or a list of fields on the same grid
+     |     x=None - original field x values
+     |     y=None - original field y values
+     |     xnew=None - new x points
+     |     ynew=None - new y points
+     |
+     :Returns:
+        field values at requested locations - one row per field if a
+        list of fields was passed
+     |
+     |
+    """
+
+    # Stack a list of fields so they are interpolated together
+    if isinstance(f, (list, tuple)):
+        regrid_f = np.ma.stack(f)
+    else:
+        regrid_f = f
+    regrid_x = np.asarray(x)
+    regrid_y = np.asarray(y)
+    xnew = np.asarray(xnew)
+    ynew = np.asarray(ynew)
 
     # Reverse xpts and field if necessary
     if regrid_x[0] > regrid_x[-1]:
         regrid_x = regrid_x[::-1]
-        regrid_f = np.fliplr(regrid_f)
+        regrid_f = regrid_f[..., ::-1]
 
     # Reverse ypts and field if necessary
     if regrid_y[0] > regrid_y[-1]:
         regrid_y = regrid_y[::-1]
-        regrid_f = np.flipud(regrid_f)
-
-    # Iterate over the new grid to get the new grid values.
-    for i in np.arange(np.size(xnew)):
-
-        xval = xnew[i]
-        yval = ynew[i]
-
-        # Find position of new grid point in the x and y arrays
-        myxpos = find_pos_in_array(vals=regrid_x, val=xval)
-        myypos = find_pos_in_array(vals=regrid_y, val=yval)
-
-        myxpos2 = myxpos + 1
-        myypos2 = myypos + 1
+        regrid_f = regrid_f[..., ::-1, :]
 
-        if (myxpos2 != myxpos):
-            alpha = (xnew[i] - regrid_x[myxpos]) / \
-                (regrid_x[myxpos2] - regrid_x[myxpos])
-        else:
-            alpha = (xnew[i] - regrid_x[myxpos]) / 1E-30
+    # Find position of the new grid points in the x and y arrays
+    myxpos = find_pos_in_array(vals=regrid_x, val=xnew)
+    myypos = find_pos_in_array(vals=regrid_y, val=ynew)
 
-        newval1 = (regrid_f[myypos, myxpos] - regrid_f[myypos, myxpos2])
-        newval1 = newval1 * alpha
-        newval1 = regrid_f[myypos, myxpos] - newval1
+    myxpos2 = myxpos + 1
+    myypos2 = myypos + 1
 
-        newval2 = (regrid_f[myypos2, myxpos] - regrid_f[myypos2, myxpos2])
-        newval2 = newval2 * alpha
-        newval2 = regrid_f[myypos2, myxpos] - newval2
+    alpha = (xnew - regrid_x[myxpos]) / (regrid_x[myxpos2] - regrid_x[myxpos])
+    alpha2 = (ynew - regrid_y[myypos]) / (regrid_y[myypos2] - regrid_y[myypos])
 
-        if (myypos2 != myypos):
-            alpha2 = (ynew[i] - regrid_y[myypos])
-            alpha2 = alpha2 / (regrid_y[myypos2] - regrid_y[myypos])
-        else:
-            alpha2 = (ynew[i] - regrid_y[myypos]) / 1E-30
+    newval1 = regrid_f[..., myypos, myxpos]
+    newval1 = newval1 - (newval1 - regrid_f[..., myypos, myxpos2]) * alpha
 
-        newval3 = newval1 - (newval1 - newval2) * alpha2
+    newval2 = regrid_f[..., myypos2, myxpos]
+    newval2 = newval2 - (newval2 - regrid_f[..., myypos2, myxpos2]) * alpha
 
-        fieldout = np.append(fieldout, newval3)
+    fieldout = newval1 - (newval1 - newval2) * alpha2
 
     return fieldout
 
 
+@plot_locked
 def stipple(f=None, x=None, y=None, min=None, max=None,
             size=80, color='k', pts=50, marker='.', edgecolors='k',
             alpha=1.0, ylog=False, zorder=1):
@@ -4679,11 +5589,11 @@ def stipple(f=None, x=None, y=None, min=None, max=None,
 
     # Extract required data for contouring
     # If a cf-python field
-    if isinstance(f, cf.Field):
+    if cf_isinstance(f, 'Field'):
         colorbar_title = ''
         field, xpts, ypts, ptype, colorbar_title, xlabel, ylabel, xpole, \
             ypole = cf_data_assign(f, colorbar_title)
-    elif isinstance(f, cf.FieldList):
+    elif cf_isinstance(f, 'FieldList'):
         raise TypeError("Can't plot a field list")
     else:
         field = f  # field data passed in as f
@@ -4747,10 +5657,8 @@ def stipple(f=None, x=None, y=None, min=None, max=None,
     vals = regrid(f=field, x=xpts, y=ypts, xnew=xnew, ynew=ynew)
 
     # Work out which of the points are valid
-    valid_points = np.array([], dtype='int64')
-    for i in np.arange(np.size(vals)):
-        if vals[i] >= min and vals[i] <= max:
-            valid_points = np.append(valid_points, i)
+    valid = np.ma.filled(np.logical_and(vals >= min, vals <= max), False)
+    valid_points = np.where(valid)[0]
 
     if plotvars.plot_type == 1:
         proj = ccrs.PlateCarree()
@@ -4845,38 +5753,42 @@ def find_pos_in_array(vals=None, val=None, above=False):
     """
      | find_pos_in_array - find the position of a point in an array
      |
-     | vals - array values
-     | val - value to find position of
-     |
+     | vals - array values in ascending or descending order
+     | val - value or array of values to find position of
+     | above=False - find the position of the first value at or above val
      |
      |
      |
      |
      |
      :Returns:
-       position in array
+       position in array - an array of positions if val is an array
      |
      |
      |
     """
 
-    pos = -1
+    vals = np.asarray(vals)
+
+    # The number of values below val is the same whatever the order
+    # so search descending values in reverse
+    if np.size(vals) > 1 and vals[0] > vals[-1]:
+        vals = vals[::-1]
+
     if above is False:
-        for myval in vals:
-            if val > myval:
-                pos = pos + 1
+        pos = np.searchsorted(vals, val, side='left') - 1
 
     if above:
-        for myval in vals:
-            if val >= myval:
-                pos = pos + 1
+        pos = np.searchsorted(vals, val, side='right') - 1
+        pos = np.where(np.size(vals) - 1 > pos, pos + 1, pos)
 
-        if np.size(vals) - 1 > pos:
-            pos = pos + 1
+    if np.ndim(pos) == 0:
+        pos = int(pos)
 
     return pos
 
 
+@plot_locked
 def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
          key_length=None, key_label=None, ptype=None, title=None, magmin=None,
          width=0.02, headwidth=3, headlength=5, headaxislength=4.5,
@@ -4979,13 +5891,13 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
     user_ylabel = ylabel
 
     rotated_vect = False
-    if isinstance(u, cf.Field):
+    if cf_isinstance(u, 'Field'):
         if u.ref('grid_mapping_name:rotated_latitude_longitude', default=False):
             rotated_vect = True
 
     # Extract required data
     # If a cf-python field
-    if isinstance(u, cf.Field):
+    if cf_isinstance(u, 'Field'):
 
         # Check data is 2D
         ndims = np.squeeze(u.data).ndim
@@ -5000,18 +5912,18 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
 
         u_data, u_x, u_y, ptype, colorbar_title, xlabel, ylabel, xpole, \
             ypole = cf_data_assign(u, colorbar_title, rotated_vect=rotated_vect)
-    elif isinstance(u, cf.FieldList):
+    elif cf_isinstance(u, 'FieldList'):
         raise TypeError("Can't plot a field list")
     else:
         # field=f #field data passed in as f
         check_data(u, x, y)
-        u_data = deepcopy(u)
-        u_x = deepcopy(x)
-        u_y = deepcopy(y)
+        u_data = u
+        u_x = x
+        u_y = y
         xlabel = ''
         ylabel = ''
 
-    if isinstance(v, cf.Field):
+    if cf_isinstance(v, 'Field'):
 
         # Check data is 2D
         ndims = np.squeeze(v.data).ndim
@@ -5026,13 +5938,13 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
 
         v_data, v_x, v_y, ptype, colorbar_title, xlabel, ylabel, xpole, \
             ypole = cf_data_assign(v, colorbar_title, rotated_vect=rotated_vect)
-    elif isinstance(v, cf.FieldList):
+    elif cf_isinstance(v, 'FieldList'):
         raise TypeError("Can't plot a field list")
     else:
         # field=f #field data passed in as f
         check_data(v, x, y)
-        v_data = deepcopy(v)
-        v_x = deepcopy(x)
+        v_data = v
+        v_x = x
         xlabel = ''
         ylabel = ''
 
@@ -5041,6 +5953,9 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
         mag = np.sqrt(u_data**2 + v_data**2)
         invalid = np.where(mag <= magmin)
         if np.size(invalid) > 0:
+            # Copy the data before changing it
+            u_data = np.array(u_data, dtype=float, subok=True)
+            v_data = np.array(v_data, dtype=float, subok=True)
             u_data[invalid] = np.nan
             v_data[invalid] = np.nan
 
@@ -5159,9 +6074,7 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
                 # **cartopy 0.16 fix for longitide points in cylindrical projection
                 # when regridding to a number of points
                 # Make points within the plotting region
-                for pt in np.arange(np.size(u_x)):
-                    if u_x[pt] > lonmax:
-                        u_x[pt] = u_x[pt]-360
+                u_x = np.where(u_x > lonmax, u_x - 360, u_x)
 
             quiv = plotvars.mymap.quiver(u_x, u_y, u_data, v_data, scale=scale,
                                          pivot=pivot, units='inches',
@@ -5175,7 +6088,7 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
         # Make key_label if none exists
         if key_label is None:
             key_label = str(key_length)
-        if isinstance(u, cf.Field):
+        if cf_isinstance(u, 'Field'):
             key_label = supscr(key_label + u.units)
         if key_show:
             plotvars.mymap.quiverkey(quiv, key_location[0],
@@ -5207,7 +6120,7 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
         feature = cfeature.NaturalEarthFeature(name='land', category='physical',
                                                scale=plotvars.resolution,
                                                facecolor='none')
-        mymap.add_feature(feature, edgecolor=continent_color,
+        mymap.add_feature(map_feature(feature), edgecolor=continent_color,
                           linewidth=continent_thickness,
                           linestyle=continent_linestyle)
 
@@ -5247,7 +6160,7 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
             # Make key_label if none exists
             if key_label is None:
                 key_label = str(key_length)
-            if isinstance(u, cf.Field):
+            if cf_isinstance(u, 'Field'):
                 key_label = supscr(key_label + u.units)
 
             if key_show:
@@ -5450,11 +6363,10 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
 
             if ytype == 0:
                 # Make y interpolation in log space as we have a pressure coordinate
-                u_vals = regrid(f=u_data, x=u_x, y=np.log10(u_y), xnew=xnew, ynew=np.log10(ynew))
-                v_vals = regrid(f=v_data, x=u_x, y=np.log10(u_y), xnew=xnew, ynew=np.log10(ynew))
+                u_vals, v_vals = regrid(f=[u_data, v_data], x=u_x, y=np.log10(u_y),
+                                        xnew=xnew, ynew=np.log10(ynew))
             else:
-                u_vals = regrid(f=u_data, x=u_x, y=u_y, xnew=xnew, ynew=ynew)
-                v_vals = regrid(f=v_data, x=u_x, y=u_y, xnew=xnew, ynew=ynew)
+                u_vals, v_vals = regrid(f=[u_data, v_data], x=u_x, y=u_y, xnew=xnew, ynew=ynew)
 
             u_x = xnew
             u_y = ynew
@@ -5490,7 +6402,7 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
             # Single scale vector
             if key_label is None:
                 key_label_u = str(key_length_u)
-                if isinstance(u, cf.Field):
+                if cf_isinstance(u, 'Field'):
                     key_label_u = supscr(key_label_u + ' (' + u.units + ')')
             else:
                 key_label_u = key_label[0]
@@ -5519,9 +6431,9 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
             if key_label is None:
                 key_label_u = str(key_length_u)
                 key_label_v = str(key_length_v)
-                if isinstance(u, cf.Field):
+                if cf_isinstance(u, 'Field'):
                     key_label_u = supscr(key_label_u + ' (' + u.units + ')')
-                if isinstance(v, cf.Field):
+                if cf_isinstance(v, 'Field'):
                     key_label_v = supscr(key_label_v + ' (' + v.units + ')')
             else:
                 key_label_u = supscr(key_label[0])
@@ -5582,6 +6494,7 @@ def vect(u=None, v=None, x=None, y=None, scale=None, stride=None, pts=None,
         mapset(resolution=resolution_orig)
 
 
+@profiled
 def set_map():
     """
      | set_map - set map and write into plotvars.mymap
@@ -5589,9 +6502,9 @@ def set_map():
      | No inputs
      | This is an internal routine and not used by the user
      |
-     |
-     |
-     |
+     | The projection and map limits are kept in map_template_cache for
+     | each set of map settings so that later plots on the same map, such
+     | as the other panels of a multi-panel page, reuse them.
      |
      :Returns:
       None
@@ -5605,7 +6518,95 @@ def set_map():
     if plotvars.mymap is not None:
         return
 
+    # Find the map template for the map settings
+    key = (plotvars.proj, plotvars.lonmin, plotvars.lonmax, plotvars.latmin,
+           plotvars.latmax, plotvars.lon_0, plotvars.lat_0, plotvars.boundinglat,
+           plotvars.resolution, plotvars.aspect)
+    template = map_template_cache.get(key)
+    new_template = template is None
+    if new_template:
+        proj, lonmin, lonmax, latmin, latmax, extent = map_projection()
+        template = {'proj': proj, 'limits': None, 'features': {}, 'lines': {}}
+    else:
+        proj = template['proj']
+
+    # Add a plot containing the projection
+    if plotvars.plot_xmin:
+        delta_x = plotvars.plot_xmax - plotvars.plot_xmin
+        delta_y = plotvars.plot_ymax - plotvars.plot_ymin
+        mymap = plotvars.master_plot.add_axes([plotvars.plot_xmin,
+                                              plotvars.plot_ymin,
+                                              delta_x, delta_y],
+                                              projection=proj)
+    else:
+        mymap = plotvars.master_plot.add_subplot(plotvars.rows,
+                                                 plotvars.columns,
+                                                 plotvars.pos,
+                                                 projection=proj)
+
+    if template['limits'] is not None:
+        # Same limits as the first map made from this template
+        mymap.set_xlim(template['limits'][0])
+        mymap.set_ylim(template['limits'][1])
+
+    if new_template:
+        # Set map extent
+        set_extent = True
+        if plotvars.proj in ['OSGB', 'EuroPP', 'UKCP', 'robin', 'lcc']:
+            set_extent = False
+
+        if extent and set_extent:
+            mymap.set_extent([lonmin, lonmax, latmin, latmax], crs=ccrs.PlateCarree())
+
+        if plotvars.proj == 'lcc':
+            # Special case of lcc
+            mymap.set_extent([lonmin, lonmax, latmin, latmax], crs=ccrs.PlateCarree())
+
+        if plotvars.proj == 'UKCP':
+            # Special case of TransverseMercator for UKCP
+            mymap.set_extent([-11, 3, 49, 61], crs=ccrs.PlateCarree())
+
+        if plotvars.proj == 'EuroPP':
+            # EuroPP somehow needs some limits setting.
+            mymap.set_extent([-12, 25, 30, 75], crs=ccrs.PlateCarree())
+
+        # Keep the limits if set_extent set them, which turns off autoscaling
+        if not mymap.get_autoscale_on():
+            template['limits'] = (mymap.get_xlim(), mymap.get_ylim())
+
+        # Keep the most recent templates only
+        template = cache_store(map_template_cache, key, template, 32)
 
+    # Set the scaling for PlateCarree
+    if plotvars.proj == 'cyl':
+        mymap.set_aspect(plotvars.aspect)
+
+    # Remove any plotvars.plot axes leaving just the plotvars.mymap axes
+    plotvars.plot.set_frame_on(False)
+    plotvars.plot.set_xticks([])
+    plotvars.plot.set_yticks([])
+
+    # Store map
+    plotvars.mymap = mymap
+    plotvars.map_template = template
+
+
+def map_projection():
+    """
+     | map_projection - cartopy projection and extent for the current map
+     |                  settings
+     |
+     | No inputs
+     | This is an internal routine and not used by the user
+     |
+     |
+     :Returns:
+      proj, lonmin, lonmax, latmin, latmax, extent
+      extent is False if the extent of the map is not set
+     |
+     |
+     |
+    """
 
     # Set up mapping
     extent = True
@@ -5716,53 +6717,200 @@ def set_map():
         latmax = plotvars.latmax
         extent = True
 
+    return proj, lonmin, lonmax, latmin, latmax, extent
 
 
-    # Add a plot containing the projection
-    if plotvars.plot_xmin:
-        delta_x = plotvars.plot_xmax - plotvars.plot_xmin
-        delta_y = plotvars.plot_ymax - plotvars.plot_ymin
-        mymap = plotvars.master_plot.add_axes([plotvars.plot_xmin,
-                                              plotvars.plot_ymin,
-                                              delta_x, delta_y],
-                                              projection=proj)
-    else:
-        mymap = plotvars.master_plot.add_subplot(plotvars.rows,
-                                                 plotvars.columns,
-                                                 plotvars.pos,
-                                                 projection=proj)
+def map_feature(feature=None):
+    """
+     | map_feature - a cartopy feature projected for the current map
+     | This is an internal routine and is not generally used by the user.
+     |
+     | feature=None - cartopy feature such as cfeature.OCEAN or a
+     |                NaturalEarthFeature
+     |
+     | The geometries of the feature that are on the map are projected
+     | once for each projection and those outside the map limits are
+     | dropped.  The result is kept in the map template so that later maps
+     | with the same settings draw it without projecting it again.  If
+     | cfp.setvars(cache_dir=...) has been set the result is also saved
+     | there so that other processes using the same directory can read it
+     | rather than reading and projecting the NaturalEarth data.
+     |
+     :Returns:
+      cartopy ShapelyFeature in the map projection.  The feature is
+      returned unchanged if the map was not made by set_map.
+     |
+    """
 
-    # Set map extent
-    set_extent = True
-    if plotvars.proj in ['OSGB', 'EuroPP', 'UKCP', 'robin', 'lcc']:
-        set_extent = False
+    template = plotvars.map_template
+    if template is None or plotvars.mymap is None:
+        return feature
 
-    if extent and set_extent:
-        mymap.set_extent([lonmin, lonmax, latmin, latmax], crs=ccrs.PlateCarree())
+    import shapely.geometry as sgeom
 
-    # Set the scaling for PlateCarree
-    if plotvars.proj == 'cyl':
-        mymap.set_aspect(plotvars.aspect)
+    # Features on the map in the feature coordinates
+    mymap = plotvars.mymap
+    try:
+        extent = mymap.get_extent(feature.crs)
+    except ValueError:
+        extent = None
+
+    # Resolve automatically scaled features to the scale for the map
+    scaler = getattr(feature, 'scaler', None)
+    if scaler is not None:
+        scaler.scale_from_extent(extent)
+
+    key = (type(feature).__name__, getattr(feature, 'category', None),
+           getattr(feature, 'name', None), getattr(feature, 'scale', None))
+    if key in template['features']:
+        return template['features'][key]
+
+    # Geometries wholly outside the map limits are dropped.  A margin
+    # allows for small later changes to the limits.  Geometries that are
+    # partly on the map are kept whole so they are drawn as before.
+    proj = template['proj']
+    xmin, xmax = mymap.get_xlim()
+    ymin, ymax = mymap.get_ylim()
+    xpad = 0.25 * abs(xmax - xmin)
+    ypad = 0.25 * abs(ymax - ymin)
+    map_box = sgeom.box(min(xmin, xmax) - xpad, min(ymin, ymax) - ypad,
+                        max(xmin, xmax) + xpad, max(ymin, ymax) + ypad)
+
+    # Projected geometries saved by this or another process
+    cache_file = None
+    if plotvars.cache_dir is not None:
+        file_key = hashlib.sha1(repr((key, proj.proj4_init, map_box.bounds,
+                                      cartopy.__version__)).encode()).hexdigest()
+        cache_file = os.path.join(plotvars.cache_dir, 'map_feature_' + file_key + '.npz')
+
+    geoms = None
+    if cache_file is not None and os.path.exists(cache_file):
+        geoms = read_geometries(cache_file)
+
+    if geoms is None:
+        # Geometries already projected for maps with the same projection
+        projected_geoms = projected_geometry_cache.get(proj)
+        if projected_geoms is None:
+            projected_geoms = cache_store(projected_geometry_cache, proj, {}, 8)
+
+        geoms = []
+        for geom in feature.intersecting_geometries(extent):
+            # The geometry is kept with its projection so that its id is not reused
+            item = projected_geoms.get(id(geom))
+            if item is None or item[0] is not geom:
+                item = (geom, proj.project_geometry(geom, feature.crs))
+                projected_geoms[id(geom)] = item
+            projected_geom = item[1]
+            if not projected_geom.is_empty and projected_geom.intersects(map_box):
+                geoms.append(projected_geom)
+
+        if cache_file is not None:
+            write_geometries(cache_file, geoms)
+
+    projected_feature = cfeature.ShapelyFeature(geoms, proj, **feature.kwargs)
+    template['features'][key] = projected_feature
+
+    return projected_feature
+
+
+def write_geometries(file=None, geoms=None):
+    """
+     | write_geometries - save shapely geometries to a file
+     | This is an internal routine and is not generally used by the user.
+     |
+     | file=None - file to write
+     | geoms=None - list of shapely geometries
+     |
+     | The geometries are saved as well known binary in an uncompressed
+     | numpy .npz file.  The file is written under a temporary name and
+     | then renamed so that other processes never read part of a file.
+     |
+     :Returns:
+      None
+     |
+    """
 
-    if plotvars.proj == 'lcc':
-        # Special case of lcc
-        mymap.set_extent([lonmin, lonmax, latmin, latmax], crs=ccrs.PlateCarree())
+    import shapely.wkb
 
-    if plotvars.proj == 'UKCP':
-        # Special case of TransverseMercator for UKCP
-        mymap.set_extent([-11, 3, 49, 61], crs=ccrs.PlateCarree())
+    wkb = [shapely.wkb.dumps(geom) for geom in geoms]
+    offsets = np.cumsum([0] + [len(geom) for geom in wkb])
 
-    if plotvars.proj == 'EuroPP':
-        # EuroPP somehow needs some limits setting.
-        mymap.set_extent([-12, 25, 30, 75], crs=ccrs.PlateCarree())
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    tmp_file = file + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.savez(f, wkb=np.frombuffer(b''.join(wkb), dtype=np.uint8),
+                 offsets=offsets)
+    os.replace(tmp_file, file)
 
-    # Remove any plotvars.plot axes leaving just the plotvars.mymap axes
-    plotvars.plot.set_frame_on(False)
-    plotvars.plot.set_xticks([])
-    plotvars.plot.set_yticks([])
 
-    # Store map
-    plotvars.mymap = mymap
+def read_geometries(file=None):
+    """
+     | read_geometries - read shapely geometries saved by write_geometries
+     | This is an internal routine and is not generally used by the user.
+     |
+     | file=None - file to read
+     |
+     :Returns:
+      list of shapely geometries or None if the file cannot be read
+     |
+    """
+
+    import shapely.wkb
+
+    try:
+        with np.load(file) as data:
+            wkb = data['wkb'].tobytes()
+            offsets = data['offsets']
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+    return [shapely.wkb.loads(wkb[offsets[i]:offsets[i + 1]])
+            for i in np.arange(np.size(offsets) - 1)]
+
+
+def map_line(lons=None, lats=None, crs=None):
+    """
+     | map_line - a line located on the current map
+     | This is an internal routine and is not generally used by the user.
+     |
+     | lons=None - longitudes of the line
+     | lats=None - latitudes of the line
+     | crs=None - cartopy coordinate system of the line
+     |
+     | The line is projected as cartopy would for a plot with
+     | transform=crs and kept in the map template so that later maps with
+     | the same settings do not project it again.
+     |
+     :Returns:
+      x and y map positions of the line with NaNs where it is broken
+     |
+    """
+
+    key = (crs, np.asarray(lons, dtype=float).tobytes(),
+           np.asarray(lats, dtype=float).tobytes())
+    template = plotvars.map_template
+    if template is not None and key in template['lines']:
+        return template['lines'][key]
+
+    import matplotlib.path as mpath
+    cpath = import_cartopy('cartopy.mpl.path')
+
+    proj = plotvars.mymap.projection
+    path = mpath.Path(np.column_stack([lons, lats]))
+    geom = proj.project_geometry(cpath.path_to_shapely(path), crs)
+
+    # Join the parts of the line with NaNs between them
+    path = cpath.shapely_to_path(geom)
+    starts = []
+    if path.codes is not None:
+        starts = np.nonzero(path.codes == mpath.Path.MOVETO)[0][1:]
+    line = (np.insert(path.vertices[:, 0], starts, np.nan),
+            np.insert(path.vertices[:, 1], starts, np.nan))
+
+    if template is not None:
+        template['lines'][key] = line
+
+    return line
 
 
 def polar_regular_grid(pts=50):
@@ -6134,6 +7282,49 @@ def reset():
     setvars()
 
 
+def plot_context(**kwargs):
+    """
+     | plot_context makes a new plot context.  A plot context holds the
+     | cf-plot settings and the current plot, which are normally global.
+     | The routines called inside a with block for a plot context use and
+     | change the settings of that context rather than the global ones:
+     |
+     | with cfp.plot_context():
+     |     cfp.mapset(proj='npstere')
+     |     cfp.gopen(file='polar.png')
+     |     cfp.con(f)
+     |     cfp.gclose()
+     |
+     | Each new plot context starts from the default settings so there is
+     | no need to call reset between plots.  The same context can be
+     | entered again later to carry on with its settings.  Plot contexts
+     | belong to a thread, so several threads can each make plots in their
+     | own context.  cartopy is not thread-safe so routines that may draw
+     | on a map, such as con and vect, run in turn in different threads
+     | while other work such as saving the plot with gclose is done at the
+     | same time.  Threads mainly give each plot its own settings rather
+     | than a speedup - use render_many to make plots in parallel.  Outside
+     | of any with block the global settings are used as before.
+     |
+     | Keywords are any of the variables in cfp.plotvars, such as
+     | file='plot.png' or viewer=None, to set in the new context.
+     |
+     :Returns:
+      plot context
+     |
+    """
+
+    context = pvars(**plotvars_defaults)
+    for attr, value in kwargs.items():
+        if attr not in plotvars_defaults:
+            errstr = '\n\n cfp.plot_context error - ' + attr
+            errstr += ' is not a cf-plot plotting variable\n\n'
+            raise Warning(errstr)
+        setattr(context, attr, value)
+
+    return context
+
+
 def setvars(file=None, title_fontsize=None, text_fontsize=None,
             colorbar_fontsize=None, colorbar_fontweight=None,
             axis_label_fontsize=None, title_fontweight=None,
@@ -6157,7 +7348,7 @@ def setvars(file=None, title_fontsize=None, text_fontsize=None,
             degsym=None, axis_width=None, grid=None,
             grid_x_spacing=None, grid_y_spacing=None, grid_zorder=None,
             grid_colour=None, grid_linestyle=None, grid_thickness=None,
-            tight=None, level_spacing=None):
+            tight=None, level_spacing=None, cache_dir=None, profile=None):
     """
      | setvars - set plotting variables and their defaults
      |
@@ -6218,6 +7409,13 @@ def setvars(file=None, title_fontsize=None, text_fontsize=None,
      | tight=False - remove whitespace around the plot
      | level_spacing=None - default contour level spacing - takes 'linear', 'log', 'loglike', 
      |                      'outlier' and 'inspect'
+     | cache_dir=None - directory to keep map data such as rotated pole coastlines
+     |                  and projected NaturalEarth features between sessions.
+     |                  This can be shared between processes.
+     | profile=None - set to True to record the time, memory change and array
+     |                sizes of each stage of a plot such as calculate_levels,
+     |                set_map, the filled contours and savefig.  The report is
+     |                made by gclose and returned by cfp.profile_report().
      |
      | Use setvars() to reset to the defaults
      |
@@ -6230,6 +7428,8 @@ def setvars(file=None, title_fontsize=None, text_fontsize=None,
      |
     """
 
+    global profile_tracemalloc
+
     vals = [file, title_fontsize, text_fontsize, axis_label_fontsize,
             continent_thickness, title_fontweight, text_fontweight,
             axis_label_fontweight, fontweight,  continent_color,
@@ -6245,7 +7445,8 @@ def setvars(file=None, title_fontsize=None, text_fontsize=None,
             rotated_labels, colorbar_fontsize, colorbar_fontweight,
             legend_frame, legend_frame_edge_color, legend_frame_face_color,
             degsym, axis_width, grid, grid_x_spacing, grid_y_spacing, grid_zorder,
-            grid_colour, grid_linestyle, grid_thickness, tight, level_spacing]
+            grid_colour, grid_linestyle, grid_thickness, tight, level_spacing,
+            cache_dir, profile]
     if all(val is None for val in vals):
         plotvars.file = None
         plotvars.title_fontsize = 15
@@ -6299,9 +7500,11 @@ def setvars(file=None, title_fontsize=None, text_fontsize=None,
         plotvars.grid_linestyle = '--'
         plotvars.grid_thickness = 1.0
         plotvars.grid_zorder = 100
-        matplotlib.pyplot.ioff()
+        plot.ioff()
         plotvars.tight = False
         plotvars.level_spacing = None
+        plotvars.cache_dir = None
+        profile = False
 
     if file is not None:
         plotvars.file = file
@@ -6409,6 +7612,19 @@ def setvars(file=None, title_fontsize=None, text_fontsize=None,
         plotvars.tight = tight
     if level_spacing is not None:
         plotvars.level_spacing = level_spacing
+    if cache_dir is not None:
+        plotvars.cache_dir = cache_dir
+    if profile is not None:
+        # Memory changes are measured with tracemalloc
+        import tracemalloc
+        if profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            profile_tracemalloc = True
+        if not profile and profile_tracemalloc:
+            tracemalloc.stop()
+            profile_tracemalloc = False
+        plotvars.profile = profile
+        plotvars.profile_stages = None
 
 def vloc(xvec=None, yvec=None, lons=None, lats=None):
     """
@@ -6439,50 +7655,32 @@ def vloc(xvec=None, yvec=None, lons=None, lats=None):
         errstr += 'generate a set of location points\n'
         raise Warning(errstr)
 
-    xarr = np.zeros(np.size(lons))
-    yarr = np.zeros(np.size(lats))
+    # Work on copies so the caller's arrays are left unchanged
+    xvec = np.array(xvec, dtype=float)
+    yvec = np.array(yvec, dtype=float)
+    lons = np.array(lons, dtype=float)
+    lats = np.array(lats, dtype=float)
 
     # Convert longitudes to -180 to 180.
-    for i in np.arange(np.size(xvec)):
-        xvec[i] = ((xvec[i] + 180) % 360) - 180
-    for i in np.arange(np.size(lons)):
-        lons[i] = ((lons[i] + 180) % 360) - 180
+    xvec = ((xvec + 180) % 360) - 180
+    lons = ((lons + 180) % 360) - 180
 
     # Centre around 180 degrees longitude if needed.
-    if (max(xvec) > 150):
-        for i in np.arange(np.size(xvec)):
-            xvec[i] = (xvec[i] + 360.0) % 360.0
-        pts = np.where(xvec < 0.0)
-        xvec[pts] = xvec[pts] + 360.0
-        for i in np.arange(np.size(lons)):
-            lons[i] = (lons[i] + 360.0) % 360.0
-        pts = np.where(lons < 0.0)
-        lons[pts] = lons[pts] + 360.0
-
-    # Find position in array
-    for i in np.arange(np.size(lons)):
-
-        if ((lons[i] < min(xvec)) or (lons[i] > max(xvec))):
-            xpt = -1
-        else:
-            xpts = np.where(lons[i] >= xvec)
-            xpt = np.nanmax(xpts)
-
-        if ((lats[i] < min(yvec)) or (lats[i] > max(yvec))):
-            ypt = -1
-        else:
-            ypts = np.where(lats[i] >= yvec)
-            ypt = np.nanmax(ypts)
-
-        if (xpt >= 0):
-            xarr[i] = xpt + (lons[i] - xvec[xpt]) / (xvec[xpt + 1] - xvec[xpt])
-        else:
-            xarr[i] = None
-
-        if (ypt >= 0) and ypt <= np.size(yvec) - 2:
-            yarr[i] = ypt + (lats[i] - yvec[ypt]) / (yvec[ypt + 1] - yvec[ypt])
-        else:
-            yarr[i] = None
+    if (np.max(xvec) > 150):
+        xvec = (xvec + 360.0) % 360.0
+        lons = (lons + 360.0) % 360.0
+
+    # Find the fractional position in the array of each point.
+    # Points outside the array are set to NaN.
+    locs = []
+    for vec, vals in [[xvec, lons], [yvec, lats]]:
+        pos = np.searchsorted(vec, vals, side='right') - 1
+        inside = (vals >= np.min(vec)) & (vals <= np.max(vec)) & (pos <= np.size(vec) - 2)
+        pos = np.clip(pos, 0, np.size(vec) - 2)
+        loc = pos + (vals - vec[pos]) / (vec[pos + 1] - vec[pos])
+        locs.append(np.where(inside, loc, np.nan))
+
+    xarr, yarr = locs
 
     return (xarr, yarr)
 
@@ -6535,34 +7733,18 @@ def rgaxes(xpole=None, ypole=None, xvec=None, yvec=None,
          ymin=0, ymax=np.size(yvec) - 1, user_gset=0)
 
     # Set continent thickness and color if not already set
-    if plotvars.continent_thickness is None:
+    continent_thickness = plotvars.continent_thickness
+    continent_color = plotvars.continent_color
+    if continent_thickness is None:
         continent_thickness = 1.5
-    if plotvars.continent_color is None:
+    if continent_color is None:
         continent_color = 'k'
 
     # Draw continents
     if continents:
-
-        import cartopy.io.shapereader as shpreader
-        import shapefile
-        shpfilename = shpreader.natural_earth(resolution=plotvars.resolution,
-                                              category='physical',
-                                              name='coastline')
-        reader = shapefile.Reader(shpfilename)
-        shapes = [s.points for s in reader.shapes()]
-        for shape in shapes:
-            lons, lats = list(zip(*shape))
-            lons = np.array(lons)
-            lats = np.array(lats)
-
-            rotated_transform = ccrs.RotatedPole(pole_latitude=ypole, pole_longitude=xpole)
-            points = rotated_transform.transform_points(ccrs.PlateCarree(), lons, lats)
-            xout = np.array(points)[:, 0]
-            yout = np.array(points)[:, 1]
-
-            xpts, ypts = vloc(lons=xout, lats=yout, xvec=xvec, yvec=yvec)
-            plotvars.plot.plot(xpts, ypts, linewidth=continent_thickness,
-                               color=continent_color)
+        xpts, ypts = rotated_coastlines(xpole=xpole, ypole=ypole, xvec=xvec, yvec=yvec)
+        plotvars.plot.plot(xpts, ypts, linewidth=continent_thickness,
+                           color=continent_color)
 
     if xticks is None:
         lons = -180 + np.arange(360 / spacing + 1) * spacing
@@ -6580,6 +7762,8 @@ def rgaxes(xpole=None, ypole=None, xvec=None, yvec=None,
     spacing_y = (ylim[1] - ylim[0]) / 20
     spacing = min(spacing_x, spacing_y)
 
+    rotated_transform = ccrs.RotatedPole(pole_latitude=ypole, pole_longitude=xpole)
+
     # Draw lines along a longitude
     if axes:
         if xaxis:
@@ -6588,7 +7772,6 @@ def rgaxes(xpole=None, ypole=None, xvec=None, yvec=None,
                 lona = np.zeros(int(ipts)) + lons[val]
                 lata = -90 + np.arange(ipts - 1) * degspacing
 
-                rotated_transform = ccrs.RotatedPole(pole_latitude=ypole, pole_longitude=xpole)
                 points = rotated_transform.transform_points(ccrs.PlateCarree(), lona, lata)
                 xout = np.array(points)[:, 0]
                 yout = np.array(points)[:, 1]
@@ -6633,7 +7816,6 @@ def rgaxes(xpole=None, ypole=None, xvec=None, yvec=None,
                 lata = np.zeros(int(ipts)) + lats[val]
                 lona = -180.0 + np.arange(ipts - 1) * degspacing
 
-                rotated_transform = ccrs.RotatedPole(pole_latitude=ypole, pole_longitude=xpole)
                 points = rotated_transform.transform_points(ccrs.PlateCarree(), lona, lata)
                 xout = np.array(points)[:, 0]
                 yout = np.array(points)[:, 1]
@@ -6672,6 +7854,83 @@ def rgaxes(xpole=None, ypole=None, xvec=None, yvec=None,
     yvec = yvec_orig
 
 
+def rotated_coastlines(xpole=None, ypole=None, xvec=None, yvec=None):
+    """
+     | rotated_coastlines - coastlines located on a rotated pole grid
+     | This is an internal routine and is not generally used by the user.
+     |
+     | xpole=None - location of xpole in degrees
+     | ypole=None - location of ypole in degrees
+     | xvec=None - location of x grid points
+     | yvec=None - location of y grid points
+     |
+     | The coastlines at plotvars.resolution are rotated and located on the
+     | grid with vloc as one NaN separated line.  The result is cached in
+     | memory for the resolution, pole and grid, and also on disk if
+     | cfp.setvars(cache_dir=...) has been set, so later plots on the same
+     | grid skip reading and transforming the coastlines.
+     |
+     :Returns:
+      grid x and y positions of the coastlines
+     |
+    """
+
+    # Make the cache key
+    key = hashlib.sha1()
+    key.update(repr((plotvars.resolution, float(ypole), float(xpole))).encode())
+    key.update(np.ascontiguousarray(xvec, dtype=float).tobytes())
+    key.update(b'y')
+    key.update(np.ascontiguousarray(yvec, dtype=float).tobytes())
+    key = key.hexdigest()
+
+    if key in rotated_coastline_cache:
+        return rotated_coastline_cache[key]
+
+    cache_file = None
+    if plotvars.cache_dir is not None:
+        cache_file = os.path.join(plotvars.cache_dir, 'rotated_coastline_' + key + '.npz')
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as data:
+                coastlines = (data['xpts'], data['ypts'])
+            rotated_coastline_cache[key] = coastlines
+            return coastlines
+
+    import shapefile
+    shpreader = import_cartopy('cartopy.io.shapereader')
+    shpfilename = shpreader.natural_earth(resolution=plotvars.resolution,
+                                          category='physical',
+                                          name='coastline')
+    reader = shapefile.Reader(shpfilename)
+
+    # Join all the shapes into one line with NaNs between them
+    lons = []
+    lats = []
+    for shape in reader.shapes():
+        points = np.array(shape.points, dtype=float)
+        lons.extend([points[:, 0], [np.nan]])
+        lats.extend([points[:, 1], [np.nan]])
+    reader.close()
+    lons = np.concatenate(lons)
+    lats = np.concatenate(lats)
+
+    rotated_transform = ccrs.RotatedPole(pole_latitude=ypole, pole_longitude=xpole)
+    points = rotated_transform.transform_points(ccrs.PlateCarree(), lons, lats)
+    xpts, ypts = vloc(lons=points[:, 0], lats=points[:, 1], xvec=xvec, yvec=yvec)
+
+    coastlines = (xpts, ypts)
+    rotated_coastline_cache[key] = coastlines
+
+    if cache_file is not None:
+        os.makedirs(plotvars.cache_dir, exist_ok=True)
+        tmp_file = cache_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_file, 'wb') as file:
+            np.savez(file, xpts=xpts, ypts=ypts)
+        os.replace(tmp_file, cache_file)
+
+    return coastlines
+
+
+@plot_locked
 def lineplot(f=None, x=None, y=None, fill=True, lines=True, line_labels=True,
              title=None, ptype=0, linestyle='-', linewidth=1.0, color=None,
              xlog=False, ylog=False, verbose=None, swap_xy=False,
@@ -6680,7 +7939,8 @@ def lineplot(f=None, x=None, y=None, fill=True, lines=True, line_labels=True,
              legend_location='upper right', xunits=None, yunits=None,
              xlabel=None, ylabel=None, xticks=None, yticks=None,
              xticklabels=None, yticklabels=None, xname=None, yname=None,
-             axes=True, xaxis=True, yaxis=True, titles=False, zorder=None):
+             axes=True, xaxis=True, yaxis=True, titles=False, zorder=None,
+             decimate=None, decimate_extrema=False):
     """
     | lineplot is the interface to line plotting in cf-plot.
     | The minimum use is lineplot(f) where f is a CF field.
@@ -6713,6 +7973,18 @@ def lineplot(f=None, x=None, y=None, fill=True, lines=True, line_labels=True,
     | verbose=None - change to 1 to get a verbose listing of what lineplot
     |                is doing
     | zorder=None - plotting order
+    | decimate=None - reduce the number of points plotted for long lines to
+    |                 those needed at the resolution of the plot.  The line
+    |                 coordinate must be sorted.  Markers are drawn at the points
+    |                 that are kept.
+    |                 'minmax' - keep the first, last, lowest and highest point in
+    |                            each quarter pixel along the axis.  The line
+    |                            looks the same as plotting all the points.
+    |                 'lttb' - Largest-Triangle-Three-Buckets with two points per
+    |                          pixel.  This keeps the shape of the line with
+    |                          fewer points than 'minmax'.
+    | decimate_extrema=False - with decimate='lttb' also keep the lowest and
+    |                          highest points of the line
     |
     | The following parameters override any CF data defaults:
     | title=None - plot title
@@ -6765,7 +8037,7 @@ def lineplot(f=None, x=None, y=None, fill=True, lines=True, line_labels=True,
     ##################
     cf_field = False
     if f is not None:
-        if isinstance(f, cf.Field):
+        if cf_isinstance(f, 'Field'):
             cf_field = True
 
             # Check data is 1D
@@ -6776,14 +8048,14 @@ def lineplot(f=None, x=None, y=None, fill=True, lines=True, line_labels=True,
                 raise TypeError(errstr)
 
             if x is not None:
-                if isinstance(x, cf.Field):
+                if cf_isinstance(x, 'Field'):
                     errstr = "\n\ncfp.lineplot error - two or more cf-fields passed for plotting.\n"
                     errstr += "To plot two cf-fields open a graphics plot with cfp.gopen(), \n"
                     errstr += "plot the two fields separately with cfp.lineplot and then close\n"
                     errstr += "the graphics plot with cfp.gclose()\n\n"
                     raise TypeError(errstr)
 
-        elif isinstance(f, cf.FieldList):
+        elif cf_isinstance(f, 'FieldList'):
             errstr = "\n\ncfp.lineplot - cannot plot a field list\n\n"
             raise TypeError(errstr)
 
@@ -7153,6 +8425,10 @@ def lineplot(f=None, x=None, y=None, fill=True, lines=True, line_labels=True,
                               fontsize=plotvars.axis_label_fontsize,
                               fontweight=plotvars.axis_label_fontweight)
 
+    if decimate:
+        xpts, ypts = lineplot_decimate(xpts, ypts, graph=graph, method=decimate,
+                                       extrema=decimate_extrema, verbose=verbose)
+
     graph.plot(xpts, ypts, **colorarg, linestyle=linestyle,
                linewidth=linewidth, marker=marker,
                markersize=markersize,
@@ -7196,28 +8472,201 @@ def lineplot(f=None, x=None, y=None, fill=True, lines=True, line_labels=True,
         gclose()
 
 
-def regression_tests():
+def lineplot_decimate(xpts=None, ypts=None, graph=None, method='minmax', extrema=False,
+                      verbose=None):
     """
-    | Test for cf-plot regressions
-    | Run through some standard levs, gvals, lon and lat labelling
-    | Make all the gallery plots and use Imagemaick to display them
-    | alongside a reference plot
-    |
+    | lineplot_decimate - reduce the points of a line to those needed at the
+    | resolution of the plot.  The points are put in bins along the axis of
+    | whichever of x and y is sorted using the axis limits, scale and size
+    | and the figure dpi.
     |
+    | xpts=None - x points of the line
+    | ypts=None - y points of the line
+    | graph=None - axes the line is plotted in
+    | method='minmax' - 'minmax' or 'lttb' - see decimate in lineplot
+    | extrema=False - with 'lttb' also keep the lowest and highest points
+    | verbose=None - print the number of points kept
     |
+    | This is an internal routine and is not generally used by the user.
     |
+    :Returns:
+     xpts, ypts - the points that are kept
     |
     """
+    if method not in ['minmax', 'lttb']:
+        errstr = '\nlineplot error - decimate must be one of minmax or lttb\n'
+        errstr += 'received ' + str(method) + '\n'
+        raise Warning(errstr)
 
-    print('==================')
-    print('Regression testing')
-    print('==================')
-    print('')
+    try:
+        xvals = np.ma.filled(np.ma.array(xpts, dtype=float), np.nan).ravel()
+        yvals = np.ma.filled(np.ma.array(ypts, dtype=float), np.nan).ravel()
+    except (TypeError, ValueError):
+        return xpts, ypts
+
+    # Pixels along the axis of the sorted coordinate
+    figure = graph.get_figure()
+    dpi = plotvars.dpi if plotvars.dpi is not None else figure.dpi
+    position = graph.get_position()
+    if np.size(xvals) < 3 or np.size(xvals) != np.size(yvals):
+        return xpts, ypts
+    elif decimate_sorted(xvals):
+        coords, values = xvals, yvals
+        limits, scale = graph.get_xlim(), graph.get_xscale()
+        npixels = position.width * figure.get_figwidth() * dpi
+    elif decimate_sorted(yvals):
+        coords, values = yvals, xvals
+        limits, scale = graph.get_ylim(), graph.get_yscale()
+        npixels = position.height * figure.get_figheight() * dpi
+    else:
+        if verbose:
+            print('lineplot - not decimating as neither x nor y is sorted')
+        return xpts, ypts
+
+    # Bin of each point with points outside the axis limits in a bin at each end
+    # Quarter pixel bins keep the antialiased edges of the line close to
+    # those with all the points
+    nbins = 4 * int(np.ceil(npixels))
+    if method == 'lttb':
+        nbins = 2 * int(np.ceil(npixels))
+    if scale == 'log':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coords = np.log10(coords)
+            limits = np.log10(limits)
+    bins = np.floor((coords - limits[0]) / (limits[1] - limits[0]) * nbins)
+    bins = np.clip(np.nan_to_num(bins), -1, nbins).astype(int)
+
+    if method == 'minmax':
+        keep = decimate_minmax(values, bins)
+    else:
+        keep = decimate_lttb(coords, values, bins)
+        if extrema and np.any(np.isfinite(values)):
+            keep = np.union1d(keep, [np.nanargmin(values), np.nanargmax(values)])
 
-    print('------------------')
-    print('Testing for levels')
-    print('------------------')
-    ref_answer = [-35, -30, -25, -20, -15, -10, -5, 0, 5,
+    if verbose:
+        print('lineplot - decimating', np.size(values), 'points to', np.size(keep))
+
+    return np.ravel(xpts)[keep], np.ravel(ypts)[keep]
+
+
+def decimate_sorted(values=None):
+    """
+    | decimate_sorted - check if values are sorted in either direction
+    | This is an internal routine and is not generally used by the user.
+    |
+    | values=None - values to check
+    |
+    :Returns:
+     True or False
+    |
+    """
+    steps = np.diff(values)
+    return bool(np.all(steps >= 0) or np.all(steps <= 0))
+
+
+def decimate_minmax(values=None, bins=None):
+    """
+    | decimate_minmax - the first, last, lowest and highest point in each bin.
+    | The first missing point in a bin is also kept so the line is broken there.
+    | This is an internal routine and is not generally used by the user.
+    |
+    | values=None - values with NaN for missing points
+    | bins=None - bin of each point with the points of a bin next to each other
+    |
+    :Returns:
+     sorted indices of the points to keep
+    |
+    """
+    npts = np.size(values)
+    index = np.arange(npts)
+    starts = np.flatnonzero(np.concatenate([[True], bins[1:] != bins[:-1]]))
+    sizes = np.diff(np.append(starts, npts))
+
+    with np.errstate(invalid='ignore'):
+        lowest = np.repeat(np.fmin.reduceat(values, starts), sizes)
+        highest = np.repeat(np.fmax.reduceat(values, starts), sizes)
+    first_lowest = np.minimum.reduceat(np.where(values == lowest, index, npts), starts)
+    first_highest = np.minimum.reduceat(np.where(values == highest, index, npts), starts)
+    first_missing = np.minimum.reduceat(np.where(np.isnan(values), index, npts), starts)
+
+    keep = np.unique(np.concatenate([starts, starts + sizes - 1, first_lowest,
+                                     first_highest, first_missing]))
+    return keep[keep < npts]
+
+
+def decimate_lttb(coords=None, values=None, bins=None):
+    """
+    | decimate_lttb - Largest-Triangle-Three-Buckets decimation.  The first and
+    | last points are kept and from each bin the point making the largest
+    | triangle with the last point kept and the mean of the next bin.  The
+    | first missing point in a bin is also kept so the line is broken there.
+    | This is an internal routine and is not generally used by the user.
+    |
+    | coords=None - sorted coordinates of the points
+    | values=None - values with NaN for missing points
+    | bins=None - bin of each point with the points of a bin next to each other
+    |
+    :Returns:
+     sorted indices of the points to keep
+    |
+    """
+    npts = np.size(values)
+    starts = np.flatnonzero(np.concatenate([[True], bins[1:] != bins[:-1]]))
+    ends = np.append(starts[1:], npts)
+    missing = np.isnan(values)
+
+    # Means of the bins for the third point of the triangles
+    with np.errstate(invalid='ignore'):
+        sizes = np.add.reduceat(~missing, starts)
+        mean_coords = np.add.reduceat(coords, starts) / (ends - starts)
+        mean_values = np.add.reduceat(np.where(missing, 0.0, values), starts) / sizes
+    mean_coords = np.append(mean_coords[1:], coords[-1])
+    mean_values = np.append(mean_values[1:], values[-1])
+
+    if np.all(missing):
+        return np.array([0, npts - 1])
+
+    keep = [0, npts - 1]
+    last = int(np.argmax(~missing))
+    for start, end, next_coord, next_value in zip(starts, ends, mean_coords, mean_values):
+        first_missing = np.flatnonzero(missing[start:end])
+        if np.size(first_missing) > 0:
+            keep.append(start + first_missing[0])
+            if np.size(first_missing) == end - start:
+                continue
+        if np.isnan(next_value):
+            next_value = values[last]
+        area = np.abs((coords[last] - next_coord) * (values[start:end] - values[last]) -
+                      (coords[last] - coords[start:end]) * (next_value - values[last]))
+        last = start + np.nanargmax(area)
+        keep.append(last)
+
+    return np.unique(keep)
+
+
+def regression_tests(reference_file=None, update=False):
+    """
+    | Test for cf-plot regressions
+    | Run through some standard levs, gvals, lon and lat labelling
+    | Make the gallery plots from synthetic data and compare them with
+    | reference images - see regression_images
+    |
+    | reference_file=None - file of reference images, default is the
+    |                       references shipped with cf-plot
+    | update=False - set to True to store the new images as the references
+    |
+    |
+    """
+
+    print('==================')
+    print('Regression testing')
+    print('==================')
+    print('')
+
+    print('------------------')
+    print('Testing for levels')
+    print('------------------')
+    ref_answer = [-35, -30, -25, -20, -15, -10, -5, 0, 5,
                   10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65]
     compare_arrays(ref=ref_answer, levs_test=True, min=-35, max=65, step=5)
 
@@ -7291,418 +8740,468 @@ def regression_tests():
                   ['0', '5N', '10N', '15N', '20N', '25N', '30N'])
     compare_arrays(ref=ref_answer, min=0, max=30, type=2, mapaxis_test=True)
 
+    print('')
+    print('-------------------------------------')
+    print('Testing for trajectory line segments')
+    print('-------------------------------------')
+    # A point left out of the window never joins the points either side of it
+    ref_answer = [[25, 25, 35, 25], [35, 25, 35, 60], [35, 60, -35, 25],
+                  [-35, 25, -25, 25]]
+    compare_arrays(ref=ref_answer, traj_test=True,
+                   lons=[[25, 35, 35, -35, -25]], lats=[[25, 25, 60, 25, 25]],
+                   window=[[True, True, False, True, True]])
+
+    ref_answer = [[25, 25, 35, 25], [-35, 25, -25, 25]]
+    compare_arrays(ref=ref_answer, traj_test=True,
+                   lons=[[25, 35, 35, -35, -25]], lats=[[25, 25, 60, 25, 25]],
+                   window=[[True, False, False, False, True]])
+
     print('')
     print('-----------------')
     print('Testing for plots')
     print('-----------------')
 
-    # Run through gallery examples and compare to reference plots
-
-    # example1
-    reset()
-    setvars(file='fig1.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    con(f.subspace(time=15))
-    compare_images(1)
-
-    # example2
-    reset()
-    setvars(file='fig2.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    con(f.subspace(time=15), blockfill=True, lines=False)
-    compare_images(2)
-
-    # example3
-    reset()
-    setvars(file='fig3.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    mapset(lonmin=-15, lonmax=3, latmin=48, latmax=60)
-    levs(min=265, max=285, step=1)
-    con(f.subspace(time=15))
-    compare_images(3)
-
-    # example4
-    reset()
-    setvars(file='fig4.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    mapset(proj='npstere')
-    con(f.subspace(pressure=500))
-    compare_images(4)
-
-    # example5
-    reset()
-    setvars(file='fig5.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    mapset(proj='spstere', boundinglat=-30, lon_0=180)
-    con(f.subspace(pressure=500))
-    compare_images(5)
-
-    # example6
-    reset()
-    setvars(file='fig6.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[3]
-    con(f.subspace(longitude=0))
-    compare_images(6)
-
-    # example7
-    reset()
-    setvars(file='fig7.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    con(f.collapse('mean', 'longitude'))
-    compare_images(7)
-
-    # example8
-    reset()
-    setvars(file='fig8.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    con(f.collapse('mean', 'longitude'), ylog=1)
-    compare_images(8)
-
-    # example9
-    reset()
-    setvars(file='fig9.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[0]
-    con(f.collapse('mean', 'latitude'))
-    compare_images(9)
-
-    # example10
-    reset()
-    setvars(file='fig10.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    cscale('plasma')
-    con(f.subspace(longitude=0), lines=0)
-    compare_images(10)
-
-    # example11
-    reset()
-    setvars(file='fig11.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    gset(-30, 30, '1960-1-1', '1980-1-1')
-    levs(min=280, max=305, step=1)
-    cscale('plasma')
-    con(f.subspace(longitude=0), lines=0)
-    compare_images(11)
-
-    # example12
-    reset()
-    setvars(file='fig12.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    cscale('plasma')
-    con(f.subspace(latitude=0), lines=0)
-    compare_images(12)
-
-    # example13
-    reset()
-    setvars(file='fig13.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')
-    u = f[1].subspace(pressure=500)
-    v = f[3].subspace(pressure=500)
-    vect(u=u, v=v, key_length=10, scale=100, stride=5)
-    compare_images(13)
-
-    # example14
-    reset()
-    setvars(file='fig14.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')
-    u = f[1].subspace(pressure=500)
-    v = f[3].subspace(pressure=500)
-    t = f[0].subspace(pressure=500)
-
-    gopen()
-    mapset(lonmin=10, lonmax=120, latmin=-30, latmax=30)
-    levs(min=254, max=270, step=1)
-    con(t)
-    vect(u=u, v=v, key_length=10, scale=50, stride=2)
-    gclose()
-    compare_images(14)
-
-    # example15
-    reset()
-    setvars(file='fig15.png')
-    u = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    v = cf.read('/opt/graphics/cfplot_data/ggap.nc')[3]
-    u = u.subspace(Z=500)
-    v = v.subspace(Z=500)
-
-    mapset(proj='npstere')
-    vect(u=u, v=v, key_length=10, scale=100, pts=40,
-         title='Polar plot with regular point distribution')
-    compare_images(15)
-
-    # example16
-    reset()
-    setvars(file='fig16.png')
-    c = cf.read('/opt/graphics/cfplot_data/vaAMIPlcd_DJF.nc')[0]
-    c = c.subspace(Y=cf.wi(-60, 60))
-    c = c.subspace(X=cf.wi(80, 160))
-    c = c.collapse('T: mean X: mean')
-
-    g = cf.read('/opt/graphics/cfplot_data/wapAMIPlcd_DJF.nc')[0]
-    g = g.subspace(Y=cf.wi(-60, 60))
-    g = g.subspace(X=cf.wi(80, 160))
-    g = g.collapse('T: mean X: mean')
-
-    vect(u=c, v=-g, key_length=[5, 0.05],
-         scale=[20, 0.2], title='DJF', key_location=[0.95, -0.05])
-    compare_images(16)
-
-    # example17
-    reset()
-    setvars(file='fig17.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    g = f.subspace(time=15)
-    gopen()
-    cscale('magma')
-    con(g)
-    stipple(f=g, min=220, max=260, size=100, color='#00ff00')
-    stipple(f=g, min=300, max=330, size=50, color='#0000ff', marker='s')
-    gclose()
-    compare_images(17)
-
-    # example18
-    reset()
-    setvars(file='fig18.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    g = f.subspace(time=15)
-    gopen()
-    cscale('magma')
-    mapset(proj='npstere')
-    con(g)
-    stipple(f=g, min=265, max=295, size=100, color='#00ff00')
-    gclose()
-    compare_images(18)
-
-    # example19
-    reset()
-    setvars(file='fig19.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    gopen(rows=2, columns=2, bottom=0.2)
-    gpos(1)
-    con(f.subspace(pressure=500), colorbar=None)
-    gpos(2)
-    mapset(proj='moll')
-    con(f.subspace(pressure=500), colorbar=None)
-    gpos(3)
-    mapset(proj='npstere', boundinglat=30, lon_0=180)
-    con(f.subspace(pressure=500), colorbar=None)
-    gpos(4)
-    mapset(proj='spstere', boundinglat=-30, lon_0=180)
-    con(f.subspace(pressure=500), colorbar_position=[
-        0.1, 0.1, 0.8, 0.02], colorbar_orientation='horizontal')
-    gclose()
-    compare_images(19)
-
-    # example20
-    reset()
-    setvars(file='fig20.png')
-    f = cf.read('/opt/graphics/cfplot_data/Geostropic_Adjustment.nc')[0]
-    con(f.subspace[9])
-    compare_images(20)
-
-    # example21
-    reset()
-    setvars(file='fig21.png')
-    f = cf.read('/opt/graphics/cfplot_data/Geostropic_Adjustment.nc')[0]
-    con(f.subspace[9], title='test data',
-        xticks=np.arange(5) * 100000 + 100000,
-        yticks=np.arange(7) * 2000 + 2000,
-        xlabel='x-axis', ylabel='z-axis')
-    compare_images(21)
-
-    # example22
-    reset()
-    setvars(file='fig22.png')
-    f = cf.read_field('/opt/graphics/cfplot_data/rgp.nc')
-    cscale('gray')
-    con(f)
-    compare_images(22)
-
-    # example23
-    reset()
-    setvars(file='fig23.png')
-    f = cf.read_field('/opt/graphics/cfplot_data/rgp.nc')
-    data = f.array
-    xvec = f.construct('dim1').array
-    yvec = f.construct('dim0').array
-    xpole = 160
-    ypole = 30
-
-    gopen()
-    cscale('plasma')
-    xpts = np.arange(np.size(xvec))
-    ypts = np.arange(np.size(yvec))
-    gset(xmin=0, xmax=np.size(xvec) - 1, ymin=0, ymax=np.size(yvec) - 1)
-    levs(min=980, max=1035, step=2.5)
-    con(data, xpts, ypts[::-1])
-    rgaxes(xpole=xpole, ypole=ypole, xvec=xvec, yvec=yvec)
-    gclose()
-    compare_images(23)
-
-    # example24
-    reset()
-    setvars(file='fig24.png')
-    from matplotlib.mlab import griddata
-
-    # Arrays for data
-    lons = []
-    lats = []
-    pressure = []
-    temp = []
-
-    # Read data
-    f = open('/opt/graphics/cfplot_data/synop_data.txt')
-    lines = f.readlines()
-    for line in lines:
-        mysplit = line.split()
-        lons = np.append(lons, float(mysplit[1]))
-        lats = np.append(lats, float(mysplit[2]))
-        pressure = np.append(pressure, float(mysplit[3]))
-        temp = np.append(temp, float(mysplit[4]))
-
-    # Linearly interpolate data to a regular grid
-    lons_new = np.arange(140) * 0.1 - 11.0
-    lats_new = np.arange(140) * 0.1 + 49.0
-    temp_new = griddata(lons, lats, temp, lons_new, lats_new, interp='linear')
-
-    cscale('parula')
-    con(x=lons_new, y=lats_new, f=temp_new, ptype=1)
-    compare_images(24)
-
-    # example25
-    reset()
-    setvars(file='fig25.png')
-    gopen()
-    con(x=lons_new, y=lats_new, f=temp_new, ptype=1)
-    for i in np.arange(len(lines)):
-        plotvars.plot.text(float(lons[i]), float(lats[i]), str(temp[i]),
-                           horizontalalignment='center',
-                           verticalalignment='center')
-
-    gclose()
-    compare_images(25)
-
-    # example26
-    reset()
-    setvars(file='fig26.png')
-    from netCDF4 import Dataset as ncfile
-    from matplotlib.mlab import griddata
-
-    # Get an Orca grid and flatten the arrays
-    nc = ncfile('/opt/graphics/cfplot_data/orca2.nc')
-    lons = np.array(nc.variables['longitude'])
-    lats = np.array(nc.variables['latitude'])
-    temp = np.array(nc.variables['sst'])
-    lons = lons.flatten()
-    lats = lats.flatten()
-    temp = temp.flatten()
-
-    # Add wrap around at both longitude limits
-    pts = np.squeeze(np.where(lons < -150))
-    lons = np.append(lons, lons[pts] + 360)
-    lats = np.append(lats, lats[pts])
-    temp = np.append(temp, temp[pts])
-
-    pts = np.squeeze(np.where(lons > 150))
-    lons = np.append(lons, lons[pts] - 360)
-    lats = np.append(lats, lats[pts])
-    temp = np.append(temp, temp[pts])
-
-    lons_new = np.arange(181 * 8) * 0.25 - 180.0
-    lats_new = np.arange(91 * 8) * 0.25 - 90.0
-    temp_new = griddata(lons, lats, temp, lons_new, lats_new, interp='linear')
-
-    con(x=lons_new, y=lats_new, f=temp_new, ptype=1)
-    compare_images(26)
-
-    # example27
-    reset()
-    setvars(file='fig27.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    g = f.collapse('X: mean')
-    lineplot(g.subspace(pressure=100), marker='o', color='blue',
-             title='Zonal mean zonal wind at 100mb')
-    compare_images(27)
-
-    # example28
-    reset()
-    setvars(file='fig28.png')
-    f = cf.read('/opt/graphics/cfplot_data/ggap.nc')[1]
-    g = f.collapse('X: mean')
+    # Make the gallery plots from synthetic data and compare them with
+    # the reference images
+    regression_images(reference_file=reference_file, update=update)
+
+
+def regression_images(reference_file=None, update=False,
+                      examples=None, tolerance=8, max_changed=0.001,
+                      min_ssim=0.99, time_factor=1.5, time_margin=0.1, repeat=2,
+                      dpi=50, diff_dir=None, verbose=True):
+    """
+     | regression_images makes the gallery plots from synthetic data and
+     | compares them with reference images.  The plots are made in memory
+     | so no graphics files or external programs are needed.  The time to
+     | make each plot is recorded and compared with the reference time so
+     | that a plot which has become slower is reported in the same run.
+     |
+     | reference_file=None - file of reference images and times, default
+     |                       is regression.npz shipped with cf-plot
+     | update=False - set to True to store the new images and times as the
+     |                references.  Otherwise an example with no reference
+     |                image fails.
+     | examples=None - list of example names to make.  The default is all of
+     |                 them - see regression_examples.
+     | tolerance=8 - largest difference in a colour channel (0-255) for
+     |               a pixel to count as unchanged
+     | max_changed=0.001 - largest fraction of changed pixels for a pass
+     | min_ssim=0.99 - smallest structural similarity for a pass
+     | time_factor=1.5 - a plot is reported as slow if it takes more than
+     |                   this multiple of the reference time
+     | time_margin=0.1 - and more than this many seconds longer than the
+     |                   reference time, which allows for the timing noise
+     |                   of quick plots
+     | repeat=2 - number of times to make each plot.  The time is the
+     |            shortest of these so that the map data, modules and
+     |            caches set up by the first plot are not counted.
+     | dpi=50 - resolution of the images
+     | diff_dir=None - directory to write the new, reference and difference
+     |                 images of the examples that fail
+     | verbose=True - print a line for each example
+     |
+     :Returns:
+      list of a dictionary for each example of
+          'example' - example name
+          'time' - time in seconds to make the plot
+          'reference_time' - reference time in seconds or None
+          'rms' - root mean square difference of the colour channels
+          'changed' - fraction of pixels changed
+          'ssim' - structural similarity with the reference image
+          'passed' - True or False or None if the references are updated
+          'slow' - True or False or None if there is no reference time
+     |
+    """
+
+    import time
+    import matplotlib.image as mimage
+
+    gallery = regression_examples()
+    if examples is not None:
+        names = [name for name, job in gallery]
+        for name in examples:
+            if name not in names:
+                errstr = '\n\n cfp.regression_images error - ' + str(name)
+                errstr += ' is not a regression example\n\n'
+                raise Warning(errstr)
+        gallery = [(name, job) for name, job in gallery if name in examples]
+
+    if reference_file is None:
+        reference_file = regression_file
+
+    references = {}
+    if os.path.isfile(reference_file):
+        with np.load(reference_file) as npz:
+            references = {key: npz[key] for key in npz.files}
+
+    results = []
+    stored = False
+    for name, job in gallery:
+        elapsed = None
+        for attempt in np.arange(max(repeat, 1)):
+            start = time.perf_counter()
+            image = regression_render(job, dpi=dpi)
+            elapsed = min(time.perf_counter() - start, elapsed or np.inf)
+
+        result = {'example': name, 'time': elapsed, 'reference_time': None,
+                  'rms': None, 'changed': None, 'ssim': None,
+                  'passed': None, 'slow': None}
+
+        reference = references.get('image_' + name)
+        if reference is not None:
+            result.update(compare_images(image, reference, tolerance=tolerance))
+            result['passed'] = bool(result['changed'] <= max_changed and
+                                    result['ssim'] >= min_ssim)
+        elif not update:
+            result['passed'] = False
+
+        reference_time = references.get('time_' + name)
+        if reference_time is not None:
+            result['reference_time'] = float(reference_time)
+            result['slow'] = bool(elapsed > time_factor * reference_time and
+                                  elapsed > reference_time + time_margin)
+
+        if update:
+            result['passed'] = None
+            references['image_' + name] = image
+            references['time_' + name] = np.array(elapsed)
+            stored = True
+
+        if result['passed'] is False and reference is not None and diff_dir is not None:
+            os.makedirs(diff_dir, exist_ok=True)
+            mimage.imsave(os.path.join(diff_dir, name + '_new.png'), image)
+            mimage.imsave(os.path.join(diff_dir, name + '_reference.png'), reference)
+            if np.shape(image) == np.shape(reference):
+                # Changed pixels are dark on a white background
+                diff = np.abs(image[..., :3].astype(int) - reference[..., :3])
+                diff = 255 - np.clip(diff.max(axis=-1) * 4, 0, 255)
+                mimage.imsave(os.path.join(diff_dir, name + '_difference.png'),
+                              diff.astype(np.uint8), cmap='gray', vmin=0, vmax=255)
+
+        if verbose:
+            if result['passed'] is None:
+                status = 'stored new reference'
+            elif result['passed']:
+                status = 'passed'
+            elif reference is None:
+                status = '***failed*** no reference image'
+            else:
+                status = '***failed***'
+                status += ' changed={:.4f} ssim={:.4f}'.format(result['changed'],
+                                                              result['ssim'])
+            timing = '{:7.2f} s'.format(elapsed)
+            if result['reference_time'] is not None:
+                timing += ' (reference {:.2f} s)'.format(result['reference_time'])
+                if result['slow']:
+                    timing += ' ***slow***'
+            print('{:12s} {:s} {:s}'.format(name, timing, status))
+
+        results.append(result)
+
+    if stored:
+        np.savez_compressed(reference_file, **references)
+
+    return results
+
+
+def regression_render(job=None, dpi=50):
+    """
+     | regression_render - make a regression example in memory
+     | This is an internal routine and is not generally used by the user.
+     |
+     | job=None - plot description of the example
+     | dpi=50 - resolution of the image
+     |
+     :Returns:
+      image as an array of RGBA values 0-255
+     |
+    """
+
+    import io
+    import matplotlib.image as mimage
+
+    buffer = io.BytesIO()
+    with plot_context(viewer=None, dpi=dpi) as context:
+        try:
+            render_job(dict(job, file=buffer))
+        finally:
+            if context.master_plot is not None:
+                with plot_lock:
+                    plot.close(context.master_plot)
+
+    buffer.seek(0)
+    image = mimage.imread(buffer, format='png')
+
+    return np.round(image * 255).astype(np.uint8)
+
+
+def regression_examples():
+    """
+     | regression_examples - the gallery plots made from synthetic data
+     | This is an internal routine and is not generally used by the user.
+     |
+     | The examples are numbered as in the gallery.  Those of the gallery
+     | that need a time axis of a cf field or a data file are left out.
+     |
+     :Returns:
+      list of (name, plot description) as used by render_many
+     |
+    """
+
+    data = regression_data()
+    lons = data['lons']
+    lats = data['lats']
+    pressure = data['pressure']
+    tas = data['tas']
+    tmap = {'f': tas, 'x': lons, 'y': lats, 'ptype': 1}
+    umap = {'f': data['u500'], 'x': lons, 'y': lats, 'ptype': 1}
+    uv = {'u': data['u500'], 'v': data['v500'], 'x': lons, 'y': lats, 'ptype': 1}
+    xsect = {'x': data['x'], 'y': data['z'], 'ptype': 0}
+    zonal = {'x': lats, 'y': pressure, 'ptype': 2}
     xticks = [-90, -75, -60, -45, -30, -15, 0, 15, 30, 45, 60, 75, 90]
     xticklabels = ['90S', '75S', '60S', '45S', '30S', '15S', '0', '15N',
                    '30N', '45N', '60N', '75N', '90N']
-    xpts = [-30, 30, 30, -30, -30]
-    ypts = [-8, -8, 5, 5, -8]
-
-    gset(xmin=-90, xmax=90, ymin=-10, ymax=50)
-    gopen()
-    lineplot(g.subspace(pressure=100), marker='o', color='blue',
-             title='Zonal mean zonal wind', label='100mb')
-    lineplot(g.subspace(pressure=200), marker='D', color='red',
-             label='200mb', xticks=xticks, xticklabels=xticklabels,
-             legend_location='upper right')
-    plotvars.plot.plot(xpts, ypts, linewidth=3.0, color='green')
-    plotvars.plot.text(35, -2, 'Region of interest',
-                       horizontalalignment='left')
-    gclose()
-    compare_images(28)
-
-    # example29
-    reset()
-    setvars(file='fig29.png')
-    f = cf.read('/opt/graphics/cfplot_data/tas_A1.nc')[0]
-    temp = f.subspace(time=cf.wi(cf.dt('1900-01-01'), cf.dt('1980-01-01')))
-    temp_annual = temp.collapse('T: mean', group=cf.Y())
-    temp_annual_global = temp_annual.collapse('area: mean', weights='area')
-    temp_annual_global.Units -= 273.15
-    lineplot(
-        temp_annual_global,
-        title='Global average annual temperature',
-        color='blue')
-    compare_images(29)
-
-
-def compare_images(example=None):
-    """
-    | Compare images and return an error string if they don't match
-    |
-    |
-    |
-    |
-    |
-    |
-    |
-    """
-    import hashlib
-    disp = which('display')
-    conv = which('convert')
-    comp = which('compare')
-    file = 'fig' + str(example) + '.png'
-    file_new = '/home/andy/cfplot.src/cfplot/' + file
-    file_ref = '/home/andy/regression/' + file
-
-    # Check md5 checksums are the same and display files if not
-    if hashlib.md5(open(file_new, 'rb').read()).hexdigest() != hashlib.md5(
-            open(file_ref, 'rb').read()).hexdigest():
-        print('***Failed example ' + str(example) + '**')
-        error_image = '/home/andy/cfplot.src/cfplot/' + 'error_' + file
-        diff_image = '/home/andy/cfplot.src/cfplot/' + 'difference_' + file
-        p = subprocess.Popen([comp, file_new, file_ref, diff_image])
-        (output, err) = p.communicate()
-        p.wait()
-        p = subprocess.Popen([conv, "+append", file_new,
-                             file_ref, error_image])
-        (output, err) = p.communicate()
-        p.wait()
-        subprocess.Popen([disp, diff_image])
+    xvec = data['xvec']
+    yvec = data['yvec']
+
+    return [
+        ('example1', {'calls': [('con', tmap)]}),
+        ('example2', {'calls': [('con', dict(tmap, blockfill=True, lines=False))]}),
+        ('example3', {'calls': [('mapset', {'lonmin': -15, 'lonmax': 3,
+                                            'latmin': 48, 'latmax': 60}),
+                                ('levs', {'min': 265, 'max': 285, 'step': 1}),
+                                ('con', tmap)]}),
+        ('example4', {'calls': [('mapset', {'proj': 'npstere'}),
+                                ('con', umap)]}),
+        ('example5', {'calls': [('mapset', {'proj': 'spstere', 'boundinglat': -30,
+                                            'lon_0': 180}),
+                                ('con', umap)]}),
+        ('example6', {'calls': [('con', dict(zonal, f=data['v_zonal']))]}),
+        ('example7', {'calls': [('con', dict(zonal, f=data['u_zonal']))]}),
+        ('example8', {'calls': [('con', dict(zonal, f=data['u_zonal'], ylog=1))]}),
+        ('example9', {'calls': [('con', {'f': data['t_section'], 'x': lons,
+                                         'y': pressure, 'ptype': 3})]}),
+        ('example13', {'calls': [('vect', dict(uv, key_length=10, scale=100,
+                                               stride=5))]}),
+        ('example14', {'calls': [('mapset', {'lonmin': 10, 'lonmax': 120,
+                                             'latmin': -30, 'latmax': 30}),
+                                 ('levs', {'min': 254, 'max': 270, 'step': 1}),
+                                 ('con', {'f': data['t500'], 'x': lons, 'y': lats,
+                                          'ptype': 1}),
+                                 ('vect', dict(uv, key_length=10, scale=50,
+                                               stride=2))]}),
+        ('example15', {'calls': [('mapset', {'proj': 'npstere'}),
+                                 ('vect', dict(uv, key_length=10, scale=100, pts=40,
+                                               title='Polar plot with regular '
+                                                     'point distribution'))]}),
+        ('example17', {'calls': [('cscale', {'scale': 'magma'}),
+                                 ('con', tmap),
+                                 ('stipple', {'f': tas, 'x': lons, 'y': lats,
+                                              'min': 220, 'max': 260, 'size': 100,
+                                              'color': '#00ff00'}),
+                                 ('stipple', {'f': tas, 'x': lons, 'y': lats,
+                                              'min': 300, 'max': 330, 'size': 50,
+                                              'color': '#0000ff', 'marker': 's'})]}),
+        ('example18', {'calls': [('cscale', {'scale': 'magma'}),
+                                 ('mapset', {'proj': 'npstere'}),
+                                 ('con', tmap),
+                                 ('stipple', {'f': tas, 'x': lons, 'y': lats,
+                                              'min': 265, 'max': 295, 'size': 100,
+                                              'color': '#00ff00'})]}),
+        ('example19', {'gopen': {'rows': 2, 'columns': 2, 'bottom': 0.2},
+                       'calls': [('gpos', {'pos': 1}),
+                                 ('con', dict(umap, colorbar=None)),
+                                 ('gpos', {'pos': 2}),
+                                 ('mapset', {'proj': 'moll'}),
+                                 ('con', dict(umap, colorbar=None)),
+                                 ('gpos', {'pos': 3}),
+                                 ('mapset', {'proj': 'npstere', 'boundinglat': 30,
+                                             'lon_0': 180}),
+                                 ('con', dict(umap, colorbar=None)),
+                                 ('gpos', {'pos': 4}),
+                                 ('mapset', {'proj': 'spstere', 'boundinglat': -30,
+                                             'lon_0': 180}),
+                                 ('con', dict(umap, colorbar_position=[0.1, 0.1, 0.8, 0.02],
+                                              colorbar_orientation='horizontal'))]}),
+        ('example20', {'calls': [('con', dict(xsect, f=data['xz']))]}),
+        ('example21', {'calls': [('con', dict(xsect, f=data['xz'], title='test data',
+                                              xticks=np.arange(5) * 100000 + 100000,
+                                              yticks=np.arange(7) * 2000 + 2000,
+                                              xlabel='x-axis', ylabel='z-axis'))]}),
+        ('example23', {'calls': [('cscale', {'scale': 'plasma'}),
+                                 ('gset', {'xmin': 0, 'xmax': np.size(xvec) - 1,
+                                           'ymin': 0, 'ymax': np.size(yvec) - 1}),
+                                 ('levs', {'min': 980, 'max': 1035, 'step': 2.5}),
+                                 ('con', {'f': data['rgp'],
+                                          'x': np.arange(np.size(xvec)),
+                                          'y': np.arange(np.size(yvec))}),
+                                 ('rgaxes', {'xpole': 160, 'ypole': 30,
+                                             'xvec': xvec, 'yvec': yvec})]}),
+        ('example24', {'calls': [('cscale', {'scale': 'parula'}),
+                                 ('con', {'f': data['scattered'],
+                                          'x': data['scattered_lons'],
+                                          'y': data['scattered_lats'],
+                                          'ptype': 1, 'irregular': True})]}),
+        ('example27', {'calls': [('lineplot', {'x': lats, 'y': data['u_zonal'][9],
+                                               'marker': 'o', 'color': 'blue',
+                                               'title': 'Zonal mean zonal wind at 100mb'})]}),
+        ('example28', {'calls': [('gset', {'xmin': -90, 'xmax': 90,
+                                           'ymin': -10, 'ymax': 50}),
+                                 ('lineplot', {'x': lats, 'y': data['u_zonal'][9],
+                                               'marker': 'o', 'color': 'blue',
+                                               'title': 'Zonal mean zonal wind',
+                                               'label': '100mb'}),
+                                 ('lineplot', {'x': lats, 'y': data['u_zonal'][7],
+                                               'marker': 'D', 'color': 'red',
+                                               'label': '200mb', 'xticks': xticks,
+                                               'xticklabels': xticklabels,
+                                               'legend_location': 'upper right'})]}),
+    ]
+
+
+def regression_data():
+    """
+     | regression_data - synthetic fields for the regression examples
+     | This is an internal routine and is not generally used by the user.
+     |
+     :Returns:
+      dictionary of numpy arrays
+     |
+    """
 
-    else:
-        print('Passed example ' + str(example))
+    lons = np.arange(0, 360, 3.75)
+    lats = np.arange(-88.75, 90, 2.5)
+    pressure = np.array([1000, 925, 850, 700, 600, 500, 400, 300, 250, 200,
+                         150, 100, 70, 50, 30, 20, 10.0])
+    rlon, rlat = np.meshgrid(np.radians(lons), np.radians(lats))
+
+    # Height as a fraction of the way from 1000mb to 10mb
+    height = np.log(1000.0 / pressure) / np.log(100.0)
+    zlat, zheight = np.meshgrid(lats, height)
+
+    # Jets in each hemisphere and an easterly band at the equator
+    u_zonal = (35 * np.exp(-((zlat - 35) / 12) ** 2 - ((zheight - 0.45) / 0.2) ** 2)
+               + 25 * np.exp(-((zlat + 45) / 12) ** 2 - ((zheight - 0.45) / 0.25) ** 2)
+               - 8 * np.exp(-(zlat / 15) ** 2) * zheight)
+    v_zonal = 3 * np.sin(np.radians(zlat) * 3) * np.sin(np.pi * zheight)
+
+    u500 = u_zonal[5][:, np.newaxis] + 8 * np.sin(4 * rlon) * np.cos(rlat)
+    v500 = 8 * np.cos(4 * rlon) * np.sin(2 * rlat)
+    tas = (250 + 50 * np.cos(rlat) ** 2 + 5 * np.sin(3 * rlon) * np.cos(rlat)
+           + 3 * np.cos(2 * rlon) * np.sin(2 * rlat))
+    t500 = 235 + 32 * np.cos(rlat) ** 2 + 3 * np.sin(2 * rlon) * np.cos(rlat)
+
+    slon, sheight = np.meshgrid(np.radians(lons), height)
+    t_section = 290 - 70 * sheight + 4 * np.sin(3 * slon) * np.sin(np.pi * sheight)
+
+    # Vertical section of an adjusting front
+    x = np.linspace(0, 600000, 61)
+    z = np.linspace(0, 15000, 31)
+    xx, zz = np.meshgrid(x, z)
+    xz = np.tanh((xx - 300000) / 50000) * np.exp(-zz / 8000)
+
+    # Pressure on a rotated grid
+    xvec = np.arange(-25, 25.1, 0.5)
+    yvec = np.arange(-20, 20.1, 0.5)
+    rx, ry = np.meshgrid(np.radians(xvec), np.radians(yvec))
+    rgp = 1008 + 20 * np.sin(3 * rx + 1) * np.cos(2 * ry) - 10 * np.cos(5 * ry)
+
+    # Points spread evenly over the globe with a golden angle spiral
+    npts = 3000
+    index = np.arange(npts) + 0.5
+    scattered_lats = np.degrees(np.arcsin(1 - 2 * index / npts))
+    scattered_lons = np.mod(index * 137.50776405, 360.0)
+    slat = np.radians(scattered_lats)
+    slon = np.radians(scattered_lons)
+    scattered = (250 + 50 * np.cos(slat) ** 2 + 5 * np.sin(3 * slon) * np.cos(slat)
+                 + 3 * np.cos(2 * slon) * np.sin(2 * slat))
+
+    return {'lons': lons, 'lats': lats, 'pressure': pressure,
+            'u_zonal': u_zonal, 'v_zonal': v_zonal, 'u500': u500, 'v500': v500,
+            'tas': tas, 't500': t500, 't_section': t_section,
+            'x': x, 'z': z, 'xz': xz, 'xvec': xvec, 'yvec': yvec, 'rgp': rgp,
+            'scattered': scattered, 'scattered_lons': scattered_lons,
+            'scattered_lats': scattered_lats}
+
+
+def compare_images(image=None, reference=None, tolerance=8):
+    """
+     | compare_images compares an image with a reference image.  Small
+     | differences such as those from anti-aliasing are allowed for by
+     | the tolerance and by the structural similarity, which measures how
+     | alike the images look rather than how alike their bytes are.
+     |
+     | image=None - image as an array of RGB or RGBA values 0-255
+     | reference=None - reference image in the same form
+     | tolerance=8 - largest difference in a colour channel for a pixel
+     |               to count as unchanged
+     |
+     :Returns:
+      dictionary of
+          'rms' - root mean square difference of the colour channels or
+                  None if the images are different sizes
+          'changed' - fraction of pixels changed
+          'ssim' - mean structural similarity of the image brightness
+     |
+    """
+
+    if np.shape(image)[:2] != np.shape(reference)[:2]:
+        return {'rms': None, 'changed': 1.0, 'ssim': 0.0}
+
+    image = np.asarray(image, dtype=float)[..., :3]
+    reference = np.asarray(reference, dtype=float)[..., :3]
+
+    diff = np.abs(image - reference)
+    rms = np.sqrt(np.mean(diff ** 2))
+    changed = np.mean(diff.max(axis=-1) > tolerance)
+
+    # Structural similarity of the brightness over 7x7 pixel windows
+    weights = np.array([0.299, 0.587, 0.114])
+    ssim = image_ssim(image @ weights, reference @ weights)
+
+    return {'rms': float(rms), 'changed': float(changed), 'ssim': float(ssim)}
+
+
+def image_ssim(a=None, b=None, window=7):
+    """
+     | image_ssim - mean structural similarity of two greyscale images
+     | This is an internal routine and is not generally used by the user.
+     |
+     | a=None - image as a 2D array of values 0-255
+     | b=None - image of the same shape
+     | window=7 - width of the square windows in pixels
+     |
+     :Returns:
+      mean structural similarity between -1 and 1
+     |
+    """
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+
+    def window_mean(values):
+        # Means over all the windows from a summed area table
+        total = np.pad(values, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+        return (total[window:, window:] - total[:-window, window:] -
+                total[window:, :-window] + total[:-window, :-window]) / window ** 2
+
+    mean_a = window_mean(a)
+    mean_b = window_mean(b)
+    var_a = window_mean(a * a) - mean_a ** 2
+    var_b = window_mean(b * b) - mean_b ** 2
+    covar = window_mean(a * b) - mean_a * mean_b
+
+    ssim = ((2 * mean_a * mean_b + c1) * (2 * covar + c2) /
+            ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2)))
+
+    return np.mean(ssim)
 
 
 def compare_arrays(ref=None, levs_test=None, gvals_test=None,
                    mapaxis_test=None, min=None, max=None, step=None,
-                   mult=None, type=None):
+                   mult=None, type=None, traj_test=None, lons=None,
+                   lats=None, window=None):
     """
     | Compare arrays and return an error string if they don't match
     |
@@ -7790,7 +9289,34 @@ def compare_arrays(ref=None, levs_test=None, gvals_test=None,
             pass_str += str(max) + ', type=' + str(type) + ')'
             print(pass_str)
 
+    anom = 0
+    if traj_test:
+        lons = np.array(lons, dtype=float)
+        lats = np.array(lats, dtype=float)
+        window = np.array(window, dtype=bool)
+        xpts, ypts, vals = traj_segments(lons, lats, np.ones(np.shape(lons)),
+                                         np.ones(np.shape(lons), dtype=bool), window)
+        segments = np.column_stack([xpts[:, 0], ypts[:, 0], xpts[:, 1], ypts[:, 1]])
+        if np.shape(segments) != np.shape(np.reshape(ref, (-1, 4))):
+            anom = 1
+        elif not np.allclose(segments, np.reshape(ref, (-1, 4))):
+            anom = 1
 
+        if anom == 1:
+            print('***traj_segments failure***')
+            print('lons, lats, window are', lons, lats, window)
+            print('generated segments are:')
+            print(segments)
+            print('expected segments:')
+            print(ref)
+        else:
+            pass_str = 'Passed cfp.traj_segments(lons=' + str(lons.tolist())
+            pass_str += ', lats=' + str(lats.tolist()) + ', window='
+            pass_str += str(window.tolist()) + ')'
+            print(pass_str)
+
+
+@plot_locked
 def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b',
          marker='o', markevery=1, markersize=5.0, markerfacecolor='r',
          markeredgecolor='g', markeredgewidth=1.0, latmax=None, latmin=None,
@@ -7805,7 +9331,7 @@ def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b
          colorbar_anchor=None, colorbar_shrink=None,
          colorbar_labels=None,
          vector=False, head_width=0.4, head_length=1.0,
-         fc='k', ec='k', zorder=None):
+         fc='k', ec='k', zorder=None, chunk_size=None):
     """
     | traj is the interface to trajectory plotting in cf-plot.
     | The minimum use is traj(f) where f is a CF field.
@@ -7863,53 +9389,48 @@ def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b
     | head_length=2.0 - vector head length
     | fc='k' - vector face colour
     | ec='k' - vector edge colour
+    | chunk_size=None - number of trajectories to read and plot at a time.
+    |                   Use with large fields to limit the memory used.  'auto'
+    |                   follows the chunks of the field's data.  The default is
+    |                   to read all the trajectories at once.
 
 
     """
+    from matplotlib.collections import LineCollection, PolyCollection
+
     if verbose:
         print('traj - making a trajectory plot')
 
-    if isinstance(f, cf.FieldList):
+    if cf_isinstance(f, 'FieldList'):
         errstr = "\n\ncfp.traj - cannot make a trajectory plot from a field list "
         errstr += "- need to pass a field\n\n"
         raise TypeError(errstr)
 
     # Read in data
     # Find the auxiliary lons and lats if provided
-    has_lons = False
-    has_lats = False
+    lon_key = None
+    lat_key = None
     for mydim in list(f.auxiliary_coordinates()):
         name = cf_var_name(field=f, dim=mydim)
         if name in ['longitude']:
-            lons = np.squeeze(f.construct(mydim).array)
-            has_lons = True
+            lon_key = mydim
         if name in ['latitude']:
-            lats = np.squeeze(f.construct(mydim).array)
-            has_lats = True
-
-    data = f.array
+            lat_key = mydim
 
     # Raise an error if lons and lats not found in the input data
-    if not has_lons or not has_lats:
+    if lon_key is None or lat_key is None:
         message = '\n\n\ntraj error\n'
-        if not has_lons:
+        if lon_key is None:
             message += 'missing longitudes in the field auxiliary data\n'
-        if not has_lats:
+        if lat_key is None:
             message += 'missing latitudes in the field auxiliary data\n'
         message += '\n\n\n'
         raise TypeError(message)
 
-    if latmax is not None:
-        pts = np.where(lats >= latmax)
-        if np.size(pts) > 0:
-            lons[pts] = np.nan
-            lats[pts] = np.nan
-
-    if latmin is not None:
-        pts = np.where(lats <= latmin)
-        if np.size(pts) > 0:
-            lons[pts] = np.nan
-            lats[pts] = np.nan
+    # The trajectories are read and plotted a chunk at a time
+    chunks = traj_chunks(f=f, lon_key=lon_key, chunk_size=chunk_size)
+    if verbose and len(chunks) > 1:
+        print('traj - reading the trajectories in', len(chunks), 'chunks')
 
     # Set potential user axis labels
     user_xlabel = xlabel
@@ -7957,16 +9478,6 @@ def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b
     gset(xmin=plotvars.lonmin, xmax=plotvars.lonmax,
          ymin=plotvars.latmin, ymax=plotvars.latmax, user_gset=0)
 
-    # Make lons and lats 2d if they are 1d
-    ndim = np.ndim(lons)
-    if ndim == 1:
-        lons = lons.reshape(1, -1)
-        lats = lats.reshape(1, -1)
-
-    ntracks = np.shape(lons)[0]
-    if ndim == 1:
-        ntracks = 1
-
     if legend or legend_lines:
         # Check levels are not None
         levs = plotvars.levels
@@ -7979,8 +9490,13 @@ def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b
             # Automatic levels
             if verbose:
                 print('traj - generating automatic legend levels')
-            dmin = np.nanmin(data)
-            dmax = np.nanmax(data)
+            dmin = np.nan
+            dmax = np.nan
+            for tracks in chunks:
+                data = traj_read(f=f, lon_key=lon_key, lat_key=lat_key, tracks=tracks,
+                                 coords=False)
+                dmin = np.nanmin([dmin, np.nanmin(data)])
+                dmax = np.nanmax([dmax, np.nanmax(data)])
             levs, mult = gvals(dmin=dmin, dmax=dmax, mod=False)
 
         # Add extend options to the levels if set
@@ -8002,123 +9518,159 @@ def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b
     ##################################
     # Line, symbol and vector plotting
     ##################################
-    for track in np.arange(ntracks):
-        xpts = lons[track, :]
-        ypts = lats[track, :]
-        data2 = data[track, :]
-
-        xpts_orig = deepcopy(xpts)
-        xpts = np.mod(xpts + 180, 360) - 180
-
-        # Check if xpts are only within the remapped longitudes above
-        if np.min(xpts) < -170 or np.max(xpts) > 170:
-            xpts = xpts_orig
-
-            for ix in np.arange(np.size(xpts)-1):
-                diff = xpts[ix+1] - xpts[ix]
-                if diff >= 60:
-                    xpts[ix+1] = xpts[ix+1] - 360.0
-                if diff <= -60:
-                    xpts[ix+1] = xpts[ix+1] + 360.0
-
-        # Plot lines and markers
-        plot_linewidth = linewidth
-        plot_markersize = markersize
-        if legend:
-            plot_markersize = 0.0
-
-        if plot_linewidth > 0.0 or plot_markersize > 0.0:
-            if verbose and track == 0 and linewidth > 0.0:
-                print('plotting lines')
-            if verbose and track == 0 and markersize > 0.0:
-                print('plotting markers')
-
-            if legend_lines is False:
-                mymap.plot(xpts, ypts, color=linecolor,
-                           linewidth=plot_linewidth, linestyle=linestyle,
-                           marker=marker, markevery=markevery, markersize=plot_markersize,
-                           markerfacecolor=markerfacecolor, markeredgecolor=markeredgecolor,
-                           markeredgewidth=markeredgewidth,
-                           zorder=zorder, clip_on=True, transform=ccrs.PlateCarree())
-            else:
-                line_xpts = xpts.compressed()
-                line_ypts = ypts.compressed()
-                line_data = data2.compressed()
-
-                for i in np.arange(np.size(line_xpts)-1):
-                    val = (line_data[i] + line_data[i+1])/2.0
-
-                    col = plotvars.cs[np.max(np.where(val > plotvars.levels))]
-                    mymap.plot(line_xpts[i:i+2], line_ypts[i:i+2], color=col,
-                               linewidth=plot_linewidth, linestyle=linestyle,
-                               zorder=zorder, clip_on=True, transform=ccrs.PlateCarree())
-
-        # Plot vectors
-        if vector:
-            if verbose and track == 0:
-                print('plotting vectors')
-            if zorder is None:
-                plot_zorder = 101
-            else:
-                plot_zorder = zorder
-            if plotvars.proj == 'cyl':
-                if isinstance(xpts, np.ma.MaskedArray):
-                    pts = np.ma.MaskedArray.count(xpts)
-                else:
-                    pts = xpts.size
-
-                for pt in np.arange(pts-1):
-                    mymap.arrow(xpts[pt], ypts[pt],
-                                xpts[pt+1] - xpts[pt],
-                                ypts[pt+1] - ypts[pt],
-                                head_width=head_width,
-                                head_length=head_length,
-                                fc=fc, ec=ec,
-                                length_includes_head=True,
-                                zorder=plot_zorder, clip_on=True,
-                                transform=ccrs.PlateCarree())
-
-    # Plot different colour markers based on a user set of levels
+    # The lines, markers and vectors of all the tracks are each drawn as a
+    # single artist in map coordinates rather than one or more artists per track.
+    # Each chunk of tracks adds its parts of these which are drawn at the end.
+    plot_linewidth = linewidth
+    plot_markersize = markersize
     if legend:
+        plot_markersize = 0.0
+    plot_markers = plot_markersize > 0.0 and legend_lines is False
+
+    line_zorder = zorder
+    if zorder is None:
+        line_zorder = matplotlib.lines.Line2D.zorder
+    plot_zorder = zorder
+    if zorder is None:
+        plot_zorder = 101
+
+    if verbose and plot_linewidth > 0.0:
+        print('plotting lines')
+    if verbose and plot_markers:
+        print('plotting markers')
+    if verbose and vector:
+        print('plotting vectors')
+
+    markargs = {'color': linecolor, 'linestyle': 'none', 'marker': marker,
+                'markersize': plot_markersize, 'markerfacecolor': markerfacecolor,
+                'markeredgecolor': markeredgecolor, 'markeredgewidth': markeredgewidth,
+                'zorder': line_zorder, 'clip_on': True}
+    markevery_int = markevery is None or isinstance(markevery, (int, np.integer))
+
+    paths = []
+    path_colors = []
+    marker_points = []
+    arrows = []
+    legend_points = {}
+
+    for tracks in chunks:
+        lons, lats, data = traj_read(f=f, lon_key=lon_key, lat_key=lat_key, tracks=tracks)
+
+        # Missing points are NaN in both the longitudes and latitudes
+        xtracks = traj_unwrap(np.ma.filled(np.ma.array(lons, dtype=float), np.nan))
+        ytracks = np.ma.filled(np.ma.array(lats, dtype=float), np.nan)
+        del lons, lats
+        missing = np.isnan(xtracks) | np.isnan(ytracks)
+        if latmax is not None:
+            missing |= ytracks >= latmax
+        if latmin is not None:
+            missing |= ytracks <= latmin
+
+        # Points away from the map
+        window = traj_window(xtracks, ytracks)
+
+        # Lines coloured by the data are made before the points away from the
+        # map are left out so that no segment joins the points either side of
+        # a point that is left out
+        if plot_linewidth > 0.0 and legend_lines is not False:
+            valid = ~missing & ~np.ma.getmaskarray(data)
+            segment_xpts, segment_ypts, vals = traj_segments(xtracks, ytracks, data,
+                                                             valid, window)
+
+            # The colour is that of the highest level below the value
+            line_levels = plotvars.levels
+            if line_levels is None:
+                line_levels = levs
+            pts = np.isfinite(vals)
+            colour_index = np.searchsorted(line_levels, vals[pts], side='left') - 1
+            path_colors.append(np.maximum(colour_index, 0))
+            paths += traj_paths(segment_xpts[pts], segment_ypts[pts])
+
+        # Leave out the points that are away from the map
+        missing |= ~window
+        xtracks[missing] = np.nan
+        ytracks[missing] = np.nan
+        keep = ~np.all(missing, axis=1)
+        if not np.all(keep):
+            xtracks, ytracks, missing = xtracks[keep], ytracks[keep], missing[keep]
+            data = data[keep]
+
+        # Lines
+        if plot_linewidth > 0.0 and legend_lines is False:
+            paths += traj_paths(xtracks, ytracks)
+
+        # Markers
+        if plot_markers:
+            if markevery_int:
+                # Markers at every markevery point from the start of each track
+                every = slice(None, None, markevery)
+                points = mymap.projection.transform_points(ccrs.PlateCarree(),
+                                                           xtracks[:, every][~missing[:, every]],
+                                                           ytracks[:, every][~missing[:, every]])
+                marker_points.append(points[:, :2])
+            else:
+                # Other markevery options depend on the points of each track
+                for track in np.arange(np.shape(xtracks)[0]):
+                    mymap.plot(xtracks[track, :], ytracks[track, :], markevery=markevery,
+                               transform=ccrs.PlateCarree(), **markargs)
 
-        # For polar stereographic plots mask any points outside the plotting limb
-        if plotvars.proj == 'npstere':
-            pts = np.where(lats < plotvars.boundinglat)
-            if np.size(pts) > 0:
-                lats[pts] = np.nan
-
-        if plotvars.proj == 'spstere':
-            pts = np.where(lats > plotvars.boundinglat)
-            if np.size(pts) > 0:
-                lats[pts] = np.nan
-
-        for track in np.arange(ntracks):
-            xpts = lons[track, :]
-            ypts = lats[track, :]
-            data2 = data[track, :]
-
-
-
-            for i in np.arange(np.size(levs)-1):
-                color = plotvars.cs[i]
-
-                if np.ma.is_masked(data2):
-                    pts = np.ma.where(np.logical_and(data2 >= levs[i], data2 <= levs[i+1]))
-                else:
-                    pts = np.where(np.logical_and(data2 >= levs[i], data2 <= levs[i+1]))
+        # Vectors
+        if vector and plotvars.proj == 'cyl':
+            arrows.append(traj_arrows(xtracks, ytracks, head_width, head_length))
 
-                if zorder is None:
-                    plot_zorder = 101
-                else:
-                    plot_zorder = zorder
-                if np.size(pts) > 0:
+        # Different colour markers based on a user set of levels
+        if legend:
 
-                    mymap.scatter(xpts[pts], ypts[pts],
-                                  s=markersize*15,
-                                  c=color,
-                                  marker=marker,
-                                  edgecolors=markeredgecolor,
-                                  transform=ccrs.PlateCarree(), zorder=plot_zorder)
+            # For polar stereographic plots leave out any points outside the plotting limb
+            shown = ~missing & ~np.ma.getmaskarray(data)
+            if plotvars.proj == 'npstere':
+                shown &= ~(ytracks < plotvars.boundinglat)
+            if plotvars.proj == 'spstere':
+                shown &= ~(ytracks > plotvars.boundinglat)
+
+            # The marker colour is that of the level range the data is in.  Points on
+            # a level are in the range above it apart from those on the highest level
+            data_values = np.ma.filled(np.ma.array(data, dtype=float), np.nan)
+            colour_index = np.digitize(data_values, levs) - 1
+            colour_index[data_values == levs[-1]] = np.size(levs) - 2
+            shown &= (colour_index >= 0) & (colour_index <= np.size(levs) - 2)
+
+            for i in np.unique(colour_index[shown]):
+                pts = np.where(shown & (colour_index == i))
+                legend_points.setdefault(i, []).append(np.column_stack([xtracks[pts],
+                                                                        ytracks[pts]]))
+
+    # Draw the lines, markers and vectors of all the chunks
+    if plot_linewidth > 0.0 and len(paths) > 0:
+        colors = linecolor
+        if legend_lines:
+            colors = matplotlib.colors.to_rgba_array(plotvars.cs)[np.concatenate(path_colors)]
+        lines = LineCollection(paths, colors=colors, linewidths=plot_linewidth,
+                               linestyles=linestyle, capstyle='projecting',
+                               joinstyle='round', zorder=line_zorder,
+                               transform=mymap.transData)
+        mymap.add_collection(lines, autolim=False)
+
+    if plot_markers and markevery_int and len(marker_points) > 0:
+        points = np.concatenate(marker_points)
+        mymap.plot(points[:, 0], points[:, 1], transform=mymap.transData, **markargs)
+
+    if len(arrows) > 0:
+        arrows = PolyCollection(np.concatenate(arrows), facecolors=fc, edgecolors=ec,
+                                joinstyle='miter', zorder=plot_zorder,
+                                transform=mymap.transData)
+        mymap.add_collection(arrows, autolim=False)
+
+    # One scatter for each level range so matplotlib can draw all the
+    # markers of a colour from a single rendered marker
+    for i in sorted(legend_points):
+        points = np.concatenate(legend_points[i])
+        mymap.scatter(points[:, 0], points[:, 1],
+                      s=markersize*15,
+                      c=plotvars.cs[i],
+                      marker=marker,
+                      edgecolors=markeredgecolor,
+                      transform=ccrs.PlateCarree(), zorder=plot_zorder)
 
     # Axes
     plot_map_axes(axes=axes, xaxis=xaxis, yaxis=yaxis,
@@ -8132,18 +9684,18 @@ def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b
                                            scale=plotvars.resolution,
                                            facecolor='none')
 
-    mymap.add_feature(feature, edgecolor=continent_color,
+    mymap.add_feature(map_feature(feature), edgecolor=continent_color,
                       linewidth=continent_thickness,
                       linestyle=continent_linestyle)
 
     if ocean_color is not None:
-        mymap.add_feature(cfeature.OCEAN, edgecolor='face', facecolor=ocean_color,
+        mymap.add_feature(map_feature(cfeature.OCEAN), edgecolor='face', facecolor=ocean_color,
                           zorder=plotvars.feature_zorder)
     if land_color is not None:
-        mymap.add_feature(cfeature.LAND, edgecolor='face', facecolor=land_color,
+        mymap.add_feature(map_feature(cfeature.LAND), edgecolor='face', facecolor=land_color,
                           zorder=plotvars.feature_zorder)
     if lake_color is not None:
-        mymap.add_feature(cfeature.LAKES, edgecolor='face', facecolor=lake_color,
+        mymap.add_feature(map_feature(cfeature.LAKES), edgecolor='face', facecolor=lake_color,
                           zorder=plotvars.feature_zorder)
 
     # Title
@@ -8203,6 +9755,313 @@ def traj(f=None, title=None, ptype=0, linestyle='-', linewidth=1.0, linecolor='b
         gclose()
 
 
+def traj_chunks(f=None, lon_key=None, chunk_size=None):
+    """
+    | traj_chunks - the trajectories of a field to read at a time
+    |
+    | f=None - trajectory field with the trajectories along its first dimension
+    | lon_key=None - key of the field's auxiliary longitude coordinate
+    | chunk_size=None - number of trajectories in each chunk.  If 'auto' this
+    |                   follows the chunks of the field's data, or has about
+    |                   a million points if the data isn't chunked.
+    |                   None is all the trajectories in one chunk.
+    |
+    | This is an internal routine and is not generally used by the user.
+    |
+    :Returns:
+     list of slices of the trajectory dimension, or [None] for all the
+     trajectories at once
+    |
+    """
+    shape = f.construct(lon_key).shape
+    if chunk_size is None or len(shape) != 2:
+        return [None]
+
+    ntracks, npts = shape
+    if chunk_size == 'auto':
+        data_chunks = getattr(getattr(f, 'data', None), 'chunks', None)
+        if data_chunks:
+            sizes = data_chunks[0]
+        else:
+            sizes = [max(1, 1000000 // max(npts, 1))]
+    else:
+        sizes = [max(1, int(chunk_size))]
+
+    chunks = []
+    start = 0
+    while start < ntracks:
+        stop = min(start + int(sizes[len(chunks) % len(sizes)]), ntracks)
+        chunks.append(slice(start, stop))
+        start = stop
+
+    return chunks
+
+
+def traj_read(f=None, lon_key=None, lat_key=None, tracks=None, coords=True):
+    """
+    | traj_read - read the longitudes, latitudes and data of some trajectories
+    |
+    | f=None - trajectory field with the trajectories along its first dimension
+    | lon_key=None - key of the field's auxiliary longitude coordinate
+    | lat_key=None - key of the field's auxiliary latitude coordinate
+    | tracks=None - slice of the trajectories to read.  None is all of them
+    | coords=True - read the longitudes and latitudes as well as the data
+    |
+    | This is an internal routine and is not generally used by the user.
+    |
+    :Returns:
+     lons, lats, data - arrays with one trajectory per row, or just the
+     data if coords is False
+    |
+    """
+    if tracks is None:
+        data = f.array
+        if not coords:
+            return data
+        lons = np.squeeze(f.construct(lon_key).array)
+        lats = np.squeeze(f.construct(lat_key).array)
+    else:
+        data = f[tracks].array
+        if not coords:
+            return data
+        lons = f.construct(lon_key)[tracks].array
+        lats = f.construct(lat_key)[tracks].array
+
+    # Make lons and lats 2d if they are 1d
+    lons = lons.reshape(-1, np.shape(lons)[-1])
+    lats = lats.reshape(np.shape(lons))
+    data = data.reshape(np.shape(lons))
+
+    return lons, lats, data
+
+
+def traj_window(lons=None, lats=None):
+    """
+    | traj_window - points of the tracks to plot.  These are the points on or
+    | near the map and the ends of the lines between neighbouring points that
+    | may cross the map, so lines go to the edge of the map.
+    |
+    | lons=None - longitudes with one track per row and NaN for missing points
+    | lats=None - latitudes with one track per row and NaN for missing points
+    |
+    | This is an internal routine and is not generally used by the user.
+    |
+    :Returns:
+     array of True for the points to plot
+    |
+    """
+    xmin, xmax, ymin, ymax = plotvars.mymap.get_extent()
+
+    # Include a margin for the width of lines, markers and vectors
+    xmargin = (xmax - xmin) * 0.05
+    ymargin = (ymax - ymin) * 0.05
+    xmin, xmax, ymin, ymax = xmin - xmargin, xmax + xmargin, ymin - ymargin, ymax + ymargin
+
+    valid = np.isfinite(lons) & np.isfinite(lats)
+    points = plotvars.mymap.projection.transform_points(ccrs.PlateCarree(), lons[valid],
+                                                        lats[valid])
+    xpts = np.full(np.shape(lons), np.nan)
+    ypts = np.full(np.shape(lats), np.nan)
+    xpts[valid] = points[:, 0]
+    ypts[valid] = points[:, 1]
+
+    # Points on the map and the ends of lines that may cross the map, which
+    # are those with a bounding box overlapping the map
+    with np.errstate(invalid='ignore'):
+        window = (xpts >= xmin) & (xpts <= xmax) & (ypts >= ymin) & (ypts <= ymax)
+        crossing = ((np.minimum(xpts[:, :-1], xpts[:, 1:]) <= xmax) &
+                    (np.maximum(xpts[:, :-1], xpts[:, 1:]) >= xmin) &
+                    (np.minimum(ypts[:, :-1], ypts[:, 1:]) <= ymax) &
+                    (np.maximum(ypts[:, :-1], ypts[:, 1:]) >= ymin))
+    window[:, 1:] |= crossing
+    window[:, :-1] |= crossing
+
+    return window
+
+
+def traj_segments(lons=None, lats=None, data=None, valid=None, window=None):
+    """
+    | traj_segments - line segments between each pair of points along the
+    | tracks for lines coloured by the data.  Points with missing data are
+    | passed over so a segment may join points that are not next to each
+    | other.  Segments with neither end in the window are left out, which is
+    | done after the segments are made so that a point left out never joins
+    | the points either side of it.
+    |
+    | lons=None - longitudes with one track per row
+    | lats=None - latitudes with one track per row
+    | data=None - data at the points
+    | valid=None - array of True for the points with a position and data
+    | window=None - array of True for the points to plot - see traj_window
+    |
+    | This is an internal routine and is not generally used by the user.
+    |
+    :Returns:
+     longitudes and latitudes of the two ends of each segment as arrays of
+     shape (number of segments, 2) and the mean of the data at the two ends
+    |
+    """
+    rows, cols = np.nonzero(valid)
+    in_window = window[rows, cols]
+    segment = (rows[1:] == rows[:-1]) & (in_window[1:] | in_window[:-1])
+    line_xpts = lons[rows, cols]
+    line_ypts = lats[rows, cols]
+    line_data = np.ma.filled(np.ma.array(data, dtype=float), np.nan)[rows, cols]
+    vals = ((line_data[:-1] + line_data[1:]) / 2.0)[segment]
+    segment_xpts = np.column_stack([line_xpts[:-1], line_xpts[1:]])[segment]
+    segment_ypts = np.column_stack([line_ypts[:-1], line_ypts[1:]])[segment]
+
+    return segment_xpts, segment_ypts, vals
+
+
+def traj_unwrap(lons=None):
+    """
+    | traj_unwrap - make the longitudes of each track continuous across the
+    | dateline.  The first point of each track is put in the range -180 to
+    | 180 and each later step of more than 180 degrees is taken as a step
+    | of less than 180 degrees the other way around the globe.  Steps are
+    | between valid points so missing points don't break the tracks.
+    |
+    | lons=None - longitudes with one track per row and NaN for missing points
+    |
+    | This is an internal routine and is not generally used by the user.
+    |
+    | :Returns:
+    |  longitudes with one track per row
+    |
+    """
+    lons = np.mod(lons + 180.0, 360.0) - 180.0
+    if np.size(lons) == 0:
+        return lons
+
+    # Carry the last valid longitude forward over missing points
+    valid = np.isfinite(lons)
+    last_valid = np.where(valid, np.arange(np.shape(lons)[1]), 0)
+    np.maximum.accumulate(last_valid, axis=1, out=last_valid)
+    carried = np.take_along_axis(lons, last_valid, axis=1)
+
+    steps = np.nan_to_num(np.diff(carried, axis=1))
+    lons[:, 1:] -= 360.0 * np.cumsum(np.round(steps / 360.0), axis=1)
+
+    return lons
+
+
+def traj_paths(lons=None, lats=None):
+    """
+    | traj_paths - convert tracks to lines in map coordinates for a LineCollection
+    | Missing points are NaN and break the lines.  On maps with an edge at
+    | the longitude opposite the map centre a track crossing that longitude is
+    | split into two lines that meet the edges of the map.
+    |
+    | lons=None - longitudes with one track per row.  These are continuous
+    |             along each track and may go beyond -180 to 180
+    | lats=None - latitudes with one track per row
+    |
+    | This is an internal routine and is not generally used by the user.
+    |
+    | :Returns:
+    |  list of arrays of map x and y points, one for each track
+    |
+    """
+    proj = plotvars.mymap.projection
+    ntracks, npts = np.shape(lons)
+    if ntracks == 0 or npts == 0:
+        return []
+
+    # Crossings of the map edge are where the copy of the map that the
+    # track is in changes
+    crossings = np.zeros((ntracks, max(npts - 1, 0)), dtype=bool)
+    if plotvars.proj in ['cyl', 'merc', 'moll', 'robin', 'lcc']:
+        centre = ccrs.PlateCarree().transform_point(0.0, 0.0, proj)[0]
+        with np.errstate(invalid='ignore'):
+            copies = np.diff(np.floor((lons - centre + 180.0) / 360.0), axis=1)
+            crossings = np.isfinite(copies) & (copies != 0)
+
+    # Each crossing adds a point at the map edge, a NaN and a point at the
+    # opposite edge after the point before the crossing
+    sizes = npts + 3 * np.sum(crossings, axis=1)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    shifts = np.zeros((ntracks, npts), dtype=int)
+    shifts[:, 1:] = 3 * np.cumsum(crossings, axis=1)
+    positions = starts[:, np.newaxis] + np.arange(npts) + shifts
+
+    # Only valid points are projected as NaN may not give NaN
+    points = np.full((np.sum(sizes), 2), np.nan)
+    valid = np.isfinite(lons) & np.isfinite(lats)
+    points[positions[valid]] = proj.transform_points(ccrs.PlateCarree(), lons[valid],
+                                                     lats[valid])[:, :2]
+
+    track, pt = np.nonzero(crossings)
+    if np.size(track) > 0:
+        lon_start = lons[track, pt]
+        lon_end = lons[track, pt + 1]
+        east = lon_end > lon_start
+        edge = centre + 180.0 + 360.0 * np.floor((np.minimum(lon_start, lon_end) - centre +
+                                                  180.0) / 360.0)
+        weight = (edge - lon_start) / (lon_end - lon_start)
+        lat_edge = lats[track, pt] + weight * (lats[track, pt + 1] - lats[track, pt])
+        side = np.where(east, 1.0, -1.0) * (180.0 - 1e-6)
+        for offset, lon_edge in [(1, centre + side), (3, centre - side)]:
+            points[positions[track, pt] + offset] = proj.transform_points(
+                ccrs.PlateCarree(), lon_edge, lat_edge)[:, :2]
+
+    points[~np.isfinite(points)] = np.nan
+
+    return np.split(points, starts[1:])
+
+
+def traj_arrows(lons=None, lats=None, head_width=0.4, head_length=1.0):
+    """
+    | traj_arrows - vertices of arrows from each point of the tracks to the next
+    | on a cylindrical map.  These are the same shape as the arrows drawn by
+    | matplotlib's arrow and an arrow that crosses the map edge is repeated at
+    | the opposite edge.
+    |
+    | lons=None - longitudes with one track per row and NaN for missing points
+    | lats=None - latitudes with one track per row and NaN for missing points
+    | head_width=0.4 - arrow head width
+    | head_length=1.0 - arrow head length
+    |
+    | This is an internal routine and is not generally used by the user.
+    |
+    | :Returns:
+    |  array of arrow vertices in map coordinates of shape (narrows, 7, 2)
+    |
+    """
+    centre = ccrs.PlateCarree().transform_point(0.0, 0.0, plotvars.mymap.projection)[0]
+
+    xstart = lons[:, :-1].ravel()
+    ystart = lats[:, :-1].ravel()
+    dx = (lons[:, 1:] - lons[:, :-1]).ravel()
+    dy = (lats[:, 1:] - lats[:, :-1]).ravel()
+    length = np.hypot(dx, dy)
+    pts = np.isfinite(length) & (length > 0)
+    xstart, ystart, dx, dy, length = xstart[pts], ystart[pts], dx[pts], dy[pts], length[pts]
+
+    # Arrow pointing along the x axis with the tip at the origin
+    width = 0.001
+    shape_x = np.array([0.0, -head_length, -head_length, 0.0, 0.0, -head_length, -head_length])
+    shape_y = np.array([0.0, -head_width, -width, -width, width, width, head_width]) / 2.0
+    arrow_x = np.tile(shape_x, (np.size(length), 1))
+    arrow_x[:, 3:5] = -length[:, np.newaxis]
+
+    # Rotate to the direction of the arrow and move to the end point
+    cos = (dx / length)[:, np.newaxis]
+    sin = (dy / length)[:, np.newaxis]
+    xverts = arrow_x * cos - shape_y * sin + (xstart + dx)[:, np.newaxis]
+    yverts = arrow_x * sin + shape_y * cos + (ystart + dy)[:, np.newaxis]
+
+    # Move the arrows to start on the map and repeat those that cross an edge
+    xverts = xverts - centre - 360.0 * np.floor((xstart - centre + 180.0) / 360.0)[:, np.newaxis]
+    verts = [np.stack([xverts, yverts], axis=-1)]
+    for offset in [-360.0, 360.0]:
+        pts = np.any(np.abs(xverts + offset) < 180.0, axis=1)
+        verts.append(np.stack([xverts[pts] + offset, yverts[pts]], axis=-1))
+
+    return np.concatenate(verts)
+
+
+@profiled
 def cbar(labels=None,
          orientation=None,
          position=None,
@@ -8761,6 +10620,7 @@ def dim_titles(title=None, title2=None, title3=None):
 
 
 
+@profiled
 def plot_map_axes(axes=None, xaxis=None, yaxis=None,
                   xticks=None, xticklabels=None,
                   yticks=None, yticklabels=None,
@@ -8826,20 +10686,20 @@ def plot_map_axes(axes=None, xaxis=None, yaxis=None,
                         axes_plot(yticks=yticks, yticklabels=yticklabels)
 
             if user_xlabel is not None:
-                plot.text(0.5, -0.10, user_xlabel, va='bottom',
-                          ha='center',
-                          rotation='horizontal', rotation_mode='anchor',
-                          transform=plotvars.mymap.transAxes,
-                          fontsize=axis_label_fontsize,
-                          fontweight=axis_label_fontweight)
+                plotvars.mymap.text(0.5, -0.10, user_xlabel, va='bottom',
+                                    ha='center',
+                                    rotation='horizontal', rotation_mode='anchor',
+                                    transform=plotvars.mymap.transAxes,
+                                    fontsize=axis_label_fontsize,
+                                    fontweight=axis_label_fontweight)
 
             if user_ylabel is not None:
-                plot.text(-0.05, 0.50, user_ylabel, va='bottom',
-                          ha='center',
-                          rotation='vertical', rotation_mode='anchor',
-                          transform=plotvars.mymap.transAxes,
-                          fontsize=axis_label_fontsize,
-                          fontweight=axis_label_fontweight)
+                plotvars.mymap.text(-0.05, 0.50, user_ylabel, va='bottom',
+                                    ha='center',
+                                    rotation='vertical', rotation_mode='anchor',
+                                    transform=plotvars.mymap.transAxes,
+                                    fontsize=axis_label_fontsize,
+                                    fontweight=axis_label_fontweight)
 
     # Polar stereographic
     if plotvars.proj == 'npstere' or plotvars.proj == 'spstere':
@@ -8867,10 +10727,10 @@ def plot_map_axes(axes=None, xaxis=None, yaxis=None,
                     if abs(lat - boundinglat) > 1:
                         lons = np.arange(361)
                         lats = np.zeros(361)+lat
-                        mymap.plot(lons, lats, color=plotvars.grid_colour,
+                        xpts, ypts = map_line(lons, lats, proj)
+                        mymap.plot(xpts, ypts, color=plotvars.grid_colour,
                                    linewidth=plotvars.grid_thickness,
-                                   linestyle=plotvars.grid_linestyle,
-                                   transform=proj)
+                                   linestyle=plotvars.grid_linestyle)
 
             if yaxis:
                 if xticks is None:
@@ -8886,10 +10746,10 @@ def plot_map_axes(axes=None, xaxis=None, yaxis=None,
                     else:
                         lats = np.arange(boundinglat+91)-90
                     lons = np.zeros(np.size(lats))+lon
-                    mymap.plot(lons, lats, color=plotvars.grid_colour,
+                    xpts, ypts = map_line(lons, lats, proj)
+                    mymap.plot(xpts, ypts, color=plotvars.grid_colour,
                                linewidth=plotvars.grid_thickness,
-                               linestyle=plotvars.grid_linestyle,
-                               transform=proj)
+                               linestyle=plotvars.grid_linestyle)
 
             # Add longitude labels
             if plotvars.proj == 'npstere':
@@ -9190,6 +11050,7 @@ def plot_map_axes(axes=None, xaxis=None, yaxis=None,
                                      xlocs=lons, ylocs=lats)
 
 
+@profiled
 def add_cyclic(field, lons):
     """
     | add_cyclic is a wrapper for cartopy_util.add_cyclic_point(field, lons)
@@ -9211,12 +11072,61 @@ def add_cyclic(field, lons):
     return field, lons
 
 
-def irregular_window(field, lons,lats):
+@profiled
+def irregular_window(field, lons, lats, mesh=None):
+    """
+    | irregular_window - put irregular data into the longitudes of the map
+    | and add interpolated points along the left and right edges of the map
+    | This is an internal routine and is not generally used by the user.
+    |
+    | field - data
+    | lons - longitudes
+    | lats - latitudes
+    | mesh=None - cache entry of the grid from irregular_mesh.  The window
+    |             of the grid is kept in it so that later fields on the same
+    |             grid only need a sparse matrix product.
+    |
+    :Returns:
+     field, lons, lats
+    |
+    """
+
+    window = None
+    if mesh is not None:
+        window = mesh['window']
+
+    if window is None:
+        window = irregular_window_matrix(lons, lats)
+        if mesh is not None:
+            mesh['window'] = window
+
+    matrix, lons_irregular, lats_irregular = window
+
+    return matrix @ np.asarray(field), lons_irregular, lats_irregular
 
-    field_irregular = deepcopy(field)
-    lons_irregular = deepcopy(lons)
-    lats_irregular = deepcopy(lats)
 
+def irregular_window_matrix(lons=None, lats=None):
+    """
+    | irregular_window_matrix - work out the window of irregular_window for
+    | a grid.  Each point of the window is either a point of the grid or a
+    | point on the edge of the map interpolated from three points of the
+    | grid, so the data of the window is a sparse matrix times the data.
+    | This is an internal routine and is not generally used by the user.
+    |
+    | lons=None - longitudes
+    | lats=None - latitudes
+    |
+    :Returns:
+     sparse matrix, lons, lats of the window.  The longitudes and
+     latitudes are read only as they are shared by the fields on the grid.
+    |
+    """
+
+    from scipy import sparse
+
+    lons = np.asarray(lons)
+    lats = np.asarray(lats)
+    npts = np.size(lons)
 
     # Fix longitudes to be -180 to 180
     # lons_irregular = ((lons_irregular + plotvars.lonmin) % 360) + plotvars.lonmin
@@ -9224,82 +11134,182 @@ def irregular_window(field, lons,lats):
     # Test data to get appropiate longitude offset to perform remapping
     found_lon = False
     for ilon in [-360, 0, 360]:
-        lons_test = lons_irregular + ilon
-        if np.min(lons_test) <= plotvars.lonmin:
+        if np.min(lons) + ilon <= plotvars.lonmin:
             found_lon = True
             lons_offset = ilon
 
     if found_lon:
-        lons_irregular = lons_irregular + lons_offset
+        lons_irregular = lons + lons_offset
         pts = np.where(lons_irregular < plotvars.lonmin)
         lons_irregular[pts] = lons_irregular[pts] + 360.0
     else:
         errstr = '/n/n cf-plot error - cannot determine grid offset in add_cyclic_irregular/n/n'
         raise Warning(errstr)
 
-    field_wrap = deepcopy(field_irregular)
-    lons_wrap = deepcopy(lons_irregular)
-    lats_wrap = deepcopy(lats_irregular)
-    delta = 120.0
-
-    pts_left = np.where(lons_wrap >= plotvars.lonmin + 360 - delta)
-    lons_left = lons_wrap[pts_left] - 360.0
-    lats_left = lats_wrap[pts_left]
-    field_left = field_wrap[pts_left]
+    full_globe = plotvars.lonmax - plotvars.lonmin == 360
 
-    field_wrap = np.concatenate([field_wrap, field_left])
-    lons_wrap = np.concatenate([lons_wrap, lons_left])
-    lats_wrap = np.concatenate([lats_wrap, lats_left])
+    # Copy the points near the right hand side of the plot to the left
+    delta = 120.0
+    pts_left = np.where(lons_irregular >= plotvars.lonmin + 360 - delta)
+    index_wrap = np.concatenate([np.arange(npts), pts_left[0]])
+    lons_wrap = np.concatenate([lons_irregular, lons_irregular[pts_left] - 360.0])
+    lats_wrap = np.concatenate([lats, lats[pts_left]])
 
     # Make a line of interpolated data on left hand side of plot and insert this into the data
     # on both the left and the right before contouring
+    # The 359.95 here is needed or Cartopy will map 360 back to 0
     lons_new = np.zeros(181) + plotvars.lonmin
     lats_new = np.arange(181) - 90
-    field_new = griddata((lons_wrap, lats_wrap), field_wrap, (lons_new, lats_new), method='linear')
+    if full_globe:
+        vertices, weights = irregular_seam(lons_wrap, lats_wrap, index_wrap, lons_new, lats_new)
+        vertices = np.concatenate([vertices, vertices])
+        weights = np.concatenate([weights, weights])
+        lons_new = np.concatenate([lons_new, lons_new + 359.95])
+    else:
+        lons_new = np.concatenate([lons_new, np.zeros(181) + plotvars.lonmax])
+        vertices, weights = irregular_seam(lons_wrap, lats_wrap, index_wrap, lons_new,
+                                           np.concatenate([lats_new, lats_new]))
+    lats_new = np.concatenate([lats_new, lats_new])
 
-    # Remove any non finite points in the interpolated data
-    pts = np.where(np.isfinite(field_new))
-    field_new = field_new[pts]
+    # Remove the edge points outside the grid
+    pts = np.isfinite(weights[:, 0])
     lons_new = lons_new[pts]
     lats_new = lats_new[pts]
-
-    # Add the interpolated data to the left
-    field_irregular = np.concatenate([field_irregular, field_new])
+    vertices = vertices[pts]
+    weights = weights[pts]
+
+    # Rows of the matrix for the grid points followed by the edge points
+    nnew = np.size(lons_new)
+    rows = np.concatenate([np.arange(npts), np.repeat(np.arange(nnew) + npts, 3)])
+    cols = np.concatenate([np.arange(npts), vertices.flatten()])
+    values = np.concatenate([np.ones(npts), weights.flatten()])
     lons_irregular = np.concatenate([lons_irregular, lons_new])
-    lats_irregular = np.concatenate([lats_irregular, lats_new])
+    lats_irregular = np.concatenate([lats, lats_new])
 
-    # Add to the right if a fiull globe is being plotted
-    # The 359.99 here is needed or Cartopy will map 360 back to 0
+    # Finally remove any point off to the right of plotvars.lonmax
+    keep = np.where(lons_irregular <= plotvars.lonmax)[0]
+    if np.size(keep) == 0:
+        keep = np.arange(npts + nnew)
+    renumber = np.full(npts + nnew, -1)
+    renumber[keep] = np.arange(np.size(keep))
+    pts = renumber[rows] >= 0
 
-    if plotvars.lonmax - plotvars.lonmin == 360:
-        field_irregular = np.concatenate([field_irregular, field_new])
-        lons_irregular = np.concatenate([lons_irregular, lons_new + 359.95])
-        lats_irregular = np.concatenate([lats_irregular, lats_new])
-    else:
-        lons_new2 = np.zeros(181) + plotvars.lonmax
-        lats_new2 = np.arange(181) - 90
-        field_new2 = griddata((lons_wrap, lats_wrap), field_wrap, (lons_new2, lats_new2), method='linear')
+    matrix = sparse.csr_matrix((values[pts], (renumber[rows[pts]], cols[pts])),
+                               shape=(np.size(keep), npts))
+    lons_irregular = lons_irregular[keep]
+    lats_irregular = lats_irregular[keep]
+    lons_irregular.setflags(write=False)
+    lats_irregular.setflags(write=False)
 
-        # Remove any non finite points in the interpolated data
-        pts = np.where(np.isfinite(field_new2))
-        field_new2 = field_new2[pts]
-        lons_new2 = lons_new2[pts]
-        lats_new2 = lats_new2[pts]
+    return matrix, lons_irregular, lats_irregular
 
 
-        # Add the interpolated data to the right
-        field_irregular = np.concatenate([field_irregular, field_new2])
-        lons_irregular = np.concatenate([lons_irregular, lons_new2])
-        lats_irregular = np.concatenate([lats_irregular, lats_new2])
+def irregular_seam(lons=None, lats=None, index=None, seam_lons=None, seam_lats=None):
+    """
+    | irregular_seam - linear interpolation weights from irregular points
+    | to the points along the edges of the map.  This gives the same values
+    | as scipy griddata with method='linear' but the Delaunay triangulation
+    | is only made once for each grid.
+    | This is an internal routine and is not generally used by the user.
+    |
+    | lons=None - longitudes of the points including the wrapped points
+    | lats=None - latitudes of the points including the wrapped points
+    | index=None - index of each point in the data
+    | seam_lons=None - longitudes to interpolate to
+    | seam_lats=None - latitudes to interpolate to
+    |
+    :Returns:
+     index in the data of the three corners of the triangle containing
+     each point and their weights.  The weights are nan for points
+     outside all of the triangles.
+    |
+    """
 
-    # Finally remove any point off to the right of plotvars.lonmax
-    pts = np.where(lons_irregular <= plotvars.lonmax)
-    if np.size(pts) > 0:
-        field_irregular = field_irregular[pts]
-        lons_irregular = lons_irregular[pts]
-        lats_irregular = lats_irregular[pts]
+    from scipy.spatial import Delaunay
+
+    tri = Delaunay(np.column_stack([lons, lats]))
+    points = np.column_stack([seam_lons, seam_lats]).astype(float)
+    simplex = tri.find_simplex(points)
+
+    # Barycentric coordinates of each point in its triangle
+    transform = tri.transform[simplex]
+    coords = np.einsum('ijk,ik->ij', transform[:, :2], points - transform[:, 2])
+    weights = np.column_stack([coords, 1 - np.sum(coords, axis=1)])
+    vertices = index[tri.simplices[simplex]]
+
+    outside = simplex == -1
+    weights[outside] = np.nan
+    vertices[outside] = 0
+
+    return vertices, weights
+
+
+def irregular_mesh(lons=None, lats=None):
+    """
+    | irregular_mesh - find the cache entry of an irregular grid for the
+    | current map.  The entry holds the window of irregular_window and
+    | the triangulations of the points contoured so
+    | that later fields on the same grid, such as other time steps, don't
+    | need them to be made again.
+    | This is an internal routine and is not generally used by the user.
+    |
+    | lons=None - longitudes of the grid
+    | lats=None - latitudes of the grid
+    |
+    :Returns:
+     cache entry of the grid
+    |
+    """
+
+    # Only the longitude limits of the map change the points used
+    key = hashlib.sha1()
+    for values in [lons, lats]:
+        values = np.ascontiguousarray(values)
+        key.update(repr((values.dtype.str, values.shape)).encode())
+        key.update(values.tobytes())
+    key.update(repr((plotvars.lonmin, plotvars.lonmax)).encode())
+    key = key.hexdigest()
+
+    mesh = irregular_mesh_cache.get(key)
+    if mesh is None:
+        # Keep the most recent grids only
+        mesh = cache_store(irregular_mesh_cache, key,
+                           {'window': None, 'triangulations': {}}, 8)
 
-    return field_irregular, lons_irregular, lats_irregular
+    return mesh
+
+
+def irregular_triangulation(mesh=None, lons=None, lats=None):
+    """
+    | irregular_triangulation - Delaunay triangulation of irregular points
+    | for tricontourf and tricontour.  The triangulation is kept in the
+    | cache entry of the grid and used again for the same points.
+    | This is an internal routine and is not generally used by the user.
+    |
+    | mesh=None - cache entry of the grid from irregular_mesh
+    | lons=None - longitudes of the points
+    | lats=None - latitudes of the points
+    |
+    :Returns:
+     matplotlib.tri.Triangulation
+    |
+    """
+
+    import matplotlib.tri as mtri
+
+    # The points contoured depend on the missing data as well as the grid
+    key = hashlib.sha1()
+    key.update(np.ascontiguousarray(lons).tobytes())
+    key.update(np.ascontiguousarray(lats).tobytes())
+    key = key.hexdigest()
+
+    triangulations = mesh['triangulations']
+    triangulation = triangulations.get(key)
+    if triangulation is None:
+        triangulation = cache_store(triangulations, key,
+                                    mtri.Triangulation(lons, lats), 4)
+
+    return triangulation
 
 
 def max_ndecs_data(data):
@@ -9366,6 +11376,7 @@ def fix_floats(data):
     return(data)
 
 
+@profiled
 def calculate_levels(field=None, level_spacing=None, verbose=None):
 
     dmin = np.nanmin(field)
@@ -9373,9 +11384,6 @@ def calculate_levels(field=None, level_spacing=None, verbose=None):
 
     tight = True
 
-    field2 = deepcopy(field)
-
-
 
 
     if plotvars.user_levs == 1:
@@ -9400,6 +11408,8 @@ def calculate_levels(field=None, level_spacing=None, verbose=None):
                 outlier_detected = False
 
                 if sum(hist[1:-2]) ==0:
+                    # Copy of the field to remove the outliers from
+                    field2 = deepcopy(field)
                     if hist[0] / hist[-1] < rate:
                         outlier_detected = True
                         pts = np.where(field == dmin)
@@ -9522,6 +11532,7 @@ def calculate_levels(field=None, level_spacing=None, verbose=None):
     return(clevs, mult, fmult)
 
 
+@plot_locked
 def stream(u=None, v=None, x=None, y=None, density=None, linewidth=None,
            color=None, arrowsize=None, arrowstyle=None, minlength=None,
            maxlength=None, axes=True,
@@ -9582,6 +11593,9 @@ def stream(u=None, v=None, x=None, y=None, density=None, linewidth=None,
     resolution_orig = plotvars.resolution
     rotated_vect = False
 
+    # Plot type - only set from the data for cf-python fields
+    ptype = None
+
     # Set potential user axis labels
     user_xlabel = xlabel
     user_ylabel = ylabel
@@ -9605,7 +11619,7 @@ def stream(u=None, v=None, x=None, y=None, density=None, linewidth=None,
 
     # Extract required data
     # If a cf-python field
-    if isinstance(u, cf.Field):
+    if cf_isinstance(u, 'Field'):
 
         # Check data is 2D
         ndims = np.squeeze(u.data).ndim
@@ -9620,18 +11634,18 @@ def stream(u=None, v=None, x=None, y=None, density=None, linewidth=None,
 
         u_data, u_x, u_y, ptype, colorbar_title, xlabel, ylabel, xpole, \
             ypole = cf_data_assign(u, colorbar_title, rotated_vect=rotated_vect)
-    elif isinstance(u, cf.FieldList):
+    elif cf_isinstance(u, 'FieldList'):
         raise TypeError("Can't plot a field list")
     else:
         # field=f #field data passed in as f
         check_data(u, x, y)
-        u_data = deepcopy(u)
-        u_x = deepcopy(x)
-        u_y = deepcopy(y)
+        u_data = u
+        u_x = x
+        u_y = y
         xlabel = ''
         ylabel = ''
 
-    if isinstance(v, cf.Field):
+    if cf_isinstance(v, 'Field'):
 
         # Check data is 2D
         ndims = np.squeeze(v.data).ndim
@@ -9646,12 +11660,12 @@ def stream(u=None, v=None, x=None, y=None, density=None, linewidth=None,
 
         v_data, v_x, v_y, ptype, colorbar_title, xlabel, ylabel, xpole, \
             ypole = cf_data_assign(v, colorbar_title, rotated_vect=rotated_vect)
-    elif isinstance(v, cf.FieldList):
+    elif cf_isinstance(v, 'FieldList'):
         raise TypeError("Can't plot a field list")
     else:
         # field=f #field data passed in as f
         check_data(v, x, y)
-        v_data = deepcopy(v)
+        v_data = v
         xlabel = ''
         ylabel = ''
 
@@ -9736,7 +11750,7 @@ def stream(u=None, v=None, x=None, y=None, density=None, linewidth=None,
                       name='land', category='physical',
                       scale=plotvars.resolution,
                       facecolor='none')
-        mymap.add_feature(feature, edgecolor=continent_color,
+        mymap.add_feature(map_feature(feature), edgecolor=continent_color,
                           linewidth=continent_thickness,
                           linestyle=continent_linestyle)
 
@@ -9782,13 +11796,16 @@ def bfill_irregular(f=None, face_lons=None, face_lats=None, face_connectivity=No
      |
     """
 
+    from matplotlib.collections import PolyCollection
+    import shapely.geometry as sgeom
+
 
 
     # Colour faces according to value
     # Set faces to white initially
     cols = ['#000000' for x in range(len(face_connectivity))]
 
-    levs = deepcopy(np.array(clevs))
+    levs = np.array(clevs)
 
     if plotvars.levels_extend == 'min' or plotvars.levels_extend == 'both':
         levs = np.concatenate([[-1e20], levs])
@@ -9864,7 +11881,7 @@ def generate_titles(f=None):
     well_formed = check_well_formed(f)
 
     title_dims = ''
-    if isinstance(f, cf.Field):
+    if cf_isinstance(f, 'Field'):
         for idim in np.arange(len(mycoords)):
             mycoord = mycoords[idim]
             if mycoord == 'Z':
@@ -10107,7 +12124,7 @@ def orca_check(x, verbose=False):
         We look for a single discontinuity in longitude where the data changes by 
         greater that 120 degrees.'''
     
-    lons = deepcopy(x)
+    lons = np.asarray(x)
  
     # Only check for longitude range > 350 degrees
     if np.max(lons) - np.min(lons) < 350:
@@ -0,0 +1,189 @@
+"""
+Colour scale files for cf-plot and the packed bundle of them.
+
+Each colour scale is a text file of red green blue values, one colour
+per line.  At build time pack() collects all of them into a single
+colourmaps.npz bundle so that cscale can find any shipped scale with
+one file read rather than a stat and parse per scale.  The bundle is
+stamped with the cf-plot version it was built for and a hash of the
+.rgb files.  An installed bundle is only checked against the version,
+so no .rgb files are read.  In a development checkout, where setup.py
+is next to the package, the .rgb files may have been edited since the
+bundle was packed so the hash is checked as well.  The .rgb files are
+still used if there is no bundle, if the bundle is out of date and for
+user colour scales.
+
+This module only needs numpy so that setup.py can run pack() without
+importing the rest of cf-plot.
+"""
+import os
+import hashlib
+import zipfile
+import numpy as np
+
+
+colourmaps_dir = os.path.dirname(os.path.abspath(__file__))
+bundle_file = os.path.join(colourmaps_dir, 'colourmaps.npz')
+
+
+def read_rgb(file=None):
+    """
+    | read_rgb - read a red green blue colour scale file
+    |
+    | file=None - file with the red, green and blue values of one colour on
+    |             each line.  Anything after the third value is ignored.
+    |
+    :Returns:
+        uint8 (ncolours, 3) array of red, green and blue values
+    |
+    """
+
+    with open(file, 'r') as f:
+        lines = f.read().splitlines()
+    rgb = []
+    for line in lines:
+        vals = line.split()
+        rgb.append([int(vals[0]), int(vals[1]), int(vals[2])])
+
+    return np.array(rgb, dtype=np.uint8).reshape(-1, 3)
+
+
+def source_hash(directory=None):
+    """
+    | source_hash - hash of the colour scale files in a directory
+    |
+    | directory=None - directory of .rgb files, default is this package
+    |
+    | This is used to tell if a bundle was packed from the files as
+    | they are now.  It only reads the files, which is much quicker than
+    | parsing them.
+    |
+    :Returns:
+        hex digest of the names and contents of the .rgb files
+    |
+    """
+
+    if directory is None:
+        directory = colourmaps_dir
+
+    digest = hashlib.sha1()
+    for file in sorted(os.listdir(directory)):
+        if not file.endswith('.rgb'):
+            continue
+        with open(os.path.join(directory, file), 'rb') as f:
+            contents = f.read()
+        digest.update(file.encode() + b'\0' + str(len(contents)).encode() + b'\0')
+        digest.update(contents)
+
+    return digest.hexdigest()
+
+
+def checkout(directory=None):
+    """
+    | checkout - whether a directory of colour scales is in a development
+    | checkout of cf-plot rather than an installed package
+    |
+    | directory=None - directory of .rgb files, default is this package
+    |
+    :Returns:
+        True if setup.py is next to the cfplot package
+    |
+    """
+
+    if directory is None:
+        directory = colourmaps_dir
+
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(directory)))
+    return os.path.isfile(os.path.join(package_dir, 'setup.py'))
+
+
+def pack(directory=None, outfile=None, version=None):
+    """
+    | pack - pack the colour scale files in a directory into one bundle
+    |
+    | directory=None - directory of .rgb files, default is this package
+    | outfile=None - bundle file to write, default is colourmaps.npz in
+    |                this package
+    | version=None - cf-plot version to stamp the bundle with
+    |
+    | Files that cannot be read as colour scales are left out of the
+    | bundle so that cscale reports the error from the file as before.
+    |
+    :Returns:
+        names of the packed colour scales
+    |
+    """
+
+    if directory is None:
+        directory = colourmaps_dir
+    if outfile is None:
+        outfile = bundle_file
+
+    names = []
+    scales = []
+    for file in sorted(os.listdir(directory)):
+        if not file.endswith('.rgb'):
+            continue
+        try:
+            rgb = read_rgb(os.path.join(directory, file))
+        except (ValueError, IndexError):
+            continue
+        names.append(file[:-4])
+        scales.append(rgb)
+
+    offsets = np.cumsum([0] + [np.shape(rgb)[0] for rgb in scales])
+
+    # Write to a temporary file first so a reader never sees part of a bundle
+    tmp_file = outfile + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.savez(f, names=np.array(names), offsets=offsets,
+                 rgb=np.concatenate(scales), source=np.array(source_hash(directory)),
+                 version=np.array('' if version is None else str(version)))
+    os.replace(tmp_file, outfile)
+
+    return names
+
+
+def unpack(file=None, directory=None, version=None):
+    """
+    | unpack - read the colour scales from a bundle
+    |
+    | file=None - bundle file, default is colourmaps.npz in this package
+    | directory=None - directory of the .rgb files the bundle was packed
+    |                  from, default is the directory of the bundle
+    | version=None - cf-plot version the bundle must be stamped with
+    |
+    :Returns:
+        dictionary of uint8 (ncolours, 3) arrays keyed on colour scale name.
+        This is empty if there is no bundle or if it is out of date, which
+        is if it was built for another version or, in a development
+        checkout, if a colour scale has been changed since it was packed.
+    |
+    """
+
+    if file is None:
+        file = bundle_file
+    if directory is None:
+        directory = os.path.dirname(os.path.abspath(file))
+
+    try:
+        with np.load(file) as data:
+            names = data['names']
+            offsets = data['offsets']
+            rgb = data['rgb']
+            source = str(data['source'])
+            stamp = str(data['version'])
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return {}
+
+    if checkout(directory):
+        if source != source_hash(directory):
+            return {}
+    elif version is not None and stamp != str(version):
+        return {}
+
+    scales = {}
+    for i, name in enumerate(names.tolist()):
+        scales[name] = rgb[offsets[i]:offsets[i + 1]]
+
+    return scales
@@ -1,8 +1,10 @@
 from setuptools import setup
+import setuptools.command.build_py
 import os
 import fnmatch
 import sys
 import importlib
+import importlib.util
 import subprocess
 
 
@@ -14,7 +16,28 @@ def find_package_data_files(directory):
                 yield filename.replace('cfplot/', '', 1)
 
 
+class build_py(setuptools.command.build_py.build_py):
+    # Pack the colour scale files into colourmaps.npz in the build
+    # directory stamped with the version.  The colourmaps module only
+    # needs numpy so load it directly rather than importing cfplot.
+    # Without numpy the .rgb files are used instead.
+    def run(self):
+        super().run()
+        try:
+            spec = importlib.util.spec_from_file_location(
+                'colourmaps', os.path.join('cfplot', 'colourmaps', '__init__.py'))
+            colourmaps = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(colourmaps)
+        except ImportError:
+            print('numpy not found - not packing the colour scales')
+            return
+        outfile = os.path.join(self.build_lib, 'cfplot', 'colourmaps', 'colourmaps.npz')
+        if not self.dry_run:
+            colourmaps.pack(outfile=outfile, version=self.distribution.get_version())
+
+
 package_data = [f for f in find_package_data_files('cfplot/colourmaps')]
+package_data.append('regression.npz')
 
 
 setup(
@@ -26,6 +49,7 @@ setup(
     package_dir = {"cfplot":"cfplot"},
     package_data = {"cfplot": package_data},
     include_package_data = True,
+    cmdclass = {"build_py": build_py},
     install_requires = ["matplotlib >=3.1.0",
                         "cf-python >= 3.9.0",
                         "scipy >= 1.4.0",